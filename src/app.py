@@ -1,59 +1,133 @@
-from dash import Dash, dcc, callback, Output, Input, html, dash_table, dash_table
+from dash import Dash, dcc, callback, ctx, Output, Input, State, ClientsideFunction, Patch, no_update, html, dash_table, dash_table
 import dash_bootstrap_components as dbc
 import dash_vega_components as dvc
-import altair as altimport 
-import altair as alt
 import pandas as pd
 import numpy as np
+import os
 import json
+import flask
 try:
     from components.map_view import (
-        display_landing_page_map_dots,
+        get_labels,
         display_landing_page_map_choropleth_counties,
         display_state_level_map,
         display_county_level_map,
-        fix_cfips
+        display_points_map,
+        points_trace
     )
+    from components.store import STORE_PATH, LEGACY_CSV_PATH, COUNTIES_GEOJSON_PATH
+    from components.census_cube import CENSUS_METRIC_LABELS
+    from components.spec_cache import SpecCache, cache_key, warm_up
+    from components.figure_patch import figure_patch
+    from components.bundle import load_startup
+    from components.shared_cache import SharedCache, dataset_version
+    from components.instrumentation import CallbackMetrics
+    from components.live_data import LiveDataset
+    from components.forecast import FORECAST_MODELS
+    from components.scoring import SCORE_METRICS, SCORE_METRIC_LABELS, SCORE_METHODS
+    from components.export import EXPORT_FORMATS, export_columns, stream_export
+    from components.comparison import CountyComparison, MAX_COMPARED
+    from components.responses import ResponseCompression, OrjsonProvider
+    from components.background import PoolCallbackManager, report_progress
 except ModuleNotFoundError:
     from src.components.map_view import (
-        display_landing_page_map_dots,
+        get_labels,
         display_landing_page_map_choropleth_counties,
         display_state_level_map,
         display_county_level_map,
-        fix_cfips
+        display_points_map,
+        points_trace
     )
-
-# data wrangling for filter & sidebar
-df = pd.read_csv("data/processed/smb_enriched.csv",dtype={'cfips_fixed': str, 'cfips': str})  
-df['cfips_fixed'] = df['cfips_fixed'].astype(str)
-df['cfips'] = df['cfips'].astype(str)
-df['cfips_fixed'] = df['cfips_fixed'].apply(fix_cfips)
-
-
-# Load geojson files
-with open("data/raw/us-states.json") as f:
-    states_geojson = json.load(f)
-
-with open("data/raw/geojson-counties-fips.json") as f:
-    counties_geojson = json.load(f)
-
-unique_states = sorted(df["state"].unique())
-state_county_mapping = df.groupby("state")["county"].unique().apply(list).to_dict()
-
-total_microbusinesses = df["active"].sum()  
-df["adult_population"] = (df["active"] / df["microbusiness_density"]) * 100
-weighted_microbusiness_density = (df["microbusiness_density"] * df["adult_population"]).sum() / df["adult_population"].sum()
+    from src.components.store import STORE_PATH, LEGACY_CSV_PATH, COUNTIES_GEOJSON_PATH
+    from src.components.census_cube import CENSUS_METRIC_LABELS
+    from src.components.spec_cache import SpecCache, cache_key, warm_up
+    from src.components.figure_patch import figure_patch
+    from src.components.bundle import load_startup
+    from src.components.shared_cache import SharedCache, dataset_version
+    from src.components.instrumentation import CallbackMetrics
+    from src.components.live_data import LiveDataset
+    from src.components.forecast import FORECAST_MODELS
+    from src.components.scoring import SCORE_METRICS, SCORE_METRIC_LABELS, SCORE_METHODS
+    from src.components.export import EXPORT_FORMATS, export_columns, stream_export
+    from src.components.comparison import CountyComparison, MAX_COMPARED
+    from src.components.responses import ResponseCompression, OrjsonProvider
+    from src.components.background import PoolCallbackManager, report_progress
 
 latest_year = "2021"  
-df = df.sort_values(by=f"median_hh_inc_{latest_year}")  
-df["cumulative_population"] = df["adult_population"].cumsum()  
-total_population = df["adult_population"].sum()
-median_income = df[df["cumulative_population"] >= total_population / 2][f"median_hh_inc_{latest_year}"].iloc[0]
+
+# density forecast shown in the density chart, one of FORECAST_MODELS
+forecast_model = os.environ.get("SMB_FORECAST_MODEL", "last_value")
+if forecast_model not in FORECAST_MODELS:
+    raise ValueError(f"SMB_FORECAST_MODEL must be one of {sorted(FORECAST_MODELS)}")
+
+# Everything derived from the data files, built once: the typed columnar store built by
+# src/ingest.py (falls back to smb_enriched.csv), the county polygons split by state with
+# simplified tiers per zoom level, and the Dataset (latest row per county for the map,
+# population-weighted county statistics, county x month panel, BI percentiles, census
+# cube and the server-side table backend). With SMB_STARTUP_BUNDLE set these come
+# prebuilt from a pickle instead of being recomputed by every worker at boot.
+startup = load_startup(latest_year, forecast_model, os.environ.get("SMB_STARTUP_BUNDLE"))
+df = startup.dataset.df
+states_geojson = startup.states_geojson
+county_geometry = startup.county_geometry
+
+# Callbacks read live.current once; new monthly files are ingested into a new
+# version that is swapped in while the current one keeps serving.
+live = LiveDataset(startup.dataset)
+
+# serialized Vega specs per (chart, state, county), LRU bounded
+spec_cache = SpecCache(maxsize=int(os.environ.get("SMB_SPEC_CACHE_SIZE", 1024)))
+
+# recent map figures per (state, county, column), diffed against to send partial updates
+map_cache = SpecCache(maxsize=int(os.environ.get("SMB_MAP_CACHE_SIZE", 64)))
+
+# optional cross-worker cache of callback outputs (set SMB_SHARED_CACHE to a sqlite path)
+DATA_PATHS = [STORE_PATH, LEGACY_CSV_PATH, COUNTIES_GEOJSON_PATH]
+shared_cache = SharedCache.from_env(dataset_version(DATA_PATHS))
+
+# optional background jobs for the heavy callbacks (set SMB_BACKGROUND_JOBS to a sqlite path);
+# jobs are keyed on the dataset version so identical requests share one computation
+background_manager = PoolCallbackManager.from_env(version=lambda: shared_cache.version)
+# False when from_env fell back to Dash's DiskcacheManager (unsupported Dash version)
+pooled_jobs = isinstance(background_manager, PoolCallbackManager)
+
+def background(**kwargs):
+    # extra app.callback arguments that run a callback as a background job, when enabled
+    if not pooled_jobs:
+        # Dash's own managers pass progress as a set_progress argument the callbacks don't take
+        kwargs.pop("progress", None)
+    return dict(background=True, **kwargs) if background_manager else {}
+
+def on_dataset_swap(dataset):
+    # cached outputs were built from the previous version
+    spec_cache.clear()
+    map_cache.clear()
+    shared_cache.set_version(dataset_version(DATA_PATHS + list(dataset.sources)))
+    # pool processes were forked with the previous version loaded
+    if pooled_jobs:
+        background_manager.reset_pool()
+
+live.on_swap = on_dataset_swap
+
+# optionally ingest new monthly files (e.g. data/raw/revealed_test.csv) as they land
+if os.environ.get("SMB_INGEST_WATCH"):
+    live.watch(os.environ["SMB_INGEST_WATCH"], float(os.environ.get("SMB_INGEST_POLL_SECONDS", 30)))
+
+# callback latency / payload / cache metrics, served on /metrics
+metrics = CallbackMetrics.from_env()
+spec_cache.on_lookup = metrics.record_cache
+shared_cache.on_lookup = metrics.record_cache
+if pooled_jobs:
+    # jobs are measured in the pool processes and recorded here
+    background_manager.metrics = metrics
 
 #initialize app
-app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], background_callback_manager=background_manager)
 server = app.server
 
+# the JSON routes are written by orjson (when installed) instead of Flask's encoder
+server.json = OrjsonProvider(server)
+
 #initialize app variables
 title = [html.H1('SMBFinder - Explore Microbusinesses around the United States'), html.Br()]
 
@@ -67,15 +141,16 @@ numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
 # Filter out any columns you don't want to include
 numeric_columns = ['microbusiness_density']
 
-filter_state = [
-    dbc.Label("Select a State"),
-    dcc.Dropdown(
-        id='state-dropdown',
-        options=[{"label": state, "value": state} for state in unique_states], 
-        placeholder='Select a State',
-        style={'width': '200px'}
-    ),
-]
+def filter_state(states):
+    return [
+        dbc.Label("Select a State"),
+        dcc.Dropdown(
+            id='state-dropdown',
+            options=[{"label": state, "value": state} for state in states],
+            placeholder='Select a State',
+            style={'width': '200px'}
+        ),
+    ]
 
 filter_county = [
     dbc.Label("Select a County"),
@@ -104,30 +179,95 @@ filter_column = [
     ),
 ]
 
-global_metrics = html.Div([
-    html.H4("USA-wide Metrics", style={'textAlign': 'center', 'fontSize': '21px', 'marginBottom': '25px'}),
-    html.Div([
-        html.H6("Total Microbusinesses", style={'marginBottom': '5px', 'fontSize': '16px'}),
-        html.Hr(style={'border': '1px solid #AAC8E4', 'width': '80%', 'margin': '10px auto'}),
-        html.Hr(style={'border': '1px solid #AAC8E4', 'width': '80%', 'margin': '10px auto'}),
-        html.P(f"{total_microbusinesses:,.0f}", style={'fontSize': '18px', 'fontWeight': 'bold', 'marginTop': '5px'})
-    ], style={'textAlign': 'center', 'backgroundColor': '#D7EBF6', 'padding': '15px', 'borderRadius': '10px', 'marginBottom': '20px'}),
-    html.Div([
-        html.H6("Avg. Microbusiness Density", style={'marginBottom': '5px', 'fontSize': '16px'}),
-        html.Hr(style={'border': '1px solid #AAC8E4', 'width': '80%', 'margin': '10px auto'}),
-        html.Hr(style={'border': '1px solid #AAC8E4', 'width': '80%', 'margin': '10px auto'}),
-        html.P(f"{weighted_microbusiness_density:.2f}", style={'fontSize': '18px', 'fontWeight': 'bold', 'marginTop': '5px'})
-    ], style={'textAlign': 'center', 'backgroundColor': '#D7EBF6', 'padding': '15px', 'borderRadius': '10px', 'marginBottom': '20px'}),
-    html.Div([
-        html.H6("Median Household Income", style={'marginBottom': '5px', 'fontSize': '16px'}),
-        html.Hr(style={'border': '1px solid #AAC8E4', 'width': '80%', 'margin': '10px auto'}),
+# counties from any state shown side by side in the charts and BI cards; options come from the county lookup
+filter_compare = [
+    dbc.Label(f"Compare Counties (up to {MAX_COMPARED})"),
+    dcc.Dropdown(id='compare-dropdown', multi=True, placeholder='Add counties to compare'),
+    dcc.Store(id='compare-limit', data=MAX_COMPARED),
+]
+
+# county areas, or one WebGL point per county (or cluster of counties) that is cheap to draw at any zoom
+filter_map_mode = [
+    dbc.Label("Map Style"),
+    dbc.RadioItems(
+        id='map-mode',
+        options=[{"label": "Areas", "value": "areas"}, {"label": "Points", "value": "points"}],
+        value='areas',
+        inline=True,
+    ),
+]
+
+def format_stat(value, pattern):
+    if pd.isna(value):
+        return "N/A"
+    return pattern.format(value)
+
+def neighbourhood_box(label, summary, count):
+    # the surrounding counties, for comparison with the selected one
+    return html.Div([
+        html.H6(label, style={'marginBottom': '5px', 'fontSize': '16px'}),
         html.Hr(style={'border': '1px solid #AAC8E4', 'width': '80%', 'margin': '10px auto'}),
-        html.P(f"${median_income:,.0f}", style={'fontSize': '18px', 'fontWeight': 'bold', 'marginTop': '5px'})
-    ], style={'textAlign': 'center', 'backgroundColor': '#D7EBF6', 'padding': '15px', 'borderRadius': '10px', 'marginBottom': '20px'}),
-], style={'border': '2px solid black', 'padding': '15px', 'borderRadius': '10px', 'width': '100%'})
+        html.P(f"{count} counties", style={'fontSize': '14px', 'marginBottom': '2px'}),
+        html.P(f"Density {format_stat(summary['microbusiness_density'], '{:.2f}')}", style={'fontSize': '14px', 'marginBottom': '2px'}),
+        html.P(f"Income {format_stat(summary['median_income'], '${:,.0f}')}", style={'fontSize': '14px', 'marginBottom': '2px'}),
+    ], style={'textAlign': 'center', 'backgroundColor': '#EEF5FB', 'padding': '15px', 'borderRadius': '10px', 'marginBottom': '20px'})
+
+def metrics_panel(title, summary, neighbourhood=None):
+    total_microbusinesses = summary['total_microbusinesses']
+    weighted_microbusiness_density = summary['microbusiness_density']
+    median_income = summary['median_income']
+    return html.Div([
+        html.H4(title, style={'textAlign': 'center', 'fontSize': '21px', 'marginBottom': '25px'}),
+        html.Div([
+            html.H6("Total Microbusinesses", style={'marginBottom': '5px', 'fontSize': '16px'}),
+            html.Hr(style={'border': '1px solid #AAC8E4', 'width': '80%', 'margin': '10px auto'}),
+            html.Hr(style={'border': '1px solid #AAC8E4', 'width': '80%', 'margin': '10px auto'}),
+            html.P(f"{total_microbusinesses:,.0f}", style={'fontSize': '18px', 'fontWeight': 'bold', 'marginTop': '5px'})
+        ], style={'textAlign': 'center', 'backgroundColor': '#D7EBF6', 'padding': '15px', 'borderRadius': '10px', 'marginBottom': '20px'}),
+        html.Div([
+            html.H6("Avg. Microbusiness Density", style={'marginBottom': '5px', 'fontSize': '16px'}),
+            html.Hr(style={'border': '1px solid #AAC8E4', 'width': '80%', 'margin': '10px auto'}),
+            html.Hr(style={'border': '1px solid #AAC8E4', 'width': '80%', 'margin': '10px auto'}),
+            html.P(format_stat(weighted_microbusiness_density, "{:.2f}"), style={'fontSize': '18px', 'fontWeight': 'bold', 'marginTop': '5px'})
+        ], style={'textAlign': 'center', 'backgroundColor': '#D7EBF6', 'padding': '15px', 'borderRadius': '10px', 'marginBottom': '20px'}),
+        html.Div([
+            html.H6("Median Household Income", style={'marginBottom': '5px', 'fontSize': '16px'}),
+            html.Hr(style={'border': '1px solid #AAC8E4', 'width': '80%', 'margin': '10px auto'}),
+            html.Hr(style={'border': '1px solid #AAC8E4', 'width': '80%', 'margin': '10px auto'}),
+            html.P(format_stat(median_income, "${:,.0f}"), style={'fontSize': '18px', 'fontWeight': 'bold', 'marginTop': '5px'})
+        ], style={'textAlign': 'center', 'backgroundColor': '#D7EBF6', 'padding': '15px', 'borderRadius': '10px', 'marginBottom': '20px'}),
+    ] + ([neighbourhood] if neighbourhood is not None else []),
+    style={'border': '2px solid black', 'padding': '15px', 'borderRadius': '10px', 'width': '100%'})
 
 map = dcc.Graph(id='map-placeholder', style={'height': '550px'})
 
+# shown while a background job computes the map / BI cards
+job_status = html.Div([
+    dbc.Progress(id='job-progress', value=0, striped=True, animated=True, style={'flex': '1', 'height': '18px'}),
+    dbc.Button("Cancel", id='job-cancel', size='sm', color='secondary', outline=True, style={'marginLeft': '10px'}),
+], id='job-status', style={'display': 'none'})
+JOB_STATUS_VISIBLE = {'display': 'flex', 'alignItems': 'center', 'marginTop': '10px'}
+JOB_STATUS_HIDDEN = {'display': 'none'}
+
+# milliseconds between two months while the map is playing
+PLAY_INTERVAL_MS = 400
+
+def time_controls(months):
+    # month slider under the map; the server draws the latest month, other months
+    # are swapped in by the browser from the per-month frames of the current view
+    labels = list(months.strftime("%b %Y"))
+    marks = {i: str(month.year) for i, month in enumerate(months) if month.month == 1}
+    return [
+        dcc.Store(id='month-labels', data=labels),
+        dcc.Store(id='month-frames-request'),
+        dcc.Store(id='month-frames'),
+        dcc.Interval(id='play-interval', interval=PLAY_INTERVAL_MS, disabled=True),
+        dbc.Col(dbc.Button("Play", id='play-button', size='sm', color='primary', style={'width': '70px'}), width='auto'),
+        dbc.Col(dcc.Slider(id='month-slider', min=0, max=len(labels) - 1, step=1, value=len(labels) - 1,
+                           marks=marks, updatemode='drag')),
+        dbc.Col(html.Div(labels[-1] if labels else "", id='month-label', style={'width': '80px'}), width='auto'),
+    ]
+
 chart_SMB_density = [
     dvc.Vega(id='density-placeholder', spec={'height': '230px'})  
 ]          
@@ -136,12 +276,85 @@ chart_med_income = [
     dvc.Vega(id='income-placeholder', style={'height': '230px'})
 ]
 
+DEFAULT_CENSUS_METRIC = "pct_college"
+
+census_metric_options = [
+    {"label": CENSUS_METRIC_LABELS[metric], "value": metric}
+    for metric in live.current.census_cube.metrics if metric != "median_hh_inc"
+]
+
+chart_census = [
+    dbc.Label("Select Census Metric"),
+    dcc.Dropdown(
+        id='census-metric-dropdown',
+        options=census_metric_options,
+        value=DEFAULT_CENSUS_METRIC,
+        clearable=False,
+        style={'width': '250px'}
+    ),
+    dvc.Vega(id='census-placeholder', style={'height': '230px'})
+]
+
+data_table = dash_table.DataTable(
+    id='data-table',
+    columns=[
+        {"name": get_labels().get(col, col.replace('_', ' ').title()), "id": col,
+         "type": "numeric" if pd.api.types.is_numeric_dtype(live.current.table_backend.frame[col]) else "text"}
+        for col in live.current.table_backend.columns
+    ],
+    page_current=0,
+    page_size=15,
+    page_action='custom',
+    sort_action='custom',
+    sort_mode='multi',
+    sort_by=[],
+    filter_action='custom',
+    filter_query='',
+    style_table={'overflowX': 'auto'},
+    style_cell={'fontSize': '12px', 'textAlign': 'left'},
+)
+
+# downloads of the rows behind the table (state, county and column filters), see /api/export
+export_links = ["Download: "] + [
+    html.A(fmt.upper() if fmt == 'csv' else fmt.title(), id=f'export-{fmt}', href=f"/api/export?format={fmt}",
+           style={'marginRight': '10px'})
+    for fmt in EXPORT_FORMATS
+]
+
 card_sellability = dbc.Card(id = "sellability")
 
 card_growth = dbc.Card(id = "growth")
 
 card_hireability = dbc.Card(id = "hireability")
 
+# composite site score: weight per metric (0 leaves it out)
+DEFAULT_SCORE_WEIGHTS = {'sellability': 1, 'hireability': 1, 'growth': 1, 'broadband': 0, 'it_workers': 0}
+
+site_finder = dbc.Card([
+    dbc.CardHeader("Top locations (composite score, within the selected state if any)"),
+    dbc.CardBody([
+        dbc.Row([
+            dbc.Col([
+                dbc.Label(SCORE_METRIC_LABELS[metric], style={'fontSize': '12px'}),
+                dcc.Slider(id=f'weight-{metric}', min=0, max=5, step=1, value=DEFAULT_SCORE_WEIGHTS[metric]),
+            ])
+            for metric in SCORE_METRICS
+        ]),
+        dbc.Row([
+            dbc.Col([
+                dbc.Label("Counties to show", style={'fontSize': '12px'}),
+                dcc.Dropdown(id='top-k', options=[5, 10, 25, 50], value=10, clearable=False, style={'width': '100px'}),
+            ], width='auto'),
+            dbc.Col([
+                dbc.Label("Normalise by", style={'fontSize': '12px'}),
+                dcc.Dropdown(id='score-method', options=list(SCORE_METHODS), value='percentile',
+                             clearable=False, style={'width': '150px'}),
+            ], width='auto'),
+        ]),
+        html.Div(id='top-sites', style={'marginTop': '10px'}),
+    ]),
+])
+
 end_credits = html.Div([
     html.Br(),
     html.H6("App allowing user to explore MicroBusiness density across the US, and derive key metrics used in deciding where to launch their next venture", style={'marginBottom': '5px', 'fontSize': '16px'}),
@@ -150,18 +363,28 @@ end_credits = html.Div([
     html.H6("Latest Deployment: 2025/03/01", style={'marginBottom': '5px', 'fontSize': '10px'}),
 ])
 
-#app layout
-app.layout = dbc.Container([
+#app layout, rebuilt on every page load so the lookups and month slider reflect newly ingested months
+def serve_layout():
+    data = live.current
+    return dbc.Container([
         dbc.Row(dbc.Col(title)),
+        # state -> county and cfips -> county lookups for the clientside callbacks
+        dcc.Store(id='county-lookup', data=data.county_lookup),
+        # inputs of the map figure the browser currently shows
+        dcc.Store(id='map-view'),
         dbc.Row([
-                dbc.Col(global_metrics, md = 3, style={'marginTop': '30px'}),
+                dbc.Col(html.Div(id='metrics-panel'), md = 3, style={'marginTop': '30px'}),
                 dbc.Col([
                     dbc.Row([
-                            dbc.Col(filter_state),
+                            dbc.Col(filter_state(data.unique_states)),
                             dbc.Col(filter_county),
                             dbc.Col(filter_column),  # Add the new dropdown here
+                            dbc.Col(filter_map_mode),
                     ]),
-                    dbc.Row(map)
+                    dbc.Row(dbc.Col(filter_compare), style={'marginTop': '10px'}),
+                    dbc.Row(job_status),
+                    dbc.Row(map),
+                    dbc.Row(time_controls(data.panel.months), align='center')
                 ], md=9),
         ]),
 
@@ -169,7 +392,8 @@ app.layout = dbc.Container([
         dbc.Row([
             dbc.Col([
                 html.H4("Filtered Data"),
-                html.Div(id='filtered-data-table')
+                html.Div(data_table, id='filtered-data-table'),
+                html.Div(export_links, style={'marginTop': '5px', 'fontSize': '14px'}),
             ])
         ]),
 
@@ -179,6 +403,11 @@ app.layout = dbc.Container([
                 dbc.Col(chart_med_income),
             ]
         ),
+        dbc.Row(
+            [
+                dbc.Col(chart_census),
+            ]
+        ),
         dbc.Row(
             [
                 dbc.Col(card_sellability),
@@ -186,99 +415,261 @@ app.layout = dbc.Container([
                 dbc.Col(card_hireability),
             ]
         ),
+        dbc.Row(dbc.Col(site_finder), style={'marginTop': '20px'}),
         dbc.Row(end_credits)
-])
+    ])
 
-@app.callback(
+app.layout = serve_layout
+
+# county options and map clicks are resolved in the browser (src/assets/clientside.js)
+app.clientside_callback(
+    ClientsideFunction(namespace="smb", function_name="countyOptions"),
     Output("county-dropdown", "options"),
-    Input("state-dropdown", "value")
+    Input("state-dropdown", "value"),
+    State("county-lookup", "data"),
 )
-def update_county_dropdown(selected_state):
-    if not selected_state:
-        return []
-    return [{"label": county, "value": county} for county in state_county_mapping[selected_state]]  
 
-@app.callback(
-    Output("map-placeholder", "figure"),
+app.clientside_callback(
+    ClientsideFunction(namespace="smb", function_name="compareOptions"),
+    Output("compare-dropdown", "options"),
+    Input("compare-dropdown", "value"),
+    [State("county-lookup", "data"),
+     State("compare-limit", "data")],
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="smb", function_name="selectClickedCounty"),
+    [Output("state-dropdown", "value"),
+     Output("county-dropdown", "value")],
+    Input("map-placeholder", "clickData"),
+    State("county-lookup", "data"),
+    prevent_initial_call=True,
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="smb", function_name="exportLinks"),
+    [Output(f"export-{fmt}", "href") for fmt in EXPORT_FORMATS],
     [Input("state-dropdown", "value"),
      Input("county-dropdown", "value"),
-     Input("column-dropdown", "value")]  
+     Input("data-table", "filter_query")],
 )
-def update_map(selected_state, selected_county, selected_column):
-    # Start with all data
-    
-    filtered_df = df.copy()
-    filtered_df = filtered_df.sort_values('first_day_of_month').groupby('cfips').last().reset_index()
-    
-    # Filter based on selections
-    if selected_state:
-        if isinstance(selected_state, list):
-            filtered_df = filtered_df[filtered_df["state"].isin(selected_state)]
-        else:
-            filtered_df = filtered_df[filtered_df["state"] == selected_state]
-        
-    if selected_county:
-        if isinstance(selected_county, list):
-            filtered_df = filtered_df[filtered_df["county"].isin(selected_county)]
-        else:
-            filtered_df = filtered_df[filtered_df["county"] == selected_county]
-    
-    filtered_df['cfips_fixed'] = filtered_df['cfips_fixed'].apply(fix_cfips)
 
+@app.callback(
+    [Output("map-placeholder", "figure"),
+     Output("map-view", "data")],
+    [Input("state-dropdown", "value"),
+     Input("county-dropdown", "value"),
+     Input("column-dropdown", "value"),
+     Input("map-mode", "value")],
+    State("map-view", "data"),
+    **background(
+        progress=[Output("job-progress", "value"), Output("job-progress", "label")],
+        running=[(Output("job-status", "style"), JOB_STATUS_VISIBLE, JOB_STATUS_HIDDEN)],
+        cancel=[Input("job-cancel", "n_clicks")],
+    )
+)
+@metrics.measure
+def update_map(selected_state, selected_county, selected_column, map_mode='areas', current_view=None):
+    args = [selected_state, selected_county, selected_column, map_mode]
+    with metrics.phase("build"):
+        figure = build_map_figure(*args)
+
+    # Only send what changed since the figure the browser shows, if this worker or
+    # the shared cache still holds it and it was built from the same dataset version
+    previous = None
+    # a points map shown may have been redrawn at another level of detail since it was built
+    showing_points = current_view and current_view["args"][3:] == ["points"]
+    if current_view and current_view.get("version") == shared_cache.version and not showing_points:
+        previous = map_cache.get(cache_key("map", current_view["args"]))
+        if previous is None:
+            previous = shared_cache.lookup("map", current_view["args"])
+    with metrics.phase("patch"):
+        patch = figure_patch(previous, figure) if previous is not None else None
+
+    return (figure if patch is None else patch), {"args": args, "version": shared_cache.version}
+
+@map_cache.cached("map")
+@shared_cache.cached("map")
+def build_map_figure(selected_state, selected_county, selected_column, map_mode='areas'):
     # Default on microbusiness density for now 
     column_to_display = selected_column if selected_column else 'microbusiness_density'
-    
-    # If county is selected, show county level map
-    if selected_county:
-        fig = display_county_level_map(filtered_df, counties_geojson, 'cfips_fixed', column_to_display)
-    # If state is selected but no county
-    elif selected_state:
-        fig = display_state_level_map(filtered_df, counties_geojson, 'cfips_fixed', column_to_display)
-    # Default view for entire US
-    else:
-        fig = display_landing_page_map_choropleth_counties(filtered_df, counties_geojson, 0.7, 'cfips_fixed', column_to_display)
+    if map_mode == 'points':
+        return build_points_figure(selected_state, selected_county, column_to_display)
+
+    # Latest row per county, resolved through the prebuilt snapshot index
+    with metrics.phase("data"):
+        filtered_df = live.current.snapshot.select(selected_state, selected_county)
+
+    # no-op unless running as a background job; stops here if the job was cancelled
+    report_progress(30, "Rendering map")
+    with metrics.phase("render"):
+        # If county is selected, show county level map
+        if selected_county:
+            fig = display_county_level_map(filtered_df, county_geometry.tier('full'), 'cfips_fixed', column_to_display)
+        # If state is selected but no county
+        elif selected_state:
+            fig = display_state_level_map(filtered_df, county_geometry.tier('medium'), 'cfips_fixed', column_to_display)
+        # Default view for entire US
+        else:
+            fig = display_landing_page_map_choropleth_counties(filtered_df, county_geometry.tier('coarse'), 0.7, 'cfips_fixed', column_to_display)
     
     # Remove the legend
     fig.update_layout(showlegend=False, coloraxis_showscale=False)
+    report_progress(90, "Sending map")
     
-    return fig
+    return fig.to_plotly_json()
+
+# zoom the points map opens at: states over the whole country, grid clusters over a state
+POINTS_ZOOM = {'usa': 3, 'state': 5, 'county': 8}
+
+def build_points_figure(selected_state, selected_county, column_to_display):
+    data = live.current
+    with metrics.phase("data"):
+        # a selected state limits the points to its counties; a selected county is shown among them
+        rows = data.stats.rows_for(selected_state) if selected_state else None
+        focus = data.stats.rows_for(selected_state, selected_county) if selected_county else rows
+        zoom = POINTS_ZOOM['county' if selected_county else 'state' if selected_state else 'usa']
+        levels = data.points
+        if focus is None:
+            center = {"lat": np.nanmean(levels.lat), "lon": np.nanmean(levels.lng)}
+        else:
+            center = {"lat": np.nanmean(levels.lat[focus]), "lon": np.nanmean(levels.lng[focus])}
+        points = levels.points(column_to_display, zoom, rows=rows)
+
+    report_progress(30, "Rendering map")
+    with metrics.phase("render"):
+        fig = display_points_map(points, column_to_display, center, zoom,
+                                 uirevision=f"points-{selected_state}-{selected_county}")
+    fig.update_layout(showlegend=False)
+    report_progress(90, "Sending map")
+    return fig.to_plotly_json()
+
+def map_viewport(relayout):
+    # (zoom, (lat_min, lat_max, lng_min, lng_max)) after the user zoomed or panned the map
+    zoom = (relayout or {}).get("map.zoom")
+    if zoom is None:
+        return None, None
+    corners = ((relayout.get("map._derived") or {}).get("coordinates"))
+    if not corners:
+        return zoom, None
+    lngs, lats = zip(*corners)
+    return zoom, (min(lats), max(lats), min(lngs), max(lngs))
 
 @app.callback(
-    Output("density-placeholder", "spec"),
-    [Input("state-dropdown", "value"),
-     Input("county-dropdown", "value")]
+    Output("map-placeholder", "figure", allow_duplicate=True),
+    Input("map-placeholder", "relayoutData"),
+    State("map-view", "data"),
+    prevent_initial_call=True,
+)
+@metrics.measure
+def update_map_detail(relayout, view):
+    # the points of a points map are recomputed for the new zoom and viewport
+    if not view or view["args"][3:] != ["points"]:
+        return no_update
+    zoom, bounds = map_viewport(relayout)
+    if zoom is None:
+        return no_update
+    selected_state, _, selected_column, _ = view["args"]
+    column_to_display = selected_column if selected_column else 'microbusiness_density'
+    data = live.current
+    rows = data.stats.rows_for(selected_state) if selected_state else None
+    points = data.points.points(column_to_display, zoom, bounds=bounds, rows=rows)
+    patch = Patch()
+    patch["data"][0] = points_trace(points, column_to_display)
+    return patch
+
+# the month slider and play button step through months in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace="smb", function_name="playStep"),
+    [Output("month-slider", "value"),
+     Output("play-interval", "disabled"),
+     Output("play-button", "children")],
+    [Input("play-button", "n_clicks"),
+     Input("play-interval", "n_intervals")],
+    [State("month-slider", "value"),
+     State("play-interval", "disabled"),
+     State("month-slider", "max")],
+    prevent_initial_call=True,
 )
 
-def update_chart(selected_state=None, selected_county=None):
-    
-    df_smb = df.copy()
-    df_smb["year"] = pd.to_datetime(df_smb["first_day_of_month"]).dt.year  
-
-    chart_title = "Average Business Density Growth Over Time Across USA"
-
-    if not selected_state and not selected_county:
-        filtered_df = df_smb.groupby("year", as_index=False)["microbusiness_density"].mean().round(2)
-
-    else:
-
-        filtered_df = df_smb.copy()
-
-        if selected_state:
-            filtered_df = filtered_df[filtered_df["state"] == selected_state]
-            chart_title = f"Average Business Density Growth Over Time in {selected_state}" 
+app.clientside_callback(
+    ClientsideFunction(namespace="smb", function_name="showMonth"),
+    [Output("map-placeholder", "figure", allow_duplicate=True),
+     Output("month-frames-request", "data"),
+     Output("month-label", "children")],
+    [Input("month-slider", "value"),
+     Input("map-view", "data"),
+     Input("month-frames", "data")],
+    [State("map-placeholder", "figure"),
+     State("month-labels", "data"),
+     State("month-frames-request", "data")],
+    prevent_initial_call=True,
+)
 
-        
-        if selected_county:
-            filtered_df = filtered_df[filtered_df["county"] == selected_county]
-            chart_title = f"Average Business Density Growth Over Time in {selected_county}, {selected_state}" 
+@app.callback(
+    Output("month-frames", "data"),
+    Input("month-frames-request", "data"),
+    prevent_initial_call=True,
+)
+@metrics.measure
+def update_month_frames(view):
+    # fetched once per map view, the first time a month other than the latest is shown
+    return {"view": view, **month_frames(*view["args"])}
+
+@spec_cache.cached("month_frames")
+@shared_cache.cached("month_frames")
+def month_frames(selected_state, selected_county, selected_column, map_mode='areas'):
+    # colour array of every month, in the county order of the map's trace
+    column_to_display = selected_column if selected_column else 'microbusiness_density'
+    panel = live.current.panel
+    if column_to_display not in panel.metrics or map_mode == 'points':
+        # points are aggregated for the zoom they are drawn at, so they always show the latest month
+        return {"z": None}
+    figure = build_map_figure(selected_state, selected_county, selected_column, map_mode)
+    cfips = np.asarray(figure["data"][0]["locations"]).astype(int)
+    z = panel.frames(column_to_display, cfips).round(2)
+    return {"z": np.where(np.isnan(z), None, z).tolist()}
 
+@app.callback(
+    Output("density-placeholder", "spec"),
+    [Input("state-dropdown", "value"),
+     Input("county-dropdown", "value"),
+     Input("compare-dropdown", "value")]
+)
+@metrics.measure
+@spec_cache.cached("density")
+@shared_cache.cached("density")
+def update_chart(selected_state=None, selected_county=None, compared=None):
+    comparison = CountyComparison(live.current, compared)
+    if len(comparison):
+        observed, forecast_df = comparison.yearly_density()
+        if observed.empty:
+            return {}
+        return comparison_chart(observed.round(2), "microbusiness_density", "Microbusiness Density",
+                                "Average Business Density Growth Over Time", forecast_df.round(2))
 
-        filtered_df = filtered_df.groupby("year", as_index=False)["microbusiness_density"].mean().round(2)
+    chart_title = "Average Business Density Growth Over Time Across USA"
+    if selected_county:
+        chart_title = f"Average Business Density Growth Over Time in {selected_county}, {selected_state}" 
+    elif selected_state:
+        chart_title = f"Average Business Density Growth Over Time in {selected_state}" 
 
+    # yearly means straight from the county x month panel
+    data = live.current
+    panel = data.panel
+    rows = panel.rows_for(selected_state, selected_county)
+    filtered_df = panel.yearly_mean("microbusiness_density", rows)
 
     if filtered_df.empty:
         return {}
 
+    filtered_df = filtered_df.rename(columns={"value": "microbusiness_density"}).round(2)
+    # continues from the latest observed year with the forecast months folded in
+    forecast_df = data.forecast.yearly_mean(panel, rows).rename(columns={"value": "microbusiness_density"}).round(2)
+
+    # imported on first use, so a worker boots without loading Altair
+    import altair as alt
+
     line_chart = alt.Chart(filtered_df).mark_line().encode(
         x=alt.X('year:O', title="Year", axis = alt.Axis(labelAngle = 0)),
         y=alt.Y('microbusiness_density:Q', title="Microbusiness Density"),
@@ -295,7 +686,13 @@ def update_chart(selected_state=None, selected_county=None):
         tooltip=['year:O', 'microbusiness_density:Q']
     )
 
-    final_chart = (line_chart + scatter_points).properties(
+    forecast_line = alt.Chart(forecast_df).mark_line(strokeDash=[6, 4], color="gray").encode(
+        x=alt.X('year:O', title="Year"),
+        y=alt.Y('microbusiness_density:Q', title="Microbusiness Density"),
+        tooltip=['year:O', alt.Tooltip('microbusiness_density:Q', title="Forecast")]
+    )
+
+    final_chart = (forecast_line + line_chart + scatter_points).properties(
         width=500, height=300,
         title= chart_title
     ).configure_title(fontSize=15).interactive()
@@ -305,55 +702,88 @@ def update_chart(selected_state=None, selected_county=None):
 @app.callback(
     Output("income-placeholder", "spec"),
     [Input("state-dropdown", "value"),
-     Input("county-dropdown", "value")]
+     Input("county-dropdown", "value"),
+     Input("compare-dropdown", "value")]
 )
-def update_income_chart(selected_state=None, selected_county=None):
-    
-    df_income = df.copy()
-
-    income_columns = [col for col in df_income.columns if col.startswith("median_hh_inc_")]
-    df_income = df_income.melt(id_vars=["state", "county"], 
-                                value_vars=income_columns, 
-                                var_name="year", 
-                                value_name="median_income")
-
-    df_income["year"] = df_income["year"].str.extract("(\d{4})").astype(int)
+@metrics.measure
+@spec_cache.cached("income")
+@shared_cache.cached("income")
+def update_income_chart(selected_state=None, selected_county=None, compared=None):
+    comparison = CountyComparison(live.current, compared)
+    if len(comparison):
+        series = comparison.census_series("median_hh_inc", "median_income")
+        if series.empty:
+            return {}
+        return comparison_chart(series.round(2), "median_income", "Median Household Income",
+                                "Median Household Income Growth Over Time")
+
+    filtered_df = live.current.census_cube.series("median_hh_inc", selected_state, selected_county)
 
     chart_title = "Median Household Income Growth Over Time Across USA"
+    if selected_county:
+        chart_title = f"Median Household Income Growth Over Time in {selected_county}, {selected_state}"
+    elif selected_state:
+        chart_title = f"Median Household Income Growth Over Time in {selected_state}"
 
-    if not selected_state and not selected_county:
-        filtered_df = df_income.groupby("year", as_index=False)["median_income"].mean().round(2)
-
-    else:
-        filtered_df = df_income.copy()
+    if filtered_df.empty:
+        return {}
 
-        if selected_state:
-            filtered_df = filtered_df[filtered_df["state"] == selected_state]
-            chart_title = f"Median Household Income Growth Over Time in {selected_state}"
+    filtered_df = filtered_df.rename(columns={"value": "median_income"}).round(2)
 
-        if selected_county:
-            filtered_df = filtered_df[filtered_df["county"] == selected_county]
-            chart_title = f"Median Household Income Growth Over Time in {selected_county}, {selected_state}"
+    return trend_chart(filtered_df, "median_income", "Median Household Income", "blue", chart_title)
 
-        filtered_df = filtered_df.groupby("year", as_index=False)["median_income"].mean().round(2)
+@app.callback(
+    Output("census-placeholder", "spec"),
+    [Input("state-dropdown", "value"),
+     Input("county-dropdown", "value"),
+     Input("census-metric-dropdown", "value"),
+     Input("compare-dropdown", "value")]
+)
+@metrics.measure
+@spec_cache.cached("census")
+@shared_cache.cached("census")
+def update_census_chart(selected_state=None, selected_county=None, selected_metric=None, compared=None):
+
+    metric = selected_metric if selected_metric else DEFAULT_CENSUS_METRIC
+    label = CENSUS_METRIC_LABELS[metric]
+    comparison = CountyComparison(live.current, compared)
+    if len(comparison):
+        series = comparison.census_series(metric)
+        if series.empty:
+            return {}
+        return comparison_chart(series.round(2), metric, label, f"{label} Over Time")
+    filtered_df = live.current.census_cube.series(metric, selected_state, selected_county)
+
+    chart_title = f"{label} Over Time Across USA"
+    if selected_county:
+        chart_title = f"{label} Over Time in {selected_county}, {selected_state}"
+    elif selected_state:
+        chart_title = f"{label} Over Time in {selected_state}"
 
     if filtered_df.empty:
         return {}
 
-    line_chart = alt.Chart(filtered_df).mark_line().encode(
+    filtered_df = filtered_df.rename(columns={"value": metric}).round(2)
+
+    return trend_chart(filtered_df, metric, label, "orange", chart_title)
+
+def trend_chart(data, value_col, value_title, color, chart_title):
+    import altair as alt
+
+    line_chart = alt.Chart(data).mark_line().encode(
         x=alt.X('year:O', title="Year", axis=alt.Axis(labelAngle=0)),
-        y=alt.Y('median_income:Q', title="Median Household Income"),
-        tooltip=['year:O', 'median_income:Q']
+        y=alt.Y(f'{value_col}:Q', title=value_title),
+        tooltip=['year:O', f'{value_col}:Q']
     )
 
-    scatter_points = alt.Chart(filtered_df).mark_point(
+    scatter_points = alt.Chart(data).mark_point(
         size=120,  
         filled=True,
-        color="blue" 
+        color=color
     ).encode(
         x=alt.X('year:O', title="Year"),
-        y=alt.Y('median_income:Q', title="Median Household Income"),
-        tooltip=['year:O', 'median_income:Q']
+        y=alt.Y(f'{value_col}:Q', title=value_title),
+        tooltip=['year:O', f'{value_col}:Q']
     )
 
     final_chart = (line_chart + scatter_points).properties(
@@ -365,99 +795,264 @@ def update_income_chart(selected_state=None, selected_county=None):
 
     return final_chart.to_dict()
 
+def comparison_chart(data, value_col, value_title, chart_title, forecast_df=None):
+    # one coloured line per compared county, all drawn from the same long frame
+    import altair as alt
+
+    color = alt.Color('county:N', title="County", sort=list(data['county'].cat.categories))
+    line_chart = alt.Chart(data).mark_line(point=alt.OverlayMarkDef(size=80, filled=True)).encode(
+        x=alt.X('year:O', title="Year", axis=alt.Axis(labelAngle=0)),
+        y=alt.Y(f'{value_col}:Q', title=value_title),
+        color=color,
+        tooltip=['county:N', 'year:O', f'{value_col}:Q']
+    )
+    layers = [line_chart]
+    if forecast_df is not None and not forecast_df.empty:
+        layers.insert(0, alt.Chart(forecast_df).mark_line(strokeDash=[6, 4]).encode(
+            x=alt.X('year:O', title="Year"),
+            y=alt.Y(f'{value_col}:Q', title=value_title),
+            color=color,
+            tooltip=['county:N', 'year:O', alt.Tooltip(f'{value_col}:Q', title="Forecast")]
+        ))
+
+    final_chart = alt.layer(*layers).properties(
+        width=500, height=300,
+        title=f"{chart_title}: {len(data['county'].cat.categories)} Counties Compared"
+    ).configure_title(
+        fontSize=15
+    ).interactive()
+
+    return final_chart.to_dict()
+
+@app.callback(
+    [Output("data-table", "data"),
+     Output("data-table", "page_count")],
+    [Input("state-dropdown", "value"),
+     Input("county-dropdown", "value"),
+     Input("data-table", "page_current"),
+     Input("data-table", "page_size"),
+     Input("data-table", "sort_by"),
+     Input("data-table", "filter_query")]
+)
+@metrics.measure
+def update_data_table(selected_state, selected_county, page_current, page_size, sort_by, filter_query):
+    # only the visible page leaves the server
+    records, page_count, _ = live.current.table_backend.page(
+        selected_state, selected_county, page_current, page_size, sort_by, filter_query
+    )
+    return records, page_count
+
+# counties within this distance of the selected county are shown next to it
+NEIGHBOURHOOD_KM = 100
+
+def selection_box(selected_data):
+    # (lat_min, lat_max, lng_min, lng_max) of a box selection on the map, or None
+    corners = next(iter(((selected_data or {}).get("range") or {}).values()), None)
+    if not corners:
+        return None
+    lngs, lats = zip(*corners)
+    return min(lats), max(lats), min(lngs), max(lngs)
+
+@app.callback(
+    Output("metrics-panel", "children"),
+    [Input("state-dropdown", "value"),
+     Input("county-dropdown", "value"),
+     Input("map-placeholder", "selectedData")]
+)
+@metrics.measure
+def update_metrics_panel(selected_state=None, selected_county=None, selected_data=None):
+    # population-weighted figures over the latest month of the selected counties
+    data = live.current
+    box = selection_box(selected_data) if selected_data and ctx.triggered_id == "map-placeholder" else None
+    if box is not None:
+        # counties whose centroid falls in the box drawn on the map, found through the grid index
+        cfips = data.spatial.in_bbox(*box)
+        return metrics_panel(f"Selected area ({len(cfips)} counties)", data.stats.summary(cfips=cfips))
+
+    summary = data.stats.summary(selected_state, selected_county)
+    title = "USA-wide Metrics"
+    neighbourhood = None
+    if selected_county:
+        title = f"{selected_county}, {selected_state}"
+        neighbours, _ = data.spatial.within(data.snapshot.lookup_cfips(selected_state, selected_county), NEIGHBOURHOOD_KM)
+        if len(neighbours):
+            neighbourhood = neighbourhood_box(f"Within {NEIGHBOURHOOD_KM} km",
+                                              data.stats.summary(cfips=neighbours), len(neighbours))
+    elif selected_state:
+        title = f"{selected_state} Metrics"
+    return metrics_panel(title, summary, neighbourhood)
+
+def format_percentile(value):
+    if pd.isna(value):
+        return "N/A"
+    return f"{value}%"
+
+def compared_percentiles(percentiles):
+    # one line per compared county
+    return [html.Div(f"{label}: {format_percentile(value)}", style={'fontSize': '14px'})
+            for label, value in percentiles.items()]
+
 @app.callback(
     [Output("sellability", "children"),
     Output("growth", "children"),
     Output("hireability", "children")],
-    [Input("county-dropdown", "value")]
+    [Input("state-dropdown", "value"),
+     Input("county-dropdown", "value"),
+     Input("compare-dropdown", "value")],
+    **background(cancel=[Input("job-cancel", "n_clicks")])
 )
-def update_BI_cards(county):
-    print(county)
-
+@metrics.measure
+@shared_cache.cached("bi_cards")
+def update_BI_cards(state, county, compared=None):
+    sellability_empty = [
+        dbc.CardHeader("Sellability index"),
+        dbc.CardBody("[Select a county]"),
+        dbc.CardFooter("County percentile median income", style={'fontSize': '12px'})
+    ]
+    growth_empty = [
+        dbc.CardHeader("Growth index"),
+        dbc.CardBody("[Select a county]"),
+        dbc.CardFooter("county percentile for average yealy Microbusiness growth",style={'fontSize': '12px'})
+    ]
+    hireability_empty = [
+        dbc.CardHeader("Hireability index"),
+        dbc.CardBody("[Select a county]"),
+        dbc.CardFooter("County percentile for percent of population with bachelors degree", style={'fontSize': '12px'})
+    ]
+    comparison = CountyComparison(live.current, compared)
+    if len(comparison):
+        # the percentiles of every compared county from one lookup
+        percentiles = comparison.percentiles()
+        return tuple(
+            [card[0], dbc.CardBody(compared_percentiles(percentiles[index])), card[2]]
+            for index, card in zip(["sellability", "growth", "hireability"],
+                                   [sellability_empty, growth_empty, hireability_empty])
+        )
     if not county:
-        sellability_empty = [
-            dbc.CardHeader("Sellability index"),
-            dbc.CardBody("[Select a county]"),
-            dbc.CardFooter("County percentile median income", style={'fontSize': '12px'})
-        ]
-        growth_empty = [
-            dbc.CardHeader("Growth index"),
-            dbc.CardBody("[Select a county]"),
-            dbc.CardFooter("county percentile for average yealy Microbusiness growth",style={'fontSize': '12px'})
-        ]
-        hireability_empty = [
-            dbc.CardHeader("Hireability index"),
-            dbc.CardBody("[Select a county]"),
-            dbc.CardFooter("County percentile for percent of population with bachelors degree", style={'fontSize': '12px'})
-        ]
         return sellability_empty, growth_empty, hireability_empty
-    
-    latest_date = "2022-10-01"
-
-    #calculating sellability index
-    county_income = df[df["county"] == county][f"median_hh_inc_{latest_year}"].iloc[0]
-    sell_df = df[df["first_day_of_month"] == latest_date]
-    sell_df = sell_df[[f"median_hh_inc_{latest_year}"]]
-    clean_sell = sell_df.dropna()
-    sort_sell = np.sort(clean_sell[f"median_hh_inc_{latest_year}"])
-    sell_percentile = round(np.searchsorted(sort_sell,county_income,side = "right")/ len(sort_sell)*100 , 2)
-
-    #calculating Hireability index
-    #note: brown county returns different value on app than in testing. look into
-    county_education = df[df["county"] == county][f"pct_college_{latest_year}"].iloc[0]
-    hire_df = df[df["first_day_of_month"] == latest_date]
-    hire_df = hire_df[[f"pct_college_{latest_year}"]]
-    clean_hire = hire_df.dropna()
-    sort_hire = np.sort(clean_hire[f"pct_college_{latest_year}"])
-    hire_percentile = round(np.searchsorted(sort_hire,county_education,side = "right")/ len(sort_hire)*100 , 2)
-
-
-    # calculating growth index
-    growth_df = df.copy()
-    #create data frame of counties with number of businesses in each year
-    growth_df = growth_df[["county","state", "first_day_of_month","active"]]
-    growth_df["first_day_of_month"] = pd.to_datetime(growth_df["first_day_of_month"])
-    growth_df["year"] = growth_df["first_day_of_month"].dt.year
-    growth_df["month"] = growth_df["first_day_of_month"].dt.month
-    growth_df = growth_df[growth_df["month"] == 10]
-    growth_df = growth_df[["county", "state", "active", "year"]]
-    growth_df = growth_df.pivot(index=["county", "state"], columns = "year", values="active")
-    growth_df = growth_df.reset_index()
-    growth_df.columns = growth_df.columns.astype(str)
-
-    # Calculate percent change between years
-    growth_df['pct_change_2019_2020'] = (growth_df['2020'] - growth_df['2019']) / growth_df['2019'] * 100
-    growth_df['pct_change_2020_2021'] = (growth_df['2021'] - growth_df['2020']) / growth_df['2020'] * 100
-    growth_df['pct_change_2021_2022'] = (growth_df['2022'] - growth_df['2021']) / growth_df['2021'] * 100
-
-    # Calculate the average percent change across these years
-    growth_df['mean_pct_change'] = growth_df[['pct_change_2019_2020', 'pct_change_2020_2021', 'pct_change_2021_2022']].mean(axis=1)
-    growth_df = growth_df[["county", "state", "mean_pct_change"]]
-
-    county_growth = growth_df[growth_df["county"] == county]["mean_pct_change"].iloc[0]
-    clean_growth = growth_df.dropna()
-    sort_growth = np.sort(clean_growth["mean_pct_change"])
-    growth_percentile = round(np.searchsorted(sort_growth, county_growth, side = "right")/ len(sort_growth)*100, 2)
 
+    # county names repeat across states (e.g. Brown County), so rank by cfips
+    data = live.current
+    percentiles = data.ranker.lookup(data.snapshot.lookup_cfips(state, county))
+    if percentiles is None:
+        return sellability_empty, growth_empty, hireability_empty
 
+    sell_percentile = format_percentile(percentiles["sellability"])
+    growth_percentile = format_percentile(percentiles["growth"])
+    hire_percentile = format_percentile(percentiles["hireability"])
 
     sellability_list = [
         dbc.CardHeader("Sellability index"),
-        dbc.CardBody(f"{sell_percentile}%"),
+        dbc.CardBody(sell_percentile),
         dbc.CardFooter("County percentile median income", style={'fontSize': '12px'})
     ]
     growth_list = [
         dbc.CardHeader("Growth index"),
-        dbc.CardBody(f"{growth_percentile}%"),
+        dbc.CardBody(growth_percentile),
         dbc.CardFooter("county percentile for average yealy Microbusiness growth", style={'fontSize': '12px'})
     ]
     hireability_list = [
         dbc.CardHeader("Hireability index"),
-        dbc.CardBody(f"{hire_percentile}%"),
+        dbc.CardBody(hire_percentile),
         dbc.CardFooter("County percentile for percent of population with bachelors degree", style={'fontSize': '12px'})
     ]
     return sellability_list, growth_list, hireability_list
 
+@app.callback(
+    Output("top-sites", "children"),
+    [Input("state-dropdown", "value"),
+     Input("top-k", "value"),
+     Input("score-method", "value")]
+    + [Input(f"weight-{metric}", "value") for metric in SCORE_METRICS]
+)
+@metrics.measure
+def update_top_sites(selected_state, k, method, *weights):
+    top = live.current.scorer.top(dict(zip(SCORE_METRICS, weights)), k, selected_state, method)
+    if top.empty:
+        return html.P("No county has data for the selected metrics")
+    table = top[['rank', 'county', 'state', 'score']].round({'score': 2})
+    table.columns = ["Rank", "County", "State", "Score"]
+    return dbc.Table.from_dataframe(table, striped=True, bordered=False, hover=True, size='sm')
+
+def top_sites_view():
+    # GET /api/top-sites?sellability=2&growth=1&k=10&state=Texas&method=zscore
+    args = flask.request.args
+    weights = {metric: args[metric] for metric in SCORE_METRICS if metric in args} or DEFAULT_SCORE_WEIGHTS
+    try:
+        weights = {metric: float(weight) for metric, weight in weights.items()}
+        method = args.get('method', 'percentile')
+        top = live.current.scorer.top(weights, int(args.get('k', 10)), args.get('state'), method)
+    except ValueError as err:
+        return flask.jsonify(error=str(err)), 400
+    # NaN percentiles become null
+    records = top.astype(object).where(top.notna(), None).to_dict('records')
+    return flask.jsonify(weights=weights, method=method, state=args.get('state'), counties=records)
+
+server.add_url_rule("/api/top-sites", "smb_top_sites", top_sites_view)
+
+def export_view():
+    # GET /api/export?state=Texas&metric=active&start=2021-01&end=2022-06&format=parquet
+    args = flask.request.args
+    fmt = args.get('format', 'csv')
+    # one dataset version for the whole download, even if a new one is swapped in meanwhile
+    backend = live.current.table_backend
+    try:
+        requested = [m for value in args.getlist('metric') for m in value.split(',') if m]
+        columns = export_columns(backend.columns, requested)
+        start, end = (pd.Timestamp(args[key]).strftime('%Y-%m-%d') if args.get(key) else None
+                      for key in ('start', 'end'))
+        rows = backend.rows(args.get('state'), args.get('county'), args.get('filter', ''), start, end)
+        body = stream_export(backend.frame, rows, columns, fmt)
+    except ValueError as err:
+        return flask.jsonify(error=str(err)), 400
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    # a generator body is sent with chunked transfer encoding as it is produced
+    return flask.Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="smb_export.{extension}"',
+    })
+
+server.add_url_rule("/api/export", "smb_export", export_view)
+
+# callbacks whose output only depends on their inputs and the dataset: the map and the charts
+CONDITIONAL_OUTPUTS = ("map-placeholder.figure", "density-placeholder.spec", "income-placeholder.spec",
+                       "census-placeholder.spec")
+
+# gzip/brotli responses, and 304s for map and chart requests whose response the browser already holds
+compression = ResponseCompression.from_env(version=lambda: shared_cache.version,
+                                           conditional_outputs=CONDITIONAL_OUTPUTS)
+if compression:
+    compression.init_app(server)
+    # conditional_requests.js sends If-None-Match only for these callbacks, installed before the renderer starts
+    app.renderer = f"window.smbConditionalRequests.install({json.dumps(list(CONDITIONAL_OUTPUTS))});" + app.renderer
+
+# optionally pre-render the national and per-state chart specs at startup
+if os.environ.get("SMB_WARM_SPEC_CACHE"):
+    # inputs after state and county as the page first sends them: nothing compared, default census metric
+    warm_up({
+        update_chart: (None,),
+        update_income_chart: (None,),
+        update_census_chart: (DEFAULT_CENSUS_METRIC, None),
+    }, live.current.unique_states)
+
+# wrap every callback registered above and expose the numbers on /metrics
+metrics.instrument(app)
+metrics.add_gauges(lambda: {
+    "smb_spec_cache_entries": len(spec_cache),
+    "smb_spec_cache_hits_total": spec_cache.hits,
+    "smb_spec_cache_misses_total": spec_cache.misses,
+    "smb_dataset_rows": len(live.current.df),
+    "smb_dataset_swaps_total": live.swaps,
+    "smb_ingested_rows_total": live.ingested_rows,
+    **({f"smb_background_jobs_{status}": count for status, count in background_manager.store.counts().items()}
+       if pooled_jobs else {}),
+})
+if compression:
+    metrics.add_gauges(compression.gauges)
+metrics.expose(server)
+
+# restart the file watcher in each worker forked after import
+server.before_request(live.ensure_watching)
+
 if __name__ == '__main__':
     #app.run(debug = True)
     app.server.run(port= 8001, host='127.0.0.1')
\ No newline at end of file
@@ -0,0 +1,117 @@
+// Clientside callbacks: resolved in the browser from the county lookup in
+// the `county-lookup` store (see CountySnapshot.county_lookup), no server hop.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    smb: {
+        // counties of the selected state as dropdown options
+        countyOptions: function(state, lookup) {
+            if (!state || !lookup || !lookup.states[state]) {
+                return [];
+            }
+            return lookup.states[state].map(function(cfips) {
+                var county = lookup.counties[cfips][1];
+                return {label: county, value: county};
+            });
+        },
+
+        // clicking a county on the map selects its state and county
+        selectClickedCounty: function(clickData, lookup) {
+            var noUpdate = window.dash_clientside.no_update;
+            if (!clickData || !clickData.points || !clickData.points.length || !lookup) {
+                return [noUpdate, noUpdate];
+            }
+            // an area carries its cfips as location, a point its cfips or state as customdata
+            var point = clickData.points[0];
+            var key = point.location || point.customdata;
+            if (key && lookup.states && lookup.states.hasOwnProperty(key)) {
+                return [key, null];
+            }
+            var match = lookup.counties[key];
+            if (!match) {
+                return [noUpdate, noUpdate];
+            }
+            return [match[0], match[1]];
+        },
+
+        // every county as a compare option; once `limit` are picked the others are disabled
+        compareOptions: function(selected, lookup, limit) {
+            if (!lookup) {
+                return [];
+            }
+            var full = selected && selected.length >= limit;
+            var options = [];
+            Object.keys(lookup.states).sort().forEach(function(state) {
+                lookup.states[state].forEach(function(cfips) {
+                    options.push({
+                        label: lookup.counties[cfips][1] + ", " + state,
+                        value: cfips,
+                        disabled: full && selected.indexOf(cfips) === -1
+                    });
+                });
+            });
+            return options;
+        },
+
+        // export links for the rows behind the data table, one per format
+        exportLinks: function(state, county, filterQuery) {
+            var params = [];
+            if (state) {
+                params.push("state=" + encodeURIComponent(state));
+            }
+            if (county) {
+                params.push("county=" + encodeURIComponent(county));
+            }
+            if (filterQuery) {
+                params.push("filter=" + encodeURIComponent(filterQuery));
+            }
+            return ["csv", "parquet", "arrow"].map(function(format) {
+                return "/api/export?" + params.concat(["format=" + format]).join("&");
+            });
+        },
+
+        // the play button starts and pauses the interval, each tick moves the slider one month
+        playStep: function(nClicks, nIntervals, month, paused, last) {
+            var noUpdate = window.dash_clientside.no_update;
+            var triggered = window.dash_clientside.callback_context.triggered.map(function(t) {
+                return t.prop_id;
+            });
+            if (triggered.indexOf("play-button.n_clicks") >= 0) {
+                if (!paused) {
+                    return [noUpdate, true, "Play"];
+                }
+                // playing from the last month starts over
+                return [month >= last ? 0 : noUpdate, false, "Pause"];
+            }
+            if (paused) {
+                return [noUpdate, noUpdate, noUpdate];
+            }
+            if (month >= last) {
+                return [noUpdate, true, "Play"];
+            }
+            return [month + 1, noUpdate, noUpdate];
+        },
+
+        // show the slider's month by swapping the colour array of the map trace;
+        // the frames of the current view are requested from the server once
+        showMonth: function(month, view, frames, figure, labels, requested) {
+            var noUpdate = window.dash_clientside.no_update;
+            var label = labels && labels[month] !== undefined ? labels[month] : noUpdate;
+            if (month === null || month === undefined || !view || !figure || !figure.data || !figure.data.length) {
+                return [noUpdate, noUpdate, label];
+            }
+            var key = JSON.stringify(view);
+            if (!frames || JSON.stringify(frames.view) !== key) {
+                // the server draws the latest month, anything else needs this view's frames
+                var latest = labels ? labels.length - 1 : month;
+                var request = month === latest || JSON.stringify(requested) === key ? noUpdate : view;
+                return [noUpdate, request, label];
+            }
+            if (!frames.z || !frames.z[month]) {
+                return [noUpdate, noUpdate, label];
+            }
+            // same geometry and locations, so Plotly only recolours the map
+            var data = figure.data.slice();
+            data[0] = Object.assign({}, figure.data[0], {z: frames.z[month]});
+            return [Object.assign({}, figure, {data: data}), noUpdate, label];
+        }
+    }
+});
@@ -0,0 +1,98 @@
+// Conditional callback requests: the server tags the responses of the map and
+// chart callbacks with an ETag of the request and the dataset version (see
+// ResponseCompression.conditional_outputs). Nothing is changed until the app
+// calls `install` with those outputs (app.renderer does, when compression is
+// on); from then on only callback POSTs for one of them go through here, and
+// every other request goes straight to the browser's fetch. The latest tagged
+// responses are kept per request body, within MAX_BYTES; when the renderer
+// makes the same request again the tag is sent back, and on a 304 the kept
+// response is handed to the renderer, so the callback neither runs nor is re-sent.
+window.smbConditionalRequests = (function() {
+    // total size of the kept bodies, in characters
+    var MAX_BYTES = 4 * 1024 * 1024;
+    // a body larger than this is not kept: it would push out everything else
+    var MAX_ENTRY_BYTES = 1024 * 1024;
+    var UPDATE_PATH = '/_dash-update-component';
+    var responses = new Map();
+    var keptBytes = 0;
+
+    function forget(key) {
+        var entry = responses.get(key);
+        if (entry) {
+            keptBytes -= entry.body.length;
+            responses.delete(key);
+        }
+    }
+
+    function remember(key, entry) {
+        forget(key);
+        responses.set(key, entry);
+        keptBytes += entry.body.length;
+        while (keptBytes > MAX_BYTES) {
+            forget(responses.keys().next().value);
+        }
+    }
+
+    // a callback POST whose outputs include one of `outputs`
+    function isConditional(input, init, outputs) {
+        if (!init || init.method !== 'POST' || typeof init.body !== 'string') {
+            return false;
+        }
+        var url = new URL(typeof input === 'string' ? input : input.url, window.location.href);
+        // background job polls carry a query string and change every time
+        if (url.pathname.slice(-UPDATE_PATH.length) !== UPDATE_PATH || url.search) {
+            return false;
+        }
+        var output;
+        try {
+            output = JSON.parse(init.body).output;
+        } catch (e) {
+            return false;
+        }
+        return typeof output === 'string' && outputs.some(function(id) {
+            return output.indexOf(id) !== -1;
+        });
+    }
+
+    function conditionalFetch(nativeFetch, input, init) {
+        var key = init.body;
+        var kept = responses.get(key);
+        if (kept) {
+            var headers = new Headers(init.headers || {});
+            headers.set('If-None-Match', kept.etag);
+            init = Object.assign({}, init, {headers: headers});
+        }
+
+        return nativeFetch(input, init).then(function(response) {
+            if (response.status === 304 && kept) {
+                remember(key, kept);
+                return new Response(kept.body, {status: 200, headers: {'Content-Type': kept.contentType}});
+            }
+            var etag = response.headers.get('ETag');
+            if (response.status !== 200 || !etag) {
+                forget(key);
+                return response;
+            }
+            return response.clone().text().then(function(body) {
+                if (body.length > MAX_ENTRY_BYTES) {
+                    forget(key);
+                } else {
+                    remember(key, {etag: etag, body: body, contentType: response.headers.get('Content-Type')});
+                }
+                return response;
+            });
+        });
+    }
+
+    return {
+        install: function(outputs) {
+            var nativeFetch = window.fetch.bind(window);
+            window.fetch = function(input, init) {
+                if (!isConditional(input, init, outputs)) {
+                    return nativeFetch(input, init);
+                }
+                return conditionalFetch(nativeFetch, input, init);
+            };
+        }
+    };
+})();
@@ -0,0 +1,306 @@
+"""
+Benchmark the dashboard callbacks on synthetic data of increasing size.
+
+For every requested scale a synthetic `smb_enriched` store and county GeoJSON
+are generated, a fresh interpreter imports the app against them, and the
+callbacks are driven directly (bypassing the spec/shared caches). Reported
+per callback: p50/p95 latency, peak Python memory during one call and the
+JSON payload size Dash would send. Results are saved as JSON so runs can be
+compared across versions with --compare.
+
+Run from the repository root, e.g.:
+
+    python src/benchmark.py --scale 1x1 --scale 10x1 --scale 1x10
+    python src/benchmark.py --compare benchmarks/<previous>.json
+
+A scale is GEOxMONTHS: `10x1` is ten times the counties, `1x10` ten times the months.
+
+With --startup, worker boot is measured as well: fresh interpreters import the
+app with and without a startup bundle (SMB_STARTUP_BUNDLE) and time the import
+and the first response (the page, its layout and the national map callback).
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SRC_DIR)
+
+
+def run_worker(repeats, seed):
+    """Import the app (data paths come from the environment) and time its callbacks."""
+    import inspect
+    import random
+    import tracemalloc
+
+    import numpy as np
+    from plotly.io.json import to_json_plotly
+
+    start = time.perf_counter()
+    import app
+    startup = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    data = app.live.current
+    states = list(data.unique_states)
+    pairs = [(state, county) for state in states for county in data.state_county_mapping[state]]
+
+    def raw(callback):
+        # skip the metrics and cache decorators to time the actual work
+        return inspect.unwrap(callback)
+
+    def sample_state():
+        return (rng.choice(states),)
+
+    def sample_pair():
+        return rng.choice(pairs)
+
+    def shown_view():
+        # the browser shows another state's map, so update_map can send a patch
+        _, view = app.update_map(*sample_state(), None, 'microbusiness_density', 'areas', None)
+        return view
+
+    def sample_compared():
+        # the most counties the compare dropdown takes, from any state
+        codes = rng.sample(sorted(app.live.current.county_lookup['counties']), app.MAX_COMPARED)
+        return (None, None, codes)
+
+    points_view = {"args": [None, None, 'microbusiness_density', 'points']}
+
+    def zoomed_view():
+        # relayout of a points map zoomed in to grid clusters around a random county
+        lat, lng = app.live.current.points.lat, app.live.current.points.lng
+        i = rng.randrange(len(lat))
+        if np.isnan(lat[i]):
+            return {"map.zoom": 5}
+        corners = [[lng[i] + dx, lat[i] + dy] for dx in (-6, 6) for dy in (-3, 3)]
+        return {"map.zoom": 5, "map._derived": {"coordinates": corners}}
+
+    cases = {
+        'update_map[national]': (raw(app.update_map), lambda: (None, None, 'microbusiness_density', 'areas', None)),
+        'update_map[state]': (raw(app.update_map), lambda: sample_state() + (None, 'microbusiness_density', 'areas', None)),
+        'update_map[county]': (raw(app.update_map), lambda: sample_pair() + ('microbusiness_density', 'areas', None)),
+        'update_map[state patch]': (raw(app.update_map), lambda: sample_state() + (None, 'microbusiness_density', 'areas', shown_view())),
+        'update_map[points]': (raw(app.update_map), lambda: (None, None, 'microbusiness_density', 'points', None)),
+        'update_map_detail': (raw(app.update_map_detail), lambda: (zoomed_view(), points_view)),
+        'month_frames[national]': (raw(app.month_frames), lambda: (None, None, 'microbusiness_density')),
+        'update_chart': (raw(app.update_chart), sample_pair),
+        'update_income_chart': (raw(app.update_income_chart), sample_pair),
+        'update_chart[compare]': (raw(app.update_chart), sample_compared),
+        'update_income_chart[compare]': (raw(app.update_income_chart), sample_compared),
+        'update_BI_cards': (raw(app.update_BI_cards), sample_pair),
+        'update_BI_cards[compare]': (raw(app.update_BI_cards), sample_compared),
+        'update_metrics_panel': (raw(app.update_metrics_panel), sample_state),
+        'update_metrics_panel[county]': (raw(app.update_metrics_panel), sample_pair),
+        'update_top_sites': (raw(app.update_top_sites),
+                             lambda: sample_state() + (10, 'percentile') + tuple(rng.randint(0, 5) for _ in range(5))),
+    }
+
+    results = {}
+    for name, (callback, make_args) in cases.items():
+        timings = []
+        for _ in range(repeats):
+            # update_map builds its figure through the per-worker map cache; start cold
+            app.map_cache.clear()
+            args = make_args()
+            t0 = time.perf_counter()
+            callback(*args)
+            timings.append(time.perf_counter() - t0)
+
+        app.map_cache.clear()
+        args = make_args()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        output = callback(*args)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+
+        results[name] = {
+            'p50_ms': float(np.percentile(timings, 50) * 1000),
+            'p95_ms': float(np.percentile(timings, 95) * 1000),
+            'peak_mem_mb': peak / 1e6,
+            'payload_kb': len(to_json_plotly(output)) / 1e3,
+        }
+
+    return {
+        'startup_s': startup,
+        'rows': len(app.df),
+        'counties': int(app.df['cfips'].nunique()),
+        'callbacks': results,
+    }
+
+
+# Runs in a fresh interpreter (cwd and data paths as for the worker) so nothing is imported yet.
+STARTUP_PROBE = """
+import json, resource, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.server.test_client()
+client.get('/')
+client.get('/_dash-layout')
+response = client.post('/_dash-update-component', json={
+    'output': '..map-placeholder.figure...map-view.data..',
+    'outputs': [{'id': 'map-placeholder', 'property': 'figure'}, {'id': 'map-view', 'property': 'data'}],
+    'inputs': [{'id': 'state-dropdown', 'property': 'value', 'value': None},
+               {'id': 'county-dropdown', 'property': 'value', 'value': None},
+               {'id': 'column-dropdown', 'property': 'value', 'value': 'microbusiness_density'},
+               {'id': 'map-mode', 'property': 'value', 'value': 'areas'}],
+    'state': [{'id': 'map-view', 'property': 'data', 'value': None}],
+    'changedPropIds': [],
+})
+assert response.status_code == 200, response.status_code
+print(json.dumps({'import_s': imported - start, 'first_response_s': time.perf_counter() - imported,
+                  'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def run_startup(env, runs):
+    """Median import and first-response time of fresh workers, without and with a startup bundle."""
+    import statistics
+
+    bundle_path = os.path.join(os.path.dirname(env['SMB_DATA_STORE']), 'startup_bundle.pkl')
+    modes = {'build': dict(env), 'bundle': dict(env, SMB_STARTUP_BUNDLE=bundle_path)}
+    results = {}
+    for mode, mode_env in modes.items():
+        if mode == 'bundle':
+            # the first boot writes the bundle; only boots that read it are timed
+            subprocess.run([sys.executable, '-c', 'import app'], capture_output=True, env=mode_env, cwd=ROOT_DIR)
+        probes = []
+        for _ in range(runs):
+            result = subprocess.run([sys.executable, '-c', STARTUP_PROBE], capture_output=True, text=True,
+                                    env=mode_env, cwd=ROOT_DIR)
+            if result.returncode != 0:
+                raise RuntimeError(f"startup probe failed ({mode}):\n{result.stderr}")
+            probes.append(json.loads(result.stdout.strip().splitlines()[-1]))
+        results[mode] = {key: statistics.median(probe[key] for probe in probes) for key in probes[0]}
+    return results
+
+
+def parse_scale(text):
+    geo, months = text.lower().split('x')
+    return float(geo), float(months)
+
+
+def run_scale(scale, repeats, seed, startup_runs=0):
+    try:
+        from components.synthetic import generate_enriched, generate_counties_geojson
+        from components.store import write_store
+    except ModuleNotFoundError:
+        from src.components.synthetic import generate_enriched, generate_counties_geojson
+        from src.components.store import write_store
+
+    geo_scale, month_scale = parse_scale(scale)
+    with tempfile.TemporaryDirectory(prefix='smb-bench-') as tmp:
+        df = generate_enriched(geo_scale, month_scale, seed=seed)
+        store_path = os.path.join(tmp, 'smb_enriched.arrow')
+        geojson_path = os.path.join(tmp, 'counties.json')
+        write_store(df, store_path)
+        with open(geojson_path, 'w') as f:
+            json.dump(generate_counties_geojson(df), f)
+        del df
+
+        env = dict(os.environ, SMB_DATA_STORE=store_path, SMB_COUNTIES_GEOJSON=geojson_path,
+                   PYTHONPATH=SRC_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+        for name in ('SMB_SHARED_CACHE', 'SMB_WARM_SPEC_CACHE', 'SMB_PROFILE_DIR', 'SMB_STARTUP_BUNDLE'):
+            env.pop(name, None)
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', '--repeats', str(repeats), '--seed', str(seed)],
+            capture_output=True, text=True, env=env, cwd=ROOT_DIR,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"benchmark worker failed for scale {scale}:\n{result.stderr}")
+        scale_result = json.loads(result.stdout.strip().splitlines()[-1])
+        if startup_runs:
+            scale_result['startup'] = run_startup(env, startup_runs)
+    return scale_result
+
+
+def git_commit():
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=ROOT_DIR)
+    return result.stdout.strip() or 'unknown'
+
+
+def print_report(results, previous=None, threshold=0.2):
+    """Print the results table; with `previous`, flag p50 regressions above `threshold`."""
+    regressions = []
+    for scale, scale_result in results['scales'].items():
+        print(f"\nScale {scale}: {scale_result['rows']:,} rows, {scale_result['counties']:,} counties, "
+              f"startup {scale_result['startup_s']:.2f}s")
+        print(f"{'callback':<30}{'p50 ms':>10}{'p95 ms':>10}{'peak MB':>10}{'payload KB':>12}  change")
+        before = (previous or {}).get('scales', {}).get(scale, {}).get('callbacks', {})
+        for name, stats in scale_result['callbacks'].items():
+            change = ''
+            if name in before and before[name]['p50_ms'] > 0:
+                ratio = stats['p50_ms'] / before[name]['p50_ms'] - 1
+                change = f"{ratio:+.0%}"
+                if ratio > threshold:
+                    change += '  REGRESSION'
+                    regressions.append((scale, name, ratio))
+            print(f"{name:<30}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+                  f"{stats['peak_mem_mb']:>10.1f}{stats['payload_kb']:>12.1f}  {change}")
+        if 'startup' in scale_result:
+            print(f"{'worker boot':<26}{'import s':>10}{'first s':>10}{'RSS MB':>10}")
+            for mode, stats in scale_result['startup'].items():
+                print(f"{mode:<26}{stats['import_s']:>10.2f}{stats['first_response_s']:>10.2f}{stats['max_rss_mb']:>10.0f}")
+    return regressions
+
+
+def latest_result(directory):
+    files = sorted(glob.glob(os.path.join(directory, '*.json')))
+    return files[-1] if files else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', action='append', help='GEOxMONTHS multiplier (repeatable, default 1x1)')
+    parser.add_argument('--repeats', type=int, default=20, help='timed calls per callback')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=os.path.join(ROOT_DIR, 'benchmarks'), help='directory for result files')
+    parser.add_argument('--compare', help="previous result file, or 'latest' for the newest in --output")
+    parser.add_argument('--threshold', type=float, default=0.2, help='p50 slowdown reported as a regression')
+    parser.add_argument('--startup', type=int, nargs='?', const=3, default=0, metavar='RUNS',
+                        help='also time worker boot with and without a startup bundle (median of RUNS, default 3)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.repeats, args.seed)))
+        return
+
+    previous_path = latest_result(args.output) if args.compare == 'latest' else args.compare
+    previous = None
+    if previous_path:
+        with open(previous_path) as f:
+            previous = json.load(f)
+
+    results = {
+        'meta': {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': git_commit(),
+                 'python': platform.python_version(), 'repeats': args.repeats},
+        'scales': {},
+    }
+    for scale in args.scale or ['1x1']:
+        print(f"Running scale {scale}...", flush=True)
+        results['scales'][scale] = run_scale(scale, args.repeats, args.seed, args.startup)
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['meta']['commit']}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    regressions = print_report(results, previous, args.threshold)
+    print(f"\nSaved results to {path}")
+    if previous_path:
+        print(f"Compared against {previous_path}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
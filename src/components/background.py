@@ -0,0 +1,461 @@
+import contextlib
+import logging
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextvars import ContextVar, copy_context
+
+import dash
+import flask
+from dash.exceptions import PreventUpdate
+
+# Jobs get the same callback context a Dash callback sees, built with the private
+# helpers Dash's own managers use. Written against Dash 2.18 (pinned in
+# requirements.txt and environment.yaml); on any other version `from_env` falls
+# back to Dash's own DiskcacheManager, or fails at startup when it can't.
+SUPPORTED_DASH = "2.18."
+try:
+    from dash.long_callback.managers import BaseLongCallbackManager
+    from dash.long_callback._proxy_set_props import ProxySetProps
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+except ImportError:
+    BaseLongCallbackManager = object
+    ProxySetProps = context_value = AttributeDict = None
+
+logger = logging.getLogger(__name__)
+
+# managers by token, so pool processes (forked from the worker) find theirs without pickling it
+_MANAGERS = {}
+
+# (store, job key) of the background job running in this process, if any
+_current_job = ContextVar('smb_background_job', default=None)
+
+QUEUED, RUNNING, DONE, CANCELLED = 'queued', 'running', 'done', 'cancelled'
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by `report_progress` once every request waiting for it has gone."""
+
+
+def report_progress(*values):
+    """
+    Send progress values to the `progress` outputs of the running background job.
+
+    Does nothing when the callback is not running as a background job, so
+    callbacks can call it unconditionally. Raises JobCancelled when the job
+    was cancelled, which is how a running job stops early.
+    """
+    job = _current_job.get()
+    if job is None:
+        return
+    store, key = job
+    if store.status(key) == CANCELLED:
+        raise JobCancelled(key)
+    store.set_progress(key, list(values))
+
+
+def _encode(value):
+    return zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+
+def _decode(blob):
+    return pickle.loads(zlib.decompress(blob))
+
+
+def _alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def job_key(waiter):
+    """The job a waiter id (as returned by `JobStore.attach`) belongs to."""
+    return waiter.rsplit(':', 1)[0]
+
+
+class JobStore:
+    """
+    Background job states, progress and results in a local SQLite file.
+
+    Every gunicorn worker opens the same file, so a poll for a job can be
+    answered by any worker, whichever one submitted it. Each request waiting
+    for a job is a row of its own (a waiter), so a job is cancelled once its
+    last waiter is gone, and `set_props` updates of the job are delivered to
+    every waiter, each keeping its own position in them. Finished jobs are
+    kept for `result_ttl` seconds so every waiting request can collect the
+    result.
+    """
+
+    def __init__(self, path, result_ttl=60):
+        self.path = path
+        self.result_ttl = result_ttl
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if columns and 'stats' not in columns:
+            # a job store of an older version; jobs only live for a minute, start afresh
+            conn.execute("DROP TABLE jobs")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "key TEXT PRIMARY KEY, status TEXT, owner INTEGER, pid INTEGER, "
+            "progress BLOB, result BLOB, stats BLOB, updated REAL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS waiters (waiter TEXT PRIMARY KEY, key TEXT, seen INTEGER)")
+        conn.execute("CREATE INDEX IF NOT EXISTS waiters_key ON waiters (key)")
+        conn.execute("CREATE TABLE IF NOT EXISTS props ("
+                     "seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, component_id TEXT, props BLOB)")
+        conn.execute("CREATE INDEX IF NOT EXISTS props_key ON props (key, seq)")
+
+    def _connection(self):
+        # one connection per thread and per process (pool processes are forked)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def attach(self, key):
+        """
+        Register a request for job `key`, as (waiter id, whether the caller has to submit the job).
+
+        A queued or running job, or a finished one still within `result_ttl`,
+        is shared: the request only joins its waiters.
+        """
+        now = time.time()
+        waiter = f"{key}:{uuid.uuid4().hex}"
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?",
+                         (DONE, CANCELLED, now - self.result_ttl))
+            conn.execute("DELETE FROM waiters WHERE key NOT IN (SELECT key FROM jobs)")
+            conn.execute("DELETE FROM props WHERE key NOT IN (SELECT key FROM jobs)")
+            row = conn.execute("SELECT status, owner, pid FROM jobs WHERE key = ?", (key,)).fetchone()
+            shared = row is not None and (
+                row[0] == DONE
+                or row[0] == QUEUED and _alive(row[1])
+                or row[0] == RUNNING and _alive(row[2])
+            )
+            if not shared:
+                # a cancelled job or one whose process died: start over, without its waiters and updates
+                conn.execute("DELETE FROM waiters WHERE key = ?", (key,))
+                conn.execute("DELETE FROM props WHERE key = ?", (key,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO jobs (key, status, owner, pid, updated) "
+                    "VALUES (?, ?, ?, NULL, ?)", (key, QUEUED, os.getpid(), now))
+            conn.execute("INSERT INTO waiters (waiter, key, seen) VALUES (?, ?, 0)", (waiter, key))
+        return waiter, not shared
+
+    def detach(self, waiter):
+        """Drop a waiting request; the job is cancelled once none is left. Detaching twice is a no-op."""
+        with self._transaction() as conn:
+            if conn.execute("DELETE FROM waiters WHERE waiter = ?", (waiter,)).rowcount == 0:
+                return
+            key = job_key(waiter)
+            if conn.execute("SELECT 1 FROM waiters WHERE key = ? LIMIT 1", (key,)).fetchone() is None:
+                conn.execute("UPDATE jobs SET status = ?, updated = ? WHERE key = ? AND status IN (?, ?)",
+                             (CANCELLED, time.time(), key, QUEUED, RUNNING))
+
+    def waiters(self, key):
+        return self._connection().execute("SELECT COUNT(*) FROM waiters WHERE key = ?", (key,)).fetchone()[0]
+
+    def start(self, key):
+        """Mark a queued job as running in this process; False if it was cancelled meanwhile."""
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = ?, pid = ?, updated = ? WHERE key = ? AND status = ?",
+            (RUNNING, os.getpid(), time.time(), key, QUEUED))
+        return cursor.rowcount == 1
+
+    def finish(self, key, result, stats=None):
+        # plotly figures as plain dicts: unpickling a Figure re-runs its validation
+        if hasattr(result, 'to_plotly_json'):
+            result = result.to_plotly_json()
+        self._connection().execute(
+            "UPDATE jobs SET status = ?, result = ?, stats = ?, updated = ? WHERE key = ? AND status = ?",
+            (DONE, _encode(result), None if stats is None else _encode(stats), time.time(), key, RUNNING))
+
+    def forget(self, key):
+        """Drop job `key` with its waiters and updates, whatever its state."""
+        with self._transaction() as conn:
+            for table in ('jobs', 'waiters', 'props'):
+                conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+
+    def status(self, key):
+        row = self._connection().execute("SELECT status FROM jobs WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def running(self, key):
+        row = self._connection().execute("SELECT status, owner, pid FROM jobs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False
+        status, owner, pid = row
+        return status == QUEUED and _alive(owner) or status == RUNNING and _alive(pid)
+
+    def set_progress(self, key, values):
+        self._connection().execute("UPDATE jobs SET progress = ? WHERE key = ?", (_encode(values), key))
+
+    def progress(self, key):
+        row = self._connection().execute("SELECT progress FROM jobs WHERE key = ?", (key,)).fetchone()
+        return _decode(row[0]) if row and row[0] is not None else None
+
+    def set_props(self, key, component_id, props):
+        """Queue a `set_props` update of the job for all of its waiters."""
+        self._connection().execute("INSERT INTO props (key, component_id, props) VALUES (?, ?, ?)",
+                                   (key, component_id, _encode(props)))
+
+    def updated_props(self, waiter):
+        """The job's `set_props` updates this waiter has not received yet, merged per component."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT key, seen FROM waiters WHERE waiter = ?", (waiter,)).fetchone()
+            if row is None:
+                return {}
+            key, seen = row
+            rows = conn.execute("SELECT seq, component_id, props FROM props WHERE key = ? AND seq > ? ORDER BY seq",
+                                (key, seen)).fetchall()
+            if not rows:
+                return {}
+            conn.execute("UPDATE waiters SET seen = ? WHERE waiter = ?", (rows[-1][0], waiter))
+        updated = {}
+        for _, component_id, props in rows:
+            updated[component_id] = {**updated.get(component_id, {}), **_decode(props)}
+        return updated
+
+    def pop_stats(self, key):
+        """Measurements of a finished job, returned to the first caller only."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT stats FROM jobs WHERE key = ? AND stats IS NOT NULL", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET stats = NULL WHERE key = ?", (key,))
+        return _decode(row[0])
+
+    def result(self, key, missing=None):
+        row = self._connection().execute(
+            "SELECT result FROM jobs WHERE key = ? AND status = ?", (key, DONE)).fetchone()
+        return _decode(row[0]) if row else missing
+
+    def counts(self):
+        return dict(self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+def _run_job(token, fn_key, key, args, context):
+    """Body of a pool task: run the registered callback and store its result."""
+    manager = _MANAGERS[token]
+    store = manager.store
+    if not store.start(key):
+        return
+
+    def run():
+        ctx = AttributeDict(**context)
+        ctx.ignore_register_page = False
+        ctx.updated_props = ProxySetProps(lambda component_id, props: store.set_props(key, component_id, props))
+        context_value.set(ctx)
+        _current_job.set((store, key))
+        fn = manager.functions_by_key[fn_key]
+        recording = manager.metrics.recording() if manager.metrics is not None else contextlib.nullcontext()
+        with recording as record:
+            try:
+                if isinstance(args, dict):
+                    result = fn(**args)
+                elif isinstance(args, (list, tuple)):
+                    result = fn(*args)
+                else:
+                    result = fn(args)
+            except JobCancelled:
+                return
+            except PreventUpdate:
+                result = {"_dash_no_update": "_dash_no_update"}
+            except Exception as err:
+                result = {"long_callback_error": {"msg": str(err), "tb": traceback.format_exc()}}
+        # the measurements go back with the result: this process's metrics are never served
+        stats = (fn.__name__, record) if record is not None else None
+        store.finish(key, result, stats)
+
+    copy_context().run(run)
+
+
+def supported_dash():
+    """Whether the installed Dash has the internals PoolCallbackManager is written against."""
+    return ProxySetProps is not None and dash.__version__.startswith(SUPPORTED_DASH)
+
+
+def stock_manager(path, version=None):
+    """
+    Dash's DiskcacheManager with its cache at `path`.diskcache, keyed on `version()`
+    like PoolCallbackManager. Raises RuntimeError when diskcache is not installed.
+    """
+    try:
+        import diskcache
+        manager = dash.DiskcacheManager(diskcache.Cache(f"{path}.diskcache"),
+                                        cache_by=[version] if version is not None else None)
+    except ImportError:
+        raise RuntimeError(f"SMB_BACKGROUND_JOBS needs Dash {SUPPORTED_DASH}x (installed: {dash.__version__}), "
+                           "or `pip install dash[diskcache]` for Dash's DiskcacheManager; "
+                           "unset SMB_BACKGROUND_JOBS or install the version in requirements.txt") from None
+    logger.warning("Dash %s is not %sx: background jobs use Dash's DiskcacheManager, "
+                   "without job sharing or progress", dash.__version__, SUPPORTED_DASH)
+    return manager
+
+
+class PoolCallbackManager(BaseLongCallbackManager):
+    """
+    Dash background callback manager running jobs on a local process pool.
+
+    Drop-in for `dash.DiskcacheManager`, without its extra dependencies and
+    with three differences:
+
+    - jobs run on a fixed pool of `processes` forked from the worker, instead
+      of one new process per call, so the loaded data is shared copy-on-write;
+    - jobs are keyed on the callback, its inputs and `version()`, and tracked
+      in a JobStore shared by all workers: identical requests in flight
+      attach to the running job instead of starting a second one;
+    - progress is reported with `report_progress` from inside the callback
+      rather than through a `set_progress` argument, so callbacks keep the
+      same signature whether or not they run in the background. Cancelling
+      (new inputs or a `cancel` input) stops a job only once no other request
+      waits for it: a queued job is dropped, a running one stops at its next
+      `report_progress`.
+
+    Every request gets its own waiter id as its Dash `job`, so `set_props`
+    updates reach each request sharing a job. With `metrics` set (a
+    CallbackMetrics), a job's time, phases and cache lookups are measured in
+    the pool process and recorded by the worker that collects the result.
+    """
+
+    def __init__(self, path, processes=2, result_ttl=60, version=None):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("PoolCallbackManager needs the 'fork' start method")
+        if not supported_dash():
+            raise RuntimeError(f"PoolCallbackManager is written against Dash {SUPPORTED_DASH}x, not {dash.__version__}; "
+                               "unset SMB_BACKGROUND_JOBS or install the version in requirements.txt")
+        self.store = JobStore(path, result_ttl=result_ttl)
+        self.processes = processes
+        self.metrics = None
+        self.functions_by_key = {}
+        self._token = uuid.uuid4().hex
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        _MANAGERS[self._token] = self
+        super().__init__([version] if version is not None else None)
+
+    @classmethod
+    def from_env(cls, version=None):
+        """
+        Manager from SMB_BACKGROUND_JOBS (job store path) and SMB_BACKGROUND_PROCESSES,
+        or None when background jobs are off.
+
+        On a Dash version other than SUPPORTED_DASH, returns Dash's stock
+        DiskcacheManager (cache next to the job store), which has no job sharing
+        and no progress from `report_progress`; raises RuntimeError when its
+        extra dependencies are missing too.
+        """
+        path = os.environ.get("SMB_BACKGROUND_JOBS")
+        if not path:
+            return None
+        if not supported_dash():
+            return stock_manager(path, version)
+        return cls(path, processes=int(os.environ.get("SMB_BACKGROUND_PROCESSES", 2)), version=version)
+
+    def register(self, key, fn, progress):
+        self.functions_by_key[key] = fn
+        super().register(key, fn, progress)
+
+    def make_job_fn(self, fn, progress, key=None):
+        return key
+
+    def _pool(self):
+        with self._lock:
+            # a pool inherited through a fork belongs to the parent process
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('fork'))
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def reset_pool(self):
+        """Replace the pool, e.g. after the dataset was swapped; running jobs finish on the old one."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._executor_pid == os.getpid():
+            executor.shutdown(wait=False)
+
+    def call_job_fn(self, key, job_fn, args, context):
+        waiter, submit = self.store.attach(key)
+        if submit:
+            try:
+                self._pool().submit(_run_job, self._token, job_fn, key, args, dict(context))
+            except BrokenProcessPool:
+                self.reset_pool()
+                self._pool().submit(_run_job, self._token, job_fn, key, args, dict(context))
+        return waiter
+
+    def terminate_job(self, job):
+        if job:
+            self.store.detach(job)
+
+    def terminate_unhealthy_job(self, job):
+        if job and not self.store.running(job_key(job)) and self.store.status(job_key(job)) != DONE:
+            self.store.detach(job)
+            return True
+        return False
+
+    def job_running(self, job):
+        return bool(job) and self.store.running(job_key(job))
+
+    def get_progress(self, key):
+        return self.store.progress(key)
+
+    def result_ready(self, key):
+        return self.store.status(key) == DONE
+
+    def get_result(self, key, job):
+        result = self.store.result(key, self.UNDEFINED)
+        if result is not self.UNDEFINED and self.metrics is not None:
+            stats = self.store.pop_stats(key)
+            if stats is not None:
+                self.metrics.observe_job(*stats)
+        # Dash asks for the set_props updates next, by job key only: remember which request polls
+        if flask.has_request_context():
+            flask.g.smb_job_poll = (job, result is not self.UNDEFINED)
+        return result
+
+    def get_updated_props(self, key):
+        waiter, finished = flask.g.get('smb_job_poll', (None, False)) if flask.has_request_context() else (None, False)
+        if not waiter or job_key(waiter) != key:
+            return {}
+        updated = self.store.updated_props(waiter)
+        if finished:
+            # the request has its result and stops polling
+            self.store.detach(waiter)
+        return updated
+
+    def clear_cache_entry(self, key):
+        self.store.forget(key)
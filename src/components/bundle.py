@@ -0,0 +1,124 @@
+import copy
+import glob
+import hashlib
+import json
+import logging
+import os
+import pickle
+
+from .geometry import CountyGeometry
+from .live_data import Dataset
+from .shared_cache import dataset_version
+from .store import STORE_PATH, LEGACY_CSV_PATH, COUNTIES_GEOJSON_PATH, load_enriched
+
+logger = logging.getLogger(__name__)
+
+STATES_GEOJSON_PATH = "data/raw/us-states.json"
+# prebuilt startup artifacts; used when SMB_STARTUP_BUNDLE points at this (or another) path
+BUNDLE_PATH = "data/processed/startup_bundle.pkl"
+BUNDLE_DATA_PATHS = [STORE_PATH, LEGACY_CSV_PATH, COUNTIES_GEOJSON_PATH, STATES_GEOJSON_PATH]
+
+COMPONENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def code_version():
+    """Short hash of the component sources: a bundle pickled by other code is not loaded."""
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(COMPONENTS_DIR, '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def bundle_key(census_year, forecast_model, data_paths=BUNDLE_DATA_PATHS):
+    """What a bundle was built from: the data files, the component code and the Dataset parameters."""
+    return {
+        'data': dataset_version(data_paths),
+        'code': code_version(),
+        'census_year': census_year,
+        'forecast_model': forecast_model,
+    }
+
+
+class StartupArtifacts:
+    """
+    Everything the app builds from the data files before serving its first request.
+
+    `build` derives it from the store and GeoJSON files: the Dataset (county
+    snapshot, weighted statistics, panel, forecast, rankings, table backend)
+    and the county polygons split by state and level of detail. `save` /
+    `load` keep all of it in one pickle, so a worker that boots from the
+    bundle unpickles the finished structures instead of recomputing them.
+    The enriched frame itself is not pickled; `load` memory-maps it from
+    the store like a worker without a bundle does.
+    """
+
+    def __init__(self, dataset, county_geometry, states_geojson, key):
+        self.dataset = dataset
+        self.county_geometry = county_geometry
+        self.states_geojson = states_geojson
+        self.key = key
+
+    @classmethod
+    def build(cls, census_year='2021', forecast_model='last_value'):
+        df = load_enriched()
+        with open(STATES_GEOJSON_PATH) as f:
+            states_geojson = json.load(f)
+        with open(COUNTIES_GEOJSON_PATH) as f:
+            county_geometry = CountyGeometry(json.load(f))
+        dataset = Dataset(df, census_year=census_year, forecast_model=forecast_model)
+        return cls(dataset, county_geometry, states_geojson, bundle_key(census_year, forecast_model))
+
+    def __getstate__(self):
+        # the raw frame stays out of the pickle: `load` maps it from the store again,
+        # so workers share its pages instead of each unpickling a private copy
+        state = dict(self.__dict__)
+        state['dataset'] = copy.copy(self.dataset)
+        state['dataset'].df = None
+        return state
+
+    def save(self, path=BUNDLE_PATH):
+        """Pickle the artifacts to `path`, written next to it and renamed over it like the store."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=BUNDLE_PATH, key=None):
+        """The bundled artifacts, or None when the file is missing, unreadable or built from other data or code."""
+        try:
+            with open(path, 'rb') as f:
+                artifacts = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.warning("could not read startup bundle %s", path, exc_info=True)
+            return None
+        if not isinstance(artifacts, cls) or (key is not None and artifacts.key != key):
+            logger.info("startup bundle %s is out of date", path)
+            return None
+        artifacts.dataset.df = load_enriched()
+        return artifacts
+
+
+def load_startup(census_year='2021', forecast_model='last_value', bundle_path=None):
+    """
+    Startup artifacts for the app.
+
+    Without `bundle_path` they are built from the data files. With it, the
+    bundle is loaded when it matches the current data, code and parameters;
+    otherwise the artifacts are built and the bundle rewritten, so the next
+    worker to boot gets the fast path.
+    """
+    if not bundle_path:
+        return StartupArtifacts.build(census_year, forecast_model)
+    artifacts = StartupArtifacts.load(bundle_path, bundle_key(census_year, forecast_model))
+    if artifacts is None:
+        artifacts = StartupArtifacts.build(census_year, forecast_model)
+        try:
+            artifacts.save(bundle_path)
+        except OSError:
+            logger.warning("could not write startup bundle %s", bundle_path, exc_info=True)
+    return artifacts
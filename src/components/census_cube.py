@@ -0,0 +1,118 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# census metrics in census_starter.csv, each stored as `<metric>_<year>` columns
+CENSUS_METRICS = ['median_hh_inc', 'pct_bb', 'pct_college', 'pct_foreign_born', 'pct_it_workers']
+
+CENSUS_METRIC_LABELS = {
+    'median_hh_inc': 'Median Household Income',
+    'pct_bb': 'Broadband Access %',
+    'pct_college': 'College Education %',
+    'pct_foreign_born': 'Foreign Born Population %',
+    'pct_it_workers': 'IT Industry Workers %',
+}
+
+
+def _mean_over_rows(sums, counts):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+class CensusCube:
+    """
+    County x metric x year array of the census metrics.
+
+    Census values are yearly, so the monthly panel carries each of them once
+    per month. The cube keeps a single entry per county, metric and year, and
+    precomputes the state and national means per metric and year so the
+    census charts only index into arrays.
+    """
+
+    def __init__(self, enriched_df, metrics=CENSUS_METRICS):
+        per_county = enriched_df.drop_duplicates('cfips').sort_values('cfips')
+        pattern = re.compile(rf"^({'|'.join(metrics)})_(\d{{4}})$")
+        columns = [(m.group(1), int(m.group(2)), col)
+                   for col in per_county.columns if (m := pattern.match(col))]
+
+        self.metrics = [metric for metric in metrics if any(c[0] == metric for c in columns)]
+        self.years = sorted({year for _, year, _ in columns})
+        self.cfips = per_county['cfips'].to_numpy()
+        self.state = per_county['state'].astype(str).to_numpy()
+        self.county = per_county['county'].astype(str).to_numpy()
+
+        metric_pos = {metric: i for i, metric in enumerate(self.metrics)}
+        year_pos = {year: i for i, year in enumerate(self.years)}
+        self.values = np.full((len(per_county), len(self.metrics), len(self.years)), np.nan)
+        for metric, year, col in columns:
+            self.values[:, metric_pos[metric], year_pos[year]] = per_county[col].to_numpy(dtype=float)
+
+        self._metric_pos = metric_pos
+        self._rows = {key: i for i, key in enumerate(zip(self.state, self.county))}
+        self._cfips_index = pd.Index(self.cfips)
+
+        present = ~np.isnan(self.values)
+        filled = np.where(present, self.values, 0.0)
+        self.national = _mean_over_rows(filled.sum(axis=0), present.sum(axis=0))
+
+        state_codes, self.states = pd.factorize(self.state, sort=True)
+        sums = np.zeros((len(self.states),) + self.values.shape[1:])
+        counts = np.zeros_like(sums)
+        np.add.at(sums, state_codes, filled)
+        np.add.at(counts, state_codes, present)
+        self._state_means = _mean_over_rows(sums, counts)
+        self._state_pos = {state: i for i, state in enumerate(self.states)}
+
+    def series(self, metric, state=None, county=None):
+        """
+        Yearly values of `metric` as a (year, value) DataFrame.
+
+        With no selection this is the mean over all counties, with a state the
+        mean over its counties, and with a county that county's own values.
+        Returns an empty frame for unknown selections.
+        """
+        m = self._metric_pos[metric]
+        if county and state:
+            row = self._rows.get((state, county))
+            values = None if row is None else self.values[row, m]
+        elif county:
+            rows = self.county == county
+            values = _mean_over_rows(np.nan_to_num(self.values[rows, m]).sum(axis=0),
+                                     (~np.isnan(self.values[rows, m])).sum(axis=0)) if rows.any() else None
+        elif state:
+            pos = self._state_pos.get(state)
+            values = None if pos is None else self._state_means[pos, m]
+        else:
+            values = self.national[m]
+
+        if values is None:
+            return pd.DataFrame({'year': [], 'value': []})
+        return pd.DataFrame({'year': self.years, 'value': values}).dropna()
+
+    def series_for(self, metric, cfips):
+        """
+        Yearly values of `metric` for each county of `cfips`, as (group, year, value).
+
+        `group` is the position of the county in `cfips`; all counties are
+        read with one fancy index into the cube. Unknown counties and missing
+        years are left out.
+        """
+        rows = self._cfips_index.get_indexer(cfips)
+        values = self.values[np.maximum(rows, 0), self._metric_pos[metric]]
+        values[rows < 0] = np.nan
+        keep = ~np.isnan(values)
+        group_of, year_of = np.nonzero(keep)
+        return pd.DataFrame({'group': group_of, 'year': np.asarray(self.years)[year_of], 'value': values[keep]})
+
+    def to_long(self):
+        """Tidy (cfips, state, county, metric, year, value) frame, one row per cube cell."""
+        n_county, n_metric, n_year = self.values.shape
+        return pd.DataFrame({
+            'cfips': np.repeat(self.cfips, n_metric * n_year),
+            'state': np.repeat(self.state, n_metric * n_year),
+            'county': np.repeat(self.county, n_metric * n_year),
+            'metric': np.tile(np.repeat(self.metrics, n_year), n_county),
+            'year': np.tile(self.years, n_county * n_metric),
+            'value': self.values.ravel(),
+        })
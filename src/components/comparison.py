@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+# most counties that can be compared at once
+MAX_COMPARED = 5
+
+
+class CountyComparison:
+    """
+    Counties picked for side-by-side comparison, possibly from different states.
+
+    `selection` holds `cfips_fixed` codes (the values of the compare
+    dropdown); unknown codes and repeats are dropped and at most `limit` are
+    kept, in the order picked. Every series is computed for all compared
+    counties in one grouped pass over the panel, forecast, census cube or
+    percentile table, with the county's position as its group, and returned
+    as one long frame with a `county` label column for the chart colour.
+    """
+
+    def __init__(self, dataset, selection, limit=MAX_COMPARED):
+        counties = dataset.county_lookup['counties']
+        picked = [code for code in dict.fromkeys(selection or []) if code in counties][:limit]
+        self._data = dataset
+        self.cfips_fixed = picked
+        self.cfips = np.array([int(code) for code in picked], dtype=int)
+        self.labels = np.array([f"{counties[code][1]}, {counties[code][0]}" for code in picked], dtype=object)
+
+    def __len__(self):
+        return len(self.cfips_fixed)
+
+    def _labelled(self, frame, value_col):
+        # group positions -> county labels, in the order the counties were picked
+        frame = frame.rename(columns={'value': value_col})
+        frame.insert(0, 'county', pd.Categorical(self.labels[frame.pop('group').to_numpy()],
+                                                 categories=list(dict.fromkeys(self.labels))))
+        return frame
+
+    def yearly_density(self, metric='microbusiness_density'):
+        """Observed and forecast yearly means of `metric` per county, as two (county, year, metric) frames."""
+        data = self._data
+        rows = data.panel.rows_for_cfips(self.cfips)
+        found = rows >= 0
+        groups = np.flatnonzero(found)
+        observed = data.panel.yearly_mean_by(metric, rows[found], groups, len(self))
+        forecast = data.forecast.yearly_mean_by(data.panel, rows[found], groups, len(self))
+        return self._labelled(observed, metric), self._labelled(forecast, metric)
+
+    def census_series(self, metric, value_col=None):
+        """Yearly census values of `metric` per county, as a (county, year, value_col) frame."""
+        return self._labelled(self._data.census_cube.series_for(metric, self.cfips), value_col or metric)
+
+    def percentiles(self):
+        """Sellability, growth and hireability percentiles, one row per county label."""
+        table = self._data.ranker.lookup_many(self.cfips)
+        table.index = pd.Index(self.labels, name='county')
+        return table
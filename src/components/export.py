@@ -0,0 +1,108 @@
+import pandas as pd
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+# columns every export keeps when only some metrics are requested
+EXPORT_KEY_COLUMNS = ['state', 'county', 'cfips_fixed', 'first_day_of_month']
+
+EXPORT_CHUNK_ROWS = 50_000
+
+
+class _ChunkSink:
+    """Write-only file object collecting what a pyarrow writer writes until it is drained."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def export_columns(available, metrics=None):
+    """Columns of an export: all of `available`, or the key columns plus the requested metrics."""
+    if not metrics:
+        return list(available)
+    unknown = [m for m in metrics if m not in available]
+    if unknown:
+        raise ValueError(f"unknown columns {unknown}, expected some of {list(available)}")
+    return [c for c in EXPORT_KEY_COLUMNS if c in available] + [m for m in metrics if m not in EXPORT_KEY_COLUMNS]
+
+
+def _chunks(frame, rows, columns, chunk_rows):
+    # only one chunk of rows is copied out of the frame at a time
+    for start in range(0, len(rows), chunk_rows):
+        yield frame.iloc[rows[start:start + chunk_rows]][columns]
+
+
+def _csv(frame, rows, columns, chunk_rows):
+    header = True
+    for chunk in _chunks(frame, rows, columns, chunk_rows):
+        yield chunk.to_csv(index=False, header=header).encode()
+        header = False
+    if header:
+        yield pd.DataFrame(columns=columns).to_csv(index=False).encode()
+
+
+def _arrow(frame, rows, columns, chunk_rows, parquet):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    empty = pa.Schema.from_pandas(frame[columns].iloc[0:0], preserve_index=False)
+    # object columns of an empty frame come out as the null type; they hold strings
+    schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in empty],
+                       metadata=empty.metadata)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if parquet else pa.ipc.new_stream(sink, schema)
+    try:
+        for chunk in _chunks(frame, rows, columns, chunk_rows):
+            # one Parquet row group / IPC record batch per chunk
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(frame, rows, columns, fmt='csv', chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Generator of the bytes of `frame.iloc[rows][columns]` encoded as CSV, Parquet or Arrow IPC.
+
+    Rows are encoded `chunk_rows` at a time and each chunk is yielded as
+    soon as it is written, so serving a full-panel export holds one chunk in
+    memory rather than a second copy of the frame plus its encoding.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}, expected one of {sorted(EXPORT_FORMATS)}")
+    if fmt == 'csv':
+        return _csv(frame, rows, columns, chunk_rows)
+    return _arrow(frame, rows, columns, chunk_rows, parquet=fmt == 'parquet')
@@ -0,0 +1,70 @@
+import numpy as np
+from dash import Patch
+
+
+def _same(a, b):
+    if a is b:
+        return True
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        a, b = np.asarray(a), np.asarray(b)
+        if a.shape != b.shape:
+            return False
+        if a.dtype.kind in 'fc' and b.dtype.kind in 'fc':
+            return np.array_equal(a, b, equal_nan=True)
+        return np.array_equal(a, b)
+    if isinstance(a, (dict, list, tuple)):
+        # plain JSON (e.g. GeoJSON coordinates) compares in C; arrays nested inside raise
+        try:
+            return bool(a == b)
+        except (TypeError, ValueError):
+            pass
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+def _diff_into(patch, old, new, depth):
+    """Set the entries of `new` that differ from `old` on `patch`; False if a key was removed."""
+    if old.keys() - new.keys():
+        return False
+    for key, value in new.items():
+        if key in old and _same(old[key], value):
+            continue
+        if depth > 0 and isinstance(value, dict) and isinstance(old.get(key), dict):
+            if not _diff_into(patch[key], old[key], value, depth - 1):
+                patch[key] = value
+        else:
+            patch[key] = value
+    return True
+
+
+def figure_patch(previous, figure):
+    """
+    Dash Patch turning the figure dict `previous` into `figure`.
+
+    Only trace properties and layout entries whose value changed are sent:
+    a new colour metric patches `z`, the hover template and the colour axis;
+    another state patches the locations, values, geometry and map centre,
+    but never the template or the rest of the layout. Returns None when the
+    figures differ in structure (number or type of traces, removed keys), in
+    which case the whole figure has to be sent.
+    """
+    old_traces, new_traces = previous.get('data', []), figure.get('data', [])
+    if len(old_traces) != len(new_traces):
+        return None
+    if any(old.get('type') != new.get('type') for old, new in zip(old_traces, new_traces)):
+        return None
+
+    patch = Patch()
+    for i, (old, new) in enumerate(zip(old_traces, new_traces)):
+        if not _diff_into(patch['data'][i], old, new, depth=0):
+            return None
+    # one level into layout dicts, so a new centre does not resend the map style
+    if not _diff_into(patch['layout'], previous.get('layout', {}), figure.get('layout', {}), depth=1):
+        return None
+    return patch
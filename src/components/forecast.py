@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+from .panel import grouped_yearly_means, yearly_means
+
+TEST_PATH = "data/raw/test.csv"
+REVEALED_TEST_PATH = "data/raw/revealed_test.csv"
+SUBMISSION_COLUMNS = ['row_id', 'microbusiness_density']
+
+
+def _last_valid(history):
+    """Last non-missing value of every row (NaN for rows without any)."""
+    present = ~np.isnan(history)
+    if history.shape[1] == 0:
+        return np.full(len(history), np.nan)
+    pos = history.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+    last = history[np.arange(len(history)), pos]
+    last[~present.any(axis=1)] = np.nan
+    return last
+
+
+def last_value(history, horizon):
+    """Every future month equals the last observed month."""
+    return np.repeat(_last_valid(history)[:, None], horizon, axis=1)
+
+
+def seasonal_naive(history, horizon, season=12):
+    """Every future month equals the same month one season earlier (last value where that is missing)."""
+    n_months = history.shape[1]
+    if n_months < season:
+        return last_value(history, horizon)
+    forecast = history[:, n_months - season + np.arange(horizon) % season]
+    return np.where(np.isnan(forecast), _last_valid(history)[:, None], forecast)
+
+
+def linear_trend(history, horizon, window=12):
+    """Least-squares line through the last `window` months of every county, extrapolated."""
+    recent = history[:, -window:]
+    present = ~np.isnan(recent)
+    t = np.broadcast_to(np.arange(recent.shape[1], dtype=float), recent.shape)
+    count = present.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_mean = np.where(present, t, 0).sum(axis=1) / count
+        y_mean = np.where(present, recent, 0).sum(axis=1) / count
+        dt = np.where(present, t - t_mean[:, None], 0)
+        dy = np.where(present, recent - y_mean[:, None], 0)
+        slope = (dt * dy).sum(axis=1) / (dt * dt).sum(axis=1)
+    # a single observed month has no trend
+    slope = np.where(count > 1, slope, 0.0)
+    steps = recent.shape[1] - 1 + np.arange(1, horizon + 1)
+    return y_mean[:, None] + slope[:, None] * (steps[None, :] - t_mean[:, None])
+
+
+def exp_smoothing(history, horizon, alpha=0.5):
+    """Simple exponential smoothing of the level; every future month equals the final level."""
+    level = np.full(len(history), np.nan)
+    # one vector update per month, for every county at once
+    for month in history.T:
+        smoothed = alpha * month + (1 - alpha) * level
+        level = np.where(np.isnan(level), month, np.where(np.isnan(month), level, smoothed))
+    return np.repeat(level[:, None], horizon, axis=1)
+
+
+FORECAST_MODELS = {
+    'last_value': last_value,
+    'seasonal_naive': seasonal_naive,
+    'linear_trend': linear_trend,
+    'exp_smoothing': exp_smoothing,
+}
+
+
+class Forecast:
+    """
+    Forecast of one panel metric for every county over the months after `origin`.
+
+    `values` is a county x month matrix aligned with the panel's `index`
+    (rows) and `months` (the forecast months, ascending).
+    """
+
+    def __init__(self, index, origin, months, values, model, metric):
+        self.index = index
+        self.origin = origin
+        self.months = months
+        self.values = values
+        self.model = model
+        self.metric = metric
+
+    def frame(self):
+        """Long table with one row per county-month, with Kaggle-style `row_id`s."""
+        cfips = np.repeat(self.index.to_numpy(), len(self.months))
+        months = np.tile(self.months.to_numpy(), len(self.index))
+        frame = pd.DataFrame({'cfips': cfips, 'first_day_of_month': months, self.metric: self.values.ravel()})
+        frame.insert(0, 'row_id', frame['cfips'].astype(str) + '_' + frame['first_day_of_month'].dt.strftime('%Y-%m-%d'))
+        return frame
+
+    def yearly_mean(self, panel, rows):
+        """
+        Yearly means of the observed months followed by the forecast, as (year, value).
+
+        Starts at the year of `origin`, whose mean mixes observed and forecast months.
+        """
+        observed = panel.months <= self.origin
+        values = np.hstack([panel.values[self.metric][rows][:, observed], self.values[rows]])
+        months = panel.months[observed].append(self.months)
+        yearly = yearly_means(values, months)
+        return yearly[yearly['year'] >= self.origin.year].reset_index(drop=True)
+
+    def yearly_mean_by(self, panel, rows, groups, n_groups):
+        """`yearly_mean` for several groups of county rows at once, as (group, year, value)."""
+        observed = panel.months <= self.origin
+        values = np.hstack([panel.values[self.metric][rows][:, observed], self.values[rows]])
+        months = panel.months[observed].append(self.months)
+        yearly = grouped_yearly_means(values, months, groups, n_groups)
+        return yearly[yearly['year'] >= self.origin.year].reset_index(drop=True)
+
+
+def forecast(panel, model='last_value', horizon=8, metric='microbusiness_density', origin=None, **params):
+    """
+    Forecast `horizon` months of `metric` for every county of `panel` with one of FORECAST_MODELS.
+
+    Models see the months up to and including `origin` (the latest month by
+    default) and are fitted for all counties at once on the panel matrix.
+    """
+    if model not in FORECAST_MODELS:
+        raise ValueError(f"unknown forecast model {model!r}, expected one of {sorted(FORECAST_MODELS)}")
+    origin = pd.Timestamp(origin) if origin is not None else panel.months.max()
+    history = panel.values[metric][:, panel.months <= origin]
+    values = FORECAST_MODELS[model](history, horizon, **params)
+    months = pd.date_range(origin + pd.DateOffset(months=1), periods=horizon, freq='MS')
+    return Forecast(panel.index, origin, months, values, model, metric)
+
+
+def submission(panel, model='last_value', test_path=TEST_PATH, **params):
+    """
+    Forecast the county-months of `test_path` in the `sample_submission.csv` format.
+
+    The forecast starts after the month before the first test month, so
+    months ingested after that (e.g. revealed test months) are not used.
+    Counties without history are predicted as 0.
+    """
+    test = pd.read_csv(test_path, parse_dates=['first_day_of_month'])
+    origin = test['first_day_of_month'].min() - pd.DateOffset(months=1)
+    last = test['first_day_of_month'].max()
+    horizon = (last.year - origin.year) * 12 + last.month - origin.month
+    result = forecast(panel, model, horizon, origin=origin, **params)
+    predicted = result.frame().set_index('row_id')['microbusiness_density']
+    test['microbusiness_density'] = test['row_id'].map(predicted).fillna(0.0)
+    return test[SUBMISSION_COLUMNS]
+
+
+def smape(actual, predicted):
+    """Symmetric mean absolute percentage error in percent (0 where both are 0), as scored on Kaggle."""
+    actual = np.asarray(actual, dtype=float)
+    predicted = np.asarray(predicted, dtype=float)
+    denominator = (np.abs(actual) + np.abs(predicted)) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        errors = np.where(denominator == 0, 0.0, np.abs(predicted - actual) / denominator)
+    return float(np.mean(errors) * 100)
+
+
+def score(submission_df, revealed_path=REVEALED_TEST_PATH):
+    """SMAPE of a submission on the county-months whose actuals are in `revealed_path`."""
+    revealed = pd.read_csv(revealed_path, usecols=['row_id', 'microbusiness_density'])
+    matched = revealed.merge(submission_df, on='row_id', suffixes=('_actual', '_predicted'))
+    return smape(matched['microbusiness_density_actual'], matched['microbusiness_density_predicted'])
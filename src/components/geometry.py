@@ -0,0 +1,106 @@
+import numpy as np
+
+# grid size in degrees each tier snaps coordinates to (~5 km for the national view,
+# ~1 km at state zoom, ~1 m at county zoom); a tier mapped to None keeps the source coordinates
+TIER_GRID = {
+    'coarse': 0.05,
+    'medium': 0.01,
+    'full': 0.00001,
+}
+
+
+def _snap_ring(ring, grid):
+    """
+    Snap a ring to a grid of `grid` degrees and drop the repeated vertices.
+
+    Neighbouring counties share border vertices, so snapping both to the same
+    grid keeps shared borders identical (no slivers or gaps between polygons).
+    Returns None for a ring that collapses below a triangle: it is smaller
+    than a grid cell, and its neighbours' snapped borders already close over it.
+    """
+    coords = np.asarray(ring, dtype=float)[:, :2]
+    snapped = np.round(coords / grid) * grid
+    keep = np.ones(len(snapped), dtype=bool)
+    keep[1:] = np.any(snapped[1:] != snapped[:-1], axis=1)
+    snapped = snapped[keep]
+    if len(snapped) < 4:
+        return None
+    # round again so the JSON does not carry float noise such as 0.30000000000000004
+    decimals = max(0, int(-np.floor(np.log10(grid))))
+    return np.round(snapped, decimals).tolist()
+
+
+def _snap_polygon(polygon, grid):
+    # a collapsed hole is dropped; a collapsed exterior ring drops the whole polygon
+    rings = [_snap_ring(ring, grid) for ring in polygon]
+    if not rings or rings[0] is None:
+        return None
+    return [ring for ring in rings if ring is not None]
+
+
+def _simplify_geometry(geometry, grid):
+    """
+    Geometry snapped to `grid`, without the rings that collapsed.
+
+    A county smaller than a grid cell ends up as an empty MultiPolygon: it
+    keeps its feature (and id) but draws nothing at that tier.
+    """
+    if geometry['type'] == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        return geometry
+    snapped = [polygon for polygon in (_snap_polygon(p, grid) for p in polygons) if polygon is not None]
+    if geometry['type'] == 'Polygon' and len(snapped) == 1:
+        return {'type': 'Polygon', 'coordinates': snapped[0]}
+    return {'type': 'MultiPolygon', 'coordinates': snapped}
+
+
+class GeometryTier:
+    """County features at one level of detail, split by state FIPS prefix."""
+
+    def __init__(self, features):
+        self.by_state = {}
+        for feature in features:
+            self.by_state.setdefault(feature['id'][:2], {})[feature['id']] = feature
+
+    def state_collection(self, state_fips):
+        """Every county feature of one state (two digit FIPS prefix)."""
+        return {'type': 'FeatureCollection', 'features': list(self.by_state.get(state_fips, {}).values())}
+
+    def subset(self, locations):
+        """FeatureCollection holding only the features for the given 5 digit FIPS codes."""
+        features = []
+        for fips in locations:
+            feature = self.by_state.get(fips[:2], {}).get(fips)
+            if feature is not None:
+                features.append(feature)
+        return {'type': 'FeatureCollection', 'features': features}
+
+
+class CountyGeometry:
+    """
+    County polygons prepared once at load time for the map views.
+
+    Each tier holds the same features at a different level of detail:
+    'coarse' for the national view, 'medium' for a state, 'full' for a
+    single county. Figures should take a tier and ship only the features
+    they draw (see `map_view.trim_geojson`).
+    """
+
+    def __init__(self, counties_geojson, tier_grid=TIER_GRID):
+        features = [
+            {'type': 'Feature', 'id': str(feature['id']).zfill(5),
+             'properties': feature.get('properties', {}), 'geometry': feature['geometry']}
+            for feature in counties_geojson['features']
+        ]
+        self.tiers = {}
+        for tier, grid in tier_grid.items():
+            self.tiers[tier] = GeometryTier([
+                dict(feature, geometry=_simplify_geometry(feature['geometry'], grid)) if grid else feature
+                for feature in features
+            ])
+
+    def tier(self, name):
+        return self.tiers[name]
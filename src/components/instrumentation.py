@@ -0,0 +1,234 @@
+import contextlib
+import contextvars
+import cProfile
+import functools
+import os
+import threading
+import time
+
+# upper bounds of the histogram buckets (Prometheus style, +Inf is implicit)
+SECONDS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+BYTES_BUCKETS = [1e3, 1e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7]
+
+_current_call = contextvars.ContextVar('smb_current_call', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ['+Inf'], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.total}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class _CallRecord:
+    def __init__(self):
+        self.compute = None
+        self.phases = {}
+        self.cache = []
+
+
+class CallbackMetrics:
+    """
+    Per-callback latency, payload and cache metrics for the Dash app.
+
+    `instrument(app)` wraps every registered callback and records, per call:
+    the wall time of the whole callback request (including Dash's JSON
+    encoding), the time spent in the callback function itself (`measure`),
+    the remainder as serialization time, the response size in bytes and any
+    cache lookups reported through `record_cache`. `expose(server)` serves
+    the numbers as Prometheus text on /metrics.
+
+    Metrics are kept per process, so each gunicorn worker reports its own.
+
+    With `profile_dir` set, every call runs under cProfile and the stats of
+    calls slower than `slow_seconds` are written to that directory.
+    """
+
+    def __init__(self, profile_dir=None, slow_seconds=0.5):
+        self.profile_dir = profile_dir
+        self.slow_seconds = slow_seconds
+        self._lock = threading.Lock()
+        self._wall = {}
+        self._compute = {}
+        self._serialize = {}
+        self._payload = {}
+        self._phases = {}
+        self._cache = {}
+        self._extra_gauges = []
+
+    @classmethod
+    def from_env(cls):
+        """Read SMB_PROFILE_DIR and SMB_PROFILE_SLOW_MS."""
+        return cls(
+            profile_dir=os.environ.get("SMB_PROFILE_DIR") or None,
+            slow_seconds=float(os.environ.get("SMB_PROFILE_SLOW_MS", 500)) / 1000,
+        )
+
+    def measure(self, func):
+        """Decorator recording the time spent inside a callback function."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record = _current_call.get()
+                if record is not None:
+                    record.compute = time.perf_counter() - start
+        return wrapper
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time a named section of a callback (e.g. 'data' or 'render')."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = _current_call.get()
+            if record is not None:
+                record.phases[name] = record.phases.get(name, 0.0) + time.perf_counter() - start
+
+    @contextlib.contextmanager
+    def recording(self):
+        """
+        Measure a callback run outside a callback request (a background job).
+
+        Yields the record that `measure`, `phase` and `record_cache` fill in;
+        pass it to `observe_job`, possibly in another process.
+        """
+        record = _CallRecord()
+        token = _current_call.set(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            if record.compute is None:
+                record.compute = time.perf_counter() - start
+            _current_call.reset(token)
+
+    def observe_job(self, name, record):
+        """Record the compute time, phases and cache lookups of a background job run of callback `name`."""
+        with self._lock:
+            self._compute.setdefault(name, Histogram(SECONDS_BUCKETS)).observe(record.compute)
+            for phase, seconds in record.phases.items():
+                self._phases.setdefault((name, phase), Histogram(SECONDS_BUCKETS)).observe(seconds)
+            for cache, result in record.cache:
+                key = (name, cache, result)
+                self._cache[key] = self._cache.get(key, 0) + 1
+
+    def record_cache(self, cache, hit):
+        """Hook for the caches: note a hit or miss against the running callback."""
+        record = _current_call.get()
+        if record is not None:
+            record.cache.append((cache, 'hit' if hit else 'miss'))
+
+    def add_gauges(self, collect):
+        """Register a function returning {metric name: value} rendered on /metrics."""
+        self._extra_gauges.append(collect)
+
+    def _wrap(self, name, dispatch):
+        @functools.wraps(dispatch)
+        def wrapper(*args, **kwargs):
+            record = _CallRecord()
+            token = _current_call.set(record)
+            profiler = cProfile.Profile() if self.profile_dir else None
+            start = time.perf_counter()
+            try:
+                if profiler is not None:
+                    response = profiler.runcall(dispatch, *args, **kwargs)
+                else:
+                    response = dispatch(*args, **kwargs)
+            finally:
+                wall = time.perf_counter() - start
+                _current_call.reset(token)
+            self._observe(name, wall, record, response)
+            if profiler is not None and wall >= self.slow_seconds:
+                self._dump_profile(name, profiler)
+            return response
+        return wrapper
+
+    def _observe(self, name, wall, record, response):
+        payload = len(response) if isinstance(response, (str, bytes)) else 0
+        with self._lock:
+            self._wall.setdefault(name, Histogram(SECONDS_BUCKETS)).observe(wall)
+            self._payload.setdefault(name, Histogram(BYTES_BUCKETS)).observe(payload)
+            if record.compute is not None:
+                self._compute.setdefault(name, Histogram(SECONDS_BUCKETS)).observe(record.compute)
+                self._serialize.setdefault(name, Histogram(SECONDS_BUCKETS)).observe(max(wall - record.compute, 0.0))
+            for phase, seconds in record.phases.items():
+                self._phases.setdefault((name, phase), Histogram(SECONDS_BUCKETS)).observe(seconds)
+            for cache, result in record.cache:
+                key = (name, cache, result)
+                self._cache[key] = self._cache.get(key, 0) + 1
+
+    def _dump_profile(self, name, profiler):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+        profiler.dump_stats(path)
+
+    def instrument(self, app):
+        """Wrap every server-side callback registered on `app` so far."""
+        for entry in app.callback_map.values():
+            # clientside callbacks have no server function to wrap
+            dispatch = entry.get('callback')
+            if dispatch is None or getattr(dispatch, '_smb_instrumented', False):
+                continue
+            wrapped = self._wrap(dispatch.__name__, dispatch)
+            wrapped._smb_instrumented = True
+            entry['callback'] = wrapped
+
+    def render(self):
+        lines = []
+        with self._lock:
+            histograms = [
+                ('smb_callback_seconds', 'Wall time of the callback request', self._wall),
+                ('smb_callback_compute_seconds', 'Time spent in the callback function', self._compute),
+                ('smb_callback_serialize_seconds', 'Time spent encoding the callback response', self._serialize),
+                ('smb_callback_payload_bytes', 'Size of the callback response', self._payload),
+            ]
+            for metric, help_text, by_callback in histograms:
+                lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram']
+                for name, histogram in sorted(by_callback.items()):
+                    lines += histogram.render(metric, f'callback="{name}"')
+
+            lines += ['# HELP smb_callback_phase_seconds Time spent in named callback sections',
+                      '# TYPE smb_callback_phase_seconds histogram']
+            for (name, phase), histogram in sorted(self._phases.items()):
+                lines += histogram.render('smb_callback_phase_seconds', f'callback="{name}",phase="{phase}"')
+
+            lines += ['# HELP smb_callback_cache_total Cache lookups made by callbacks',
+                      '# TYPE smb_callback_cache_total counter']
+            for (name, cache, result), count in sorted(self._cache.items()):
+                lines.append(f'smb_callback_cache_total{{callback="{name}",cache="{cache}",result="{result}"}} {count}')
+
+        for collect in self._extra_gauges:
+            for metric, value in collect().items():
+                lines.append(f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def expose(self, server, route='/metrics'):
+        """Add the Prometheus text endpoint to the Flask server."""
+        def metrics_view():
+            return self.render(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+        server.add_url_rule(route, 'smb_metrics', metrics_view)
@@ -0,0 +1,202 @@
+import copy
+import glob
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from .census_cube import CensusCube
+from .forecast import forecast
+from .panel import CountyPanel
+from .points import PointLevels
+from .ranking import PercentileRanker
+from .scoring import SiteScorer
+from .snapshot import CountySnapshot
+from .spatial import CentroidIndex
+from .stats import CountyStats
+from .store import CATEGORICAL_COLUMNS, DATE_COLUMN, apply_schema, add_fixed_cfips
+from .table import TableBackend
+
+logger = logging.getLogger(__name__)
+
+
+def read_new_months(path, current_df):
+    """
+    Rows of a monthly file (same columns as train.csv) that are not loaded yet.
+
+    County-months already present in `current_df` are skipped, so ingesting
+    the same file twice is a no-op. The census and centroid columns of each
+    county are copied over from `current_df`, and the result has its schema
+    and column order.
+    """
+    rows = pd.read_csv(path)
+    rows[DATE_COLUMN] = pd.to_datetime(rows[DATE_COLUMN])
+    loaded = pd.MultiIndex.from_arrays([current_df['cfips'].to_numpy(), current_df[DATE_COLUMN]])
+    rows = rows[~pd.MultiIndex.from_arrays([rows['cfips'].to_numpy(), rows[DATE_COLUMN]]).isin(loaded)]
+    rows = rows.drop_duplicates(['cfips', DATE_COLUMN], keep='last')
+    if rows.empty:
+        return current_df.iloc[0:0]
+
+    static_columns = [c for c in current_df.columns if c not in rows.columns and c != 'cfips_fixed']
+    per_county = current_df.drop_duplicates('cfips', keep='last')[['cfips'] + static_columns]
+    rows = add_fixed_cfips(apply_schema(rows.merge(per_county, on='cfips', how='left')))
+
+    for column in CATEGORICAL_COLUMNS:
+        categories = current_df[column].cat.categories.union(rows[column].cat.categories)
+        rows[column] = rows[column].cat.set_categories(categories)
+    return rows[current_df.columns]
+
+
+def append_rows(df, new_rows):
+    """`df` with `new_rows` appended, keeping the categorical columns categorical."""
+    df = pd.concat([df, new_rows], ignore_index=True)
+    for column in CATEGORICAL_COLUMNS:
+        # concat falls back to object when the new rows brought new names
+        if not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    return df
+
+
+class Dataset:
+    """
+    One version of the enriched data with every structure derived from it.
+
+    A Dataset is never modified once built: `with_rows` returns a new
+    version, updating the derived tables incrementally where they support it
+    and rebuilding the rest.
+    """
+
+    def __init__(self, df, census_year='2021', sources=(), forecast_model='last_value'):
+        self.df = df
+        self.census_year = census_year
+        self.sources = tuple(sources)
+        self.forecast_model = forecast_model
+        self._index_counties()
+        self.snapshot = CountySnapshot(df)
+        self.county_lookup = self.snapshot.county_lookup()
+        self.spatial = CentroidIndex.from_snapshot(self.snapshot)
+        self.stats = CountyStats(self.snapshot, census_year)
+        self.points = PointLevels(self.snapshot, self.stats)
+        self.panel = CountyPanel(df)
+        self.forecast = forecast(self.panel, forecast_model)
+        self.ranker = PercentileRanker(df, self.panel, census_year=census_year)
+        self.scorer = SiteScorer(self.snapshot, self.ranker, census_year)
+        self.census_cube = CensusCube(df)
+        self.table_backend = TableBackend(df)
+
+    def _index_counties(self):
+        self.unique_states = sorted(self.df["state"].unique())
+        self.state_county_mapping = self.df.groupby("state", observed=True)["county"].unique().apply(list).to_dict()
+
+    def with_rows(self, new_rows, source=None):
+        """New version with `new_rows` (as returned by `read_new_months`) appended."""
+        dataset = copy.copy(self)
+        dataset.df = append_rows(self.df, new_rows)
+        if source is not None:
+            dataset.sources = self.sources + (source,)
+
+        dataset.snapshot = self.snapshot.updated(new_rows)
+        dataset.panel = self.panel.copy()
+
+        if new_rows['cfips'].isin(self.panel.index).all():
+            dataset.stats = self.stats.updated(dataset.snapshot, new_rows)
+            dataset.ranker = self.ranker.copy(dataset.panel)
+            dataset.ranker.add_months(new_rows)
+        else:
+            # new counties need census percentiles and cube rows as well
+            dataset.stats = CountyStats(dataset.snapshot, self.census_year)
+            dataset.panel.append(new_rows)
+            dataset.ranker = PercentileRanker(dataset.df, dataset.panel, census_year=self.census_year)
+            dataset.census_cube = CensusCube(dataset.df)
+            dataset.county_lookup = dataset.snapshot.county_lookup()
+            dataset.spatial = CentroidIndex.from_snapshot(dataset.snapshot)
+            dataset._index_counties()
+
+        # growth and the latest rows changed; point levels and the normalised metric matrix
+        # have one row per county and are cheap to rebuild
+        dataset.points = PointLevels(dataset.snapshot, dataset.stats)
+        dataset.scorer = SiteScorer(dataset.snapshot, dataset.ranker, self.census_year)
+
+        # refit on the extended panel, starting after the new latest month
+        dataset.forecast = forecast(dataset.panel, self.forecast_model)
+
+        # new rows are merged into the table's sorted frame and per-column orders
+        dataset.table_backend = self.table_backend.updated(new_rows)
+        return dataset
+
+
+class LiveDataset:
+    """
+    Holder of the current Dataset that new monthly files are ingested into.
+
+    Callbacks read `current` once and use that version throughout, while
+    `ingest` builds the next version off to the side and swaps it in with a
+    single assignment, so a request never sees a half-updated dataset. With
+    `watch`, a background thread polls a glob pattern and ingests files that
+    appear or change (e.g. `data/raw/revealed_test.csv`).
+    """
+
+    def __init__(self, dataset, on_swap=None):
+        self.current = dataset
+        # optional hook called with the new Dataset after each swap
+        self.on_swap = on_swap
+        self.ingested_rows = 0
+        self.swaps = 0
+        self._lock = threading.Lock()
+        self._pattern = None
+        self._interval = 30.0
+        self._watcher_pid = None
+        self._seen = {}
+
+    def ingest(self, path):
+        """Append the new rows of a monthly file and swap in the new version; returns the row count."""
+        with self._lock:
+            start = time.perf_counter()
+            new_rows = read_new_months(path, self.current.df)
+            if new_rows.empty:
+                return 0
+            dataset = self.current.with_rows(new_rows, source=os.path.abspath(path))
+            self.current = dataset
+            self.ingested_rows += len(new_rows)
+            self.swaps += 1
+        logger.info("ingested %d rows from %s in %.2fs", len(new_rows), path, time.perf_counter() - start)
+        if self.on_swap is not None:
+            self.on_swap(dataset)
+        return len(new_rows)
+
+    def watch(self, pattern, interval=30.0):
+        """Ingest files matching `pattern` from a daemon thread polling every `interval` seconds."""
+        self._pattern = pattern
+        self._interval = interval
+        self.ensure_watching()
+
+    def ensure_watching(self):
+        # threads do not survive a fork, so every worker process starts its own watcher
+        if self._pattern is None or self._watcher_pid == os.getpid():
+            return
+        self._watcher_pid = os.getpid()
+        threading.Thread(target=self._poll, name="smb-ingest-watch", daemon=True).start()
+
+    def _poll(self):
+        pending = {}
+        while True:
+            for path in sorted(glob.glob(self._pattern)):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if self._seen.get(path) == signature:
+                    continue
+                # wait until the file is unchanged between two polls, i.e. fully written
+                if pending.get(path) != signature:
+                    pending[path] = signature
+                    continue
+                self._seen[path] = signature
+                try:
+                    self.ingest(path)
+                except Exception:
+                    logger.exception("could not ingest %s", path)
+            time.sleep(self._interval)
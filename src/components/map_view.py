@@ -1,6 +1,9 @@
-import plotly.express as px
+import numpy as np
 import pandas as pd
 
+# plotly.express is imported inside the figure builders: it is slow to import and a
+# worker does not need it until the first map is drawn
+
 # Define consistent hover data and labels to be used across all map functions
 def get_hover_data():
     return {
@@ -42,73 +45,19 @@ def get_tooltip_descriptions():
         'pct_it_workers_2021': 'Percentage of workforce employed in information related industries'
     }
 
-def display_landing_page_map_dots(enriched_df):
-
-
-    """
-    (1)
-    Initially, start with the map of the US. 
-    - Maybe general Choropleth
-    - Year slider on the top, Choropleth by the average microbusiness density
-
-    OR
-    - General map of the US. Center points of the counties are shown. So, each county is condensed into the middle point.
-    - Plot all the points on the map where the county has a microbusiness density above average.
-    - Year slider on the bottom.
-
-    (2)
-    All the geojson is in county level. 
-    - Can it be Choropleth by county? 
-    - So, filter by State, so that state is highlighted, else is grey. Then, a Choropleth by county for that state only.
-
-
-    Stretch goals:
-    - Have map to be selectable, so when a map is clicked, the selection propagates to the charts below.
-
-
-    Implementation:
-    Input: microbusiness dataset, geojson file by county
-
-    1. 
-
-    Output: Map of the US. 
-
-
-
-    """
-
-    fig = px.scatter_geo(
-        enriched_df,
-        lat='centroid_lat',
-        lon='centroid_lng',
-        scope='usa',
-        color='microbusiness_density',
-        size='active',
-        hover_name='county',
-        hover_data=get_hover_data(),
-        color_continuous_scale='Viridis',
-        labels=get_labels(),
-        title='US Counties Microbusiness Density'
-    )
-
-    fig.update_layout(
-        mapbox_style="carto-positron",
-        margin={"r":0,"t":50,"l":0,"b":0},
-        uirevision='constant',
-        hovermode='closest',
-        coloraxis_colorbar=dict(
-            title=get_tooltip_descriptions()['microbusiness_density']
-        )
-    )
-
-
-    return fig
+def trim_geojson(geojson_file, locations):
+    # Geometry tiers (components.geometry) only ship the polygons being drawn;
+    # a plain GeoJSON dict is passed through unchanged
+    if hasattr(geojson_file, 'subset'):
+        return geojson_file.subset(locations)
+    return geojson_file
 
 def display_landing_page_map_choropleth_counties(enriched_df, geojson_file, percentile, location_col, color_col):
 
     percentile_filtered = enriched_df['microbusiness_density'].quantile(percentile)
 
     high_density_counties = enriched_df[enriched_df['microbusiness_density'] > percentile_filtered]
+    geojson_file = trim_geojson(geojson_file, high_density_counties[location_col])
 
 
     # Display the filtered data
@@ -118,6 +67,7 @@ def display_landing_page_map_choropleth_counties(enriched_df, geojson_file, perc
     center_lon = enriched_df['centroid_lng'].mean()
 
     
+    import plotly.express as px
     fig = px.choropleth_map(high_density_counties, geojson=geojson_file, locations=location_col, color=color_col,
                            color_continuous_scale="Viridis",
                            range_color=(0, 12),
@@ -145,6 +95,7 @@ def display_landing_page_map_choropleth_states(enriched_df, geojson_file, percen
     percentile_filtered = enriched_df[color_col].quantile(percentile)
 
     high_density_counties = enriched_df[enriched_df[color_col] > percentile_filtered]
+    geojson_file = trim_geojson(geojson_file, high_density_counties[location_col])
 
     # Display the filtered data
     # high_density_counties
@@ -152,6 +103,7 @@ def display_landing_page_map_choropleth_states(enriched_df, geojson_file, percen
     center_lat = enriched_df['centroid_lat'].mean()
     center_lon = enriched_df['centroid_lng'].mean()
 
+    import plotly.express as px
     fig = px.choropleth_map(high_density_counties, geojson=geojson_file, locations=location_col, 
     color=color_col,
                            color_continuous_scale="Viridis",
@@ -177,9 +129,11 @@ def display_landing_page_map_choropleth_states(enriched_df, geojson_file, percen
 
 def display_state_level_map(enriched_df, geojson_file, location_col, color_col):
 
+    geojson_file = trim_geojson(geojson_file, enriched_df[location_col])
     center_lat = enriched_df['centroid_lat'].mean()
     center_lon = enriched_df['centroid_lng'].mean()
 
+    import plotly.express as px
     # Filter the data for the specific state
     fig = px.choropleth_map(enriched_df, geojson=geojson_file, locations=location_col, color=color_col,
                            color_continuous_scale="Viridis",
@@ -205,9 +159,11 @@ def display_state_level_map(enriched_df, geojson_file, location_col, color_col):
 
 def display_county_level_map(enriched_df, geojson_file, location_col, color_col):
     
+    geojson_file = trim_geojson(geojson_file, enriched_df[location_col])
     center_lat = enriched_df['centroid_lat'].mean()
     center_lon = enriched_df['centroid_lng'].mean()
 
+    import plotly.express as px
     fig = px.choropleth_map(enriched_df, geojson=geojson_file, locations=location_col, color=color_col,
                            color_continuous_scale="Viridis",
                            range_color=(0, 12),
@@ -239,4 +195,57 @@ def display_county_level_map(enriched_df, geojson_file, location_col, color_col)
 
 
 def fix_cfips(cfips):
-    return str(cfips).zfill(5)
\ No newline at end of file
+    return str(cfips).zfill(5)
+
+# marker diameters of the points map, in pixels
+POINT_SIZE_MIN = 5
+POINT_SIZE_MAX = 40
+
+def points_trace(points, color_col):
+    """
+    WebGL scatter trace of the points from `PointLevels.points`.
+
+    Markers are sized by the square root of `active` (so their area follows
+    it) relative to the largest point drawn, and coloured by `color_col`.
+    """
+    active = np.nan_to_num(points['active'])
+    scale = np.sqrt(active / active.max()) if len(active) and active.max() > 0 else np.zeros(len(active))
+    sizes = np.round(POINT_SIZE_MIN + (POINT_SIZE_MAX - POINT_SIZE_MIN) * scale, 1)
+
+    label = get_labels().get(color_col, color_col)
+    hover = [
+        f"<b>{name}</b><br>{label}: {value:.2f}<br>Active Microbusinesses: {total:,.0f}"
+        for name, value, total in zip(points['label'], points['value'], active)
+    ]
+    return {
+        'type': 'scattermap',
+        'lat': np.round(points['lat'], 4),
+        'lon': np.round(points['lng'], 4),
+        'mode': 'markers',
+        'marker': {
+            'size': sizes,
+            'color': np.round(points['value'], 2),
+            'colorscale': 'Viridis',
+            'cmin': 0,
+            'cmax': 12,
+            'opacity': 0.7,
+            'colorbar': {'title': {'text': get_tooltip_descriptions().get(color_col, label)}},
+        },
+        # what a click selects: the county, or the state of a state point
+        'customdata': points['key'],
+        'hovertext': hover,
+        'hovertemplate': '%{hovertext}<extra></extra>',
+        'name': points['level'],
+    }
+
+def display_points_map(points, color_col, center, zoom, uirevision='points'):
+    import plotly.graph_objects as go
+    fig = go.Figure(points_trace(points, color_col))
+    fig.update_layout(
+        map={'style': 'carto-positron', 'center': center, 'zoom': zoom},
+        margin={"r":0,"t":0,"l":0,"b":0},
+        # keep the user's pan and zoom when the points are swapped for another level of detail
+        uirevision=uirevision,
+        hovermode='closest',
+    )
+    return fig
@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+PANEL_METRICS = ['active', 'microbusiness_density']
+
+
+def yearly_means(values, months):
+    """Mean of a county x month matrix over all its rows for each calendar year, as (year, value)."""
+    years = months.year.to_numpy()
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    unique_years, year_pos = np.unique(years, return_inverse=True)
+    sums = np.zeros(len(unique_years))
+    counts = np.zeros(len(unique_years))
+    np.add.at(sums, year_pos, filled.sum(axis=0))
+    np.add.at(counts, year_pos, present.sum(axis=0))
+    keep = counts > 0
+    return pd.DataFrame({'year': unique_years[keep], 'value': sums[keep] / counts[keep]})
+
+
+def grouped_yearly_means(values, months, groups, n_groups):
+    """
+    Mean of a county x month matrix per group of rows and calendar year, as (group, year, value).
+
+    `groups` holds the group (0 .. n_groups - 1) of every row. All groups are
+    reduced in one pass, rows into groups and then months into years; group
+    years without any value are left out.
+    """
+    years = months.year.to_numpy()
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    unique_years, year_pos = np.unique(years, return_inverse=True)
+    month_sums = np.zeros((n_groups, values.shape[1]))
+    month_counts = np.zeros_like(month_sums)
+    np.add.at(month_sums, groups, filled)
+    np.add.at(month_counts, groups, present)
+    sums = np.zeros((n_groups, len(unique_years)))
+    counts = np.zeros_like(sums)
+    np.add.at(sums.T, year_pos, month_sums.T)
+    np.add.at(counts.T, year_pos, month_counts.T)
+    keep = counts > 0
+    group_of, year_of = np.nonzero(keep)
+    return pd.DataFrame({'group': group_of, 'year': unique_years[year_of], 'value': sums[keep] / counts[keep]})
+
+
+class CountyPanel:
+    """
+    Dense county x month matrices of the monthly metrics.
+
+    Rows are counties (ordered by cfips, see `index`), columns are months
+    (`months`, ascending). Missing county-months are NaN. Built once at load
+    time so growth rates, CAGR, rolling means and volatility are computed for
+    every county at once with array operations instead of per-request pivots.
+    """
+
+    def __init__(self, enriched_df, metrics=PANEL_METRICS, date_col='first_day_of_month'):
+        self.metrics = list(metrics)
+        self.date_col = date_col
+        counties = enriched_df.drop_duplicates('cfips').sort_values('cfips')
+        self.index = pd.Index(counties['cfips'].to_numpy(), name='cfips')
+        self.state = counties['state'].astype(str).to_numpy()
+        self.county = counties['county'].astype(str).to_numpy()
+        self.months = pd.DatetimeIndex([])
+        self.values = {metric: np.empty((len(self.index), 0)) for metric in self.metrics}
+        self._rows_by_name = {}
+        self._rows_by_state = {}
+        self._index_names()
+        self.append(enriched_df)
+
+    def _index_names(self):
+        self._rows_by_name = {key: i for i, key in enumerate(zip(self.state, self.county))}
+        self._rows_by_state = pd.Series(np.arange(len(self.index))).groupby(self.state).apply(np.asarray).to_dict()
+
+    def copy(self):
+        """Independent copy, so appending to it leaves this panel untouched."""
+        panel = CountyPanel.__new__(CountyPanel)
+        panel.__dict__.update(self.__dict__)
+        panel.values = {metric: values.copy() for metric, values in self.values.items()}
+        return panel
+
+    def append(self, rows):
+        """
+        Write monthly rows into the panel, adding any new months or counties.
+
+        Existing county-months are overwritten, so re-ingesting a month is safe.
+        """
+        if rows.empty:
+            return
+        months = pd.DatetimeIndex(pd.to_datetime(rows[self.date_col]))
+        new_months = months.unique().difference(self.months)
+        new_counties = rows.drop_duplicates('cfips')
+        new_counties = new_counties[~new_counties['cfips'].isin(self.index)]
+
+        if len(new_counties):
+            self.index = self.index.append(pd.Index(new_counties['cfips'].to_numpy(), name='cfips'))
+            self.state = np.concatenate([self.state, new_counties['state'].astype(str).to_numpy()])
+            self.county = np.concatenate([self.county, new_counties['county'].astype(str).to_numpy()])
+            for metric in self.metrics:
+                pad = np.full((len(new_counties), len(self.months)), np.nan)
+                self.values[metric] = np.vstack([self.values[metric], pad])
+            self._index_names()
+
+        if len(new_months):
+            all_months = self.months.append(new_months).sort_values()
+            old_pos = all_months.get_indexer(self.months)
+            for metric in self.metrics:
+                grown = np.full((len(self.index), len(all_months)), np.nan)
+                grown[:, old_pos] = self.values[metric]
+                self.values[metric] = grown
+            self.months = all_months
+
+        row_pos = self.index.get_indexer(rows['cfips'])
+        col_pos = self.months.get_indexer(months)
+        for metric in self.metrics:
+            if metric in rows.columns:
+                self.values[metric][row_pos, col_pos] = rows[metric].to_numpy(dtype=float)
+
+    def rows_for(self, state=None, county=None):
+        """Panel row positions for a state, a county (name within the state) or everything."""
+        if state and county:
+            row = self._rows_by_name.get((state, county))
+            return np.array([], dtype=int) if row is None else np.array([row])
+        if state:
+            return self._rows_by_state.get(state, np.array([], dtype=int))
+        if county:
+            return np.flatnonzero(self.county == county)
+        return np.arange(len(self.index))
+
+    def rows_for_cfips(self, cfips):
+        """Panel row positions of the counties `cfips`, -1 for counties not in the panel."""
+        return self.index.get_indexer(cfips)
+
+    def _column(self, month):
+        pos = self.months.get_indexer([pd.Timestamp(month)])[0]
+        return None if pos < 0 else pos
+
+    def at(self, metric, month):
+        """Values of every county at one month (NaN column if the month is absent)."""
+        col = self._column(month)
+        if col is None:
+            return np.full(len(self.index), np.nan)
+        return self.values[metric][:, col]
+
+    def frames(self, metric, cfips):
+        """
+        Month x county matrix of `metric` for the counties `cfips`, in that order.
+
+        Row `i` holds every county's value at `months[i]`, ready to be swapped
+        in as the colour array of a map drawn with the same county order.
+        Counties missing from the panel are NaN.
+        """
+        rows = self.index.get_indexer(cfips)
+        values = self.values[metric][np.maximum(rows, 0)]
+        values[rows < 0] = np.nan
+        return values.T
+
+    def growth(self, metric='active', months=12, end=None):
+        """Percent change over `months` months ending at `end` (latest month by default)."""
+        end = pd.Timestamp(end) if end is not None else self.months.max()
+        start = end - pd.DateOffset(months=months)
+        before, after = self.at(metric, start), self.at(metric, end)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (after - before) / before * 100
+
+    def mean_yoy_growth(self, metric='active', years=3, end=None):
+        """Mean of the last `years` year-over-year percent changes, ignoring missing years."""
+        end = pd.Timestamp(end) if end is not None else self.months.max()
+        changes = np.column_stack([
+            self.growth(metric, 12, end - pd.DateOffset(years=k)) for k in range(years)
+        ])
+        return pd.DataFrame(changes).mean(axis=1).to_numpy()
+
+    def cagr(self, metric='active', start=None, end=None):
+        """Compound annual growth rate in percent between two months (full span by default)."""
+        start = pd.Timestamp(start) if start is not None else self.months.min()
+        end = pd.Timestamp(end) if end is not None else self.months.max()
+        years = ((end.year - start.year) * 12 + end.month - start.month) / 12
+        first, last = self.at(metric, start), self.at(metric, end)
+        if years <= 0:
+            return np.full(len(self.index), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (np.power(last / first, 1 / years) - 1) * 100
+
+    def rolling_mean(self, metric='microbusiness_density', window=3):
+        """Trailing `window`-month mean for every county and month (NaN until the window is full)."""
+        values = self.values[metric]
+        out = np.full(values.shape, np.nan)
+        if values.shape[1] >= window:
+            out[:, window - 1:] = sliding_window_view(values, window, axis=1).mean(axis=-1)
+        return out
+
+    def volatility(self, metric='active', window=12):
+        """
+        Standard deviation of month-over-month percent changes over the trailing `window` months.
+        """
+        values = self.values[metric]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            changes = np.diff(values, axis=1) / values[:, :-1] * 100
+        out = np.full(values.shape, np.nan)
+        if changes.shape[1] >= window:
+            out[:, window:] = sliding_window_view(changes, window, axis=1).std(axis=-1, ddof=1)
+        return out
+
+    def yearly_mean(self, metric, rows):
+        """Mean of `metric` over the given county rows for each calendar year, as (year, value)."""
+        return yearly_means(self.values[metric][rows], self.months)
+
+    def yearly_mean_by(self, metric, rows, groups, n_groups):
+        """Yearly means of `metric` for several groups of county rows at once, as (group, year, value)."""
+        return grouped_yearly_means(self.values[metric][rows], self.months, groups, n_groups)
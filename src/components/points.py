@@ -0,0 +1,111 @@
+import numpy as np
+
+from .stats import grouped_weighted_mean
+
+# below this zoom the points map shows one point per state
+STATE_LEVEL_MAX_ZOOM = 3.5
+# from this zoom on every county is its own point; in between counties are binned on a grid
+COUNTY_LEVEL_MIN_ZOOM = 6
+# width of a grid cell on screen, in pixels
+CLUSTER_PX = 40
+# share of the viewport added on every side, so a small pan does not uncover empty map
+VIEWPORT_MARGIN = 0.25
+
+
+def cell_degrees(zoom):
+    """Grid cell size in degrees that spans about CLUSTER_PX pixels at `zoom` (512 px tiles)."""
+    return CLUSTER_PX * 360 / (512 * 2 ** zoom)
+
+
+class PointLevels:
+    """
+    County centroids aggregated to the level of detail of the points map.
+
+    At low zoom counties are merged into one point per state, at medium zoom
+    into grid cells about CLUSTER_PX pixels wide, and at high zoom every
+    county is its own point. Aggregated points sit at the mean centroid of
+    their counties, carry the total of `active` and the population-weighted
+    mean of the colour metric (as in the metrics panel). Grid and county
+    points are limited to the viewport, so the number of points sent stays
+    around what fits on screen however many counties (or finer areas) there
+    are. Everything is a few vectorized passes over the county arrays.
+    """
+
+    def __init__(self, snapshot, stats):
+        frame = snapshot.frame
+        self._stats = stats
+        self.cfips_fixed = frame['cfips_fixed'].to_numpy()
+        self.lat = frame['centroid_lat'].to_numpy(dtype=float)
+        self.lng = frame['centroid_lng'].to_numpy(dtype=float)
+        self.located = ~np.isnan(self.lat) & ~np.isnan(self.lng)
+
+    @staticmethod
+    def level(zoom):
+        if zoom < STATE_LEVEL_MAX_ZOOM:
+            return 'state'
+        if zoom < COUNTY_LEVEL_MIN_ZOOM:
+            return 'grid'
+        return 'county'
+
+    def _in_view(self, rows, bounds):
+        lat_min, lat_max, lng_min, lng_max = bounds
+        lat_margin = (lat_max - lat_min) * VIEWPORT_MARGIN
+        lng_margin = (lng_max - lng_min) * VIEWPORT_MARGIN
+        lat, lng = self.lat[rows], self.lng[rows]
+        inside = ((lat >= lat_min - lat_margin) & (lat <= lat_max + lat_margin)
+                  & (lng >= lng_min - lng_margin) & (lng <= lng_max + lng_margin))
+        return rows[inside]
+
+    def points(self, metric, zoom, bounds=None, rows=None):
+        """
+        Points to draw at `zoom`, as a dict of equal length arrays.
+
+        `rows` restricts the counties (e.g. a selected state, see
+        `CountyStats.rows_for`), `bounds` is the visible
+        (lat_min, lat_max, lng_min, lng_max). Keys: lat, lng, value (colour
+        metric), active, count (counties merged), label, and key: the cfips
+        of a county point or the state of a state point, None for grid cells.
+        """
+        level = self.level(zoom)
+        rows = np.arange(len(self.lat)) if rows is None else np.asarray(rows)
+        rows = rows[self.located[rows]]
+        if bounds is not None and level != 'state':
+            rows = self._in_view(rows, bounds)
+
+        stats = self._stats
+        values = stats.values(metric)[rows]
+        active = stats.values('active')[rows]
+        if level == 'county':
+            labels = np.char.add(np.char.add(stats.county[rows].astype(str), ', '), stats.state[rows].astype(str))
+            return {
+                'level': level, 'lat': self.lat[rows], 'lng': self.lng[rows], 'value': values,
+                'active': active, 'count': np.ones(len(rows), dtype=int),
+                'label': labels, 'key': self.cfips_fixed[rows],
+            }
+
+        if level == 'state':
+            codes = stats.state_codes[rows]
+        else:
+            cell = cell_degrees(zoom)
+            codes = (np.floor(self.lat[rows] / cell).astype(np.int64) * 1_000_000
+                     + np.floor(self.lng[rows] / cell).astype(np.int64))
+        # group ids 0 .. n - 1 over the groups actually present
+        groups, group_of = np.unique(codes, return_inverse=True)
+        n = len(groups)
+        count = np.bincount(group_of, minlength=n)
+        if level == 'state':
+            labels = np.asarray(stats.states)[groups].astype(str)
+            keys = labels
+        else:
+            labels = np.char.add(count.astype(str), np.where(count == 1, ' county', ' counties'))
+            keys = np.full(n, None, dtype=object)
+        return {
+            'level': level,
+            'lat': np.bincount(group_of, weights=self.lat[rows], minlength=n) / np.maximum(count, 1),
+            'lng': np.bincount(group_of, weights=self.lng[rows], minlength=n) / np.maximum(count, 1),
+            'value': grouped_weighted_mean(values, stats.population[rows], group_of, n),
+            'active': np.bincount(group_of, weights=np.nan_to_num(active), minlength=n),
+            'count': count,
+            'label': labels,
+            'key': keys,
+        }
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+
+# index name -> census column it ranks; growth is derived from the monthly panel
+CENSUS_INDICES = {
+    'sellability': 'median_hh_inc',
+    'hireability': 'pct_college',
+}
+
+
+def percentile_of(values):
+    """
+    Percentile of every value within `values`, ignoring missing entries.
+
+    Matches the card definition: share of counties whose value is less than
+    or equal to the county's own value, in percent, rounded to two decimals.
+    """
+    values = np.asarray(values, dtype=float)
+    valid = np.sort(values[~np.isnan(values)])
+    result = np.full(values.shape, np.nan)
+    if len(valid) == 0:
+        return result
+    present = ~np.isnan(values)
+    result[present] = np.round(np.searchsorted(valid, values[present], side='right') / len(valid) * 100, 2)
+    return result
+
+
+class PercentileRanker:
+    """
+    Per-county percentile table for the Sellability / Growth / Hireability cards.
+
+    Every county is ranked once at load time and the result is stored in
+    `table`, indexed by cfips, so a card update is a single row lookup.
+    Census indices never change with new months; `add_months` writes the
+    new rows into the shared `CountyPanel` and re-ranks the growth index only.
+    """
+
+    def __init__(self, enriched_df, panel, census_year='2021', growth_years=3):
+        self.census_year = census_year
+        self.growth_years = growth_years
+        self.panel = panel
+
+        per_county = enriched_df.drop_duplicates('cfips').set_index('cfips')
+        self._census = pd.DataFrame({
+            index: per_county[f"{column}_{census_year}"] for index, column in CENSUS_INDICES.items()
+        })
+
+        self.table = pd.DataFrame(index=panel.index.union(self._census.index))
+        for index in CENSUS_INDICES:
+            self.table[index] = pd.Series(percentile_of(self._census[index]), index=self._census.index)
+        self.refresh_growth()
+
+    def growth(self):
+        """Mean year-over-year % change in `active`, ending at the latest month."""
+        return pd.Series(self.panel.mean_yoy_growth('active', self.growth_years), index=self.panel.index)
+
+    def refresh_growth(self):
+        """Re-rank the growth index from the current panel (e.g. after new months were appended)."""
+        new_counties = self.panel.index.difference(self.table.index)
+        if len(new_counties):
+            self.table = self.table.reindex(self.table.index.append(new_counties))
+        self.table['growth'] = percentile_of(self.growth().reindex(self.table.index))
+
+    def copy(self, panel=None):
+        """Independent copy of the ranker, optionally bound to another panel."""
+        ranker = PercentileRanker.__new__(PercentileRanker)
+        ranker.__dict__.update(self.__dict__)
+        ranker.panel = self.panel if panel is None else panel
+        ranker.table = self.table.copy()
+        return ranker
+
+    def add_months(self, new_rows):
+        """Append newly arrived monthly rows to the panel and re-rank the growth index only."""
+        if new_rows.empty:
+            return
+        self.panel.append(new_rows)
+        self.refresh_growth()
+
+    def lookup(self, cfips):
+        """Percentiles for one county as a dict, or None if the county is unknown."""
+        if cfips not in self.table.index:
+            return None
+        return self.table.loc[cfips].to_dict()
+
+    def lookup_many(self, cfips):
+        """Percentiles for several counties, one row per county of `cfips` in that order (NaN if unknown)."""
+        return self.table.reindex(cfips)
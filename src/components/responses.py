@@ -0,0 +1,231 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import flask
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# escaped like plotly's encoder does, so the JSON can be embedded in a page as it is
+_UNSAFE_CHARACTERS = (
+    ("<", "\\u003c"), (">", "\\u003e"), ("/", "\\u002f"), ("\u2028", "\\u2028"), ("\u2029", "\\u2029"),
+)
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'text/javascript', 'text/css', 'text/html', 'text/plain',
+    'image/svg+xml',
+}
+
+CALLBACK_PATH = '/_dash-update-component'
+
+
+def _default(obj):
+    # Dash components and Patch objects first: a Patch answers every other attribute lookup
+    if hasattr(type(obj), 'to_plotly_json'):
+        return obj.to_plotly_json()
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'M':
+            return np.datetime_as_string(obj).tolist()
+        # object and string arrays, or numeric arrays orjson cannot take as they are
+        return obj.tolist()
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return _default(obj.to_numpy())
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, np.datetime64):
+        return str(obj)
+    if isinstance(obj, pd.Timestamp):
+        return obj.to_pydatetime()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def to_json(value):
+    """
+    JSON of a payload the app builds itself (the JSON routes), written by orjson.
+
+    NumPy arrays are written straight from their buffers and pandas values
+    are converted on the way; anything orjson does not know goes through
+    Flask's default encoder instead. Without orjson this is Flask's encoder.
+    """
+    if orjson is None:
+        return flask.json.dumps(value)
+    try:
+        text = orjson.dumps(value, default=_default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode('utf8')
+    except TypeError:
+        return flask.json.dumps(value)
+    for unsafe, safe in _UNSAFE_CHARACTERS:
+        if unsafe in text:
+            text = text.replace(unsafe, safe)
+    return text
+
+
+class OrjsonProvider(flask.json.provider.DefaultJSONProvider):
+    """
+    Flask JSON provider writing with `to_json`, set as `server.json`.
+
+    Used by `flask.jsonify` in the app's routes. Dash serializes callback
+    responses itself (through plotly, which also uses orjson when installed).
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return to_json(obj)
+
+
+class ResponseCompression:
+    """
+    Compression and conditional responses for everything `app.server` sends.
+
+    Requests of the callbacks in `conditional_outputs` (outputs that depend
+    only on the callback inputs and the dataset) are tagged with an ETag
+    computed from the request body and the dataset version, before the
+    callback runs: a client that sends the tag back (see
+    `assets/conditional_requests.js`) gets a 304 without the callback
+    running or anything being encoded. Other callbacks are never answered
+    from a tag, since their output may depend on server state that is not
+    in the request. GET responses (layout,
+    JSON routes, component bundles) get an ETag of their content and are
+    answered conditionally the usual way.
+
+    Responses are compressed with brotli or gzip, whichever the client
+    prefers (brotli only when the `brotli` package is installed). The
+    compressed bytes are kept in a small LRU keyed on a hash of the content,
+    so the same figure or bundle requested again is not compressed again.
+    """
+
+    def __init__(self, version=lambda: '', conditional_outputs=(), min_bytes=1024, gzip_level=6,
+                 brotli_quality=5, cache_size=64):
+        self.version = version
+        self.conditional_outputs = tuple(conditional_outputs)
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self.not_modified = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cache_hits = 0
+        self._compressed = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, version=lambda: '', conditional_outputs=()):
+        """Enabled unless SMB_COMPRESSION is 'off' (e.g. behind a proxy that compresses)."""
+        if os.environ.get("SMB_COMPRESSION", "on").lower() in ("off", "0", "false", "no"):
+            return None
+        return cls(version=version, conditional_outputs=conditional_outputs,
+                   min_bytes=int(os.environ.get("SMB_COMPRESS_MIN_BYTES", 1024)))
+
+    def init_app(self, server):
+        server.before_request(self._answer_unchanged)
+        server.after_request(self._finish)
+
+    def _callback_etag(self, request):
+        if request.method != 'POST' or not request.path.endswith(CALLBACK_PATH) or request.args:
+            # background job polls carry their job in the query string
+            return None
+        # the output string of a multi-output callback lists them all, e.g. "..map-placeholder.figure...map-view.data.."
+        output = (request.get_json(silent=True) or {}).get('output', '')
+        if not isinstance(output, str) or not any(name in output for name in self.conditional_outputs):
+            return None
+        digest = hashlib.blake2b(self.version().encode(), digest_size=16)
+        digest.update(request.get_data())
+        return digest.hexdigest()
+
+    def _answer_unchanged(self):
+        request = flask.request
+        etag = self._callback_etag(request)
+        flask.g.smb_callback_etag = etag
+        if etag is not None and request.if_none_match.contains_weak(etag):
+            with self._lock:
+                self.not_modified += 1
+            response = flask.Response(status=304)
+            response.set_etag(etag)
+            return response
+        return None
+
+    def _finish(self, response):
+        request = flask.request
+        if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+            return response
+
+        etag = flask.g.get('smb_callback_etag')
+        if etag is not None:
+            # the first response of a background job only names the job; it must not be replayed
+            if not response.get_data()[:64].lstrip().startswith(b'{"cacheKey"'):
+                response.set_etag(etag)
+        elif request.method == 'GET':
+            if response.get_etag()[0] is None:
+                response.add_etag()
+            response.make_conditional(request)
+            if response.status_code == 304:
+                with self._lock:
+                    self.not_modified += 1
+                return response
+
+        self._compress(request, response)
+        return response
+
+    def _compress(self, request, response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES or 'Content-Encoding' in response.headers:
+            return
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            return
+        encoding = request.accept_encodings.best_match(['br', 'gzip'] if brotli is not None else ['gzip'])
+        if encoding is None:
+            return
+
+        # keyed on the content: the same callback request can be answered with a patch or a full figure
+        key = (hashlib.blake2b(data, digest_size=16).digest(), encoding)
+        with self._lock:
+            body = self._compressed.get(key)
+            if body is not None:
+                self._compressed.move_to_end(key)
+                self.cache_hits += 1
+        if body is None:
+            if encoding == 'br':
+                body = brotli.compress(data, quality=self.brotli_quality)
+            else:
+                body = gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+            with self._lock:
+                self._compressed[key] = body
+                while len(self._compressed) > self.cache_size:
+                    self._compressed.popitem(last=False)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        etag, _ = response.get_etag()
+        if etag is not None:
+            # the tag was computed on the uncompressed bytes: weak, as the same content in another encoding
+            response.set_etag(etag, weak=True)
+        with self._lock:
+            self.bytes_in += len(data)
+            self.bytes_out += len(body)
+
+    def gauges(self):
+        with self._lock:
+            return {
+                "smb_responses_not_modified_total": self.not_modified,
+                "smb_response_bytes_total": self.bytes_in,
+                "smb_response_compressed_bytes_total": self.bytes_out,
+                "smb_response_compression_cache_hits_total": self.cache_hits,
+                "smb_response_compression_cache_entries": len(self._compressed),
+            }
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+from .ranking import percentile_of
+
+# score metric -> census column it is computed from; growth comes from the ranker's panel
+SCORE_METRICS = {
+    'sellability': 'median_hh_inc',
+    'hireability': 'pct_college',
+    'growth': None,
+    'broadband': 'pct_bb',
+    'it_workers': 'pct_it_workers',
+}
+
+SCORE_METRIC_LABELS = {
+    'sellability': 'Sellability (income)',
+    'hireability': 'Hireability (college)',
+    'growth': 'Growth',
+    'broadband': 'Broadband',
+    'it_workers': 'IT workforce',
+}
+
+SCORE_METHODS = ('percentile', 'zscore')
+
+
+class SiteScorer:
+    """
+    Composite site score of every county from a weighted set of metrics.
+
+    Each metric is normalised once at load time, both as a percentile
+    (0-100, as on the BI cards) and as a z-score, into a county x metric
+    matrix. A score for new weights is then a matrix-vector product, and the
+    top counties are found with `argpartition`, so changing weights costs
+    well under a millisecond. Missing values are left out of a county's
+    score, with the remaining weights rescaled.
+    """
+
+    def __init__(self, snapshot, ranker, census_year='2021'):
+        frame = snapshot.frame
+        self.cfips = frame['cfips'].to_numpy()
+        self.state = frame['state'].astype(str).to_numpy()
+        self.county = frame['county'].astype(str).to_numpy()
+        self.metrics = list(SCORE_METRICS)
+
+        growth = ranker.growth().reindex(self.cfips).to_numpy()
+        raw = np.column_stack([
+            growth if column is None else frame[f"{column}_{census_year}"].to_numpy(dtype=float)
+            for column in SCORE_METRICS.values()
+        ])
+        self.raw = raw
+        self.percentiles = np.column_stack([percentile_of(raw[:, i]) for i in range(raw.shape[1])])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.zscores = (raw - np.nanmean(raw, axis=0)) / np.nanstd(raw, axis=0)
+
+    def _weights(self, weights):
+        unknown = set(weights) - set(self.metrics)
+        if unknown:
+            raise ValueError(f"unknown score metrics {sorted(unknown)}, expected some of {self.metrics}")
+        return np.array([float(weights.get(metric, 0.0)) for metric in self.metrics])
+
+    def scores(self, weights, method='percentile'):
+        """Composite score of every county, in snapshot order; NaN where no weighted metric is known."""
+        if method not in SCORE_METHODS:
+            raise ValueError(f"unknown score method {method!r}, expected one of {SCORE_METHODS}")
+        w = self._weights(weights)
+        values = self.percentiles if method == 'percentile' else self.zscores
+        present = ~np.isnan(values)
+        total = np.where(present, values, 0.0) @ w
+        weight = present @ np.abs(w)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(weight > 0, total / weight, np.nan)
+
+    def top(self, weights, k=10, state=None, method='percentile'):
+        """
+        The `k` best scoring counties, optionally within one state, best first.
+
+        Returns a DataFrame with the rank, cfips, state, county, composite
+        score and the percentile of every metric.
+        """
+        scores = self.scores(weights, method)
+        candidates = np.flatnonzero(~np.isnan(scores) & ((self.state == state) if state else True))
+        k = max(0, min(int(k), len(candidates)))
+        if k == 0:
+            rows = candidates[:0]
+        else:
+            # partial selection of the k largest, then sort only those
+            best = np.argpartition(-scores[candidates], k - 1)[:k]
+            rows = candidates[best[np.argsort(-scores[candidates][best], kind='stable')]]
+
+        result = pd.DataFrame({
+            'rank': np.arange(1, len(rows) + 1),
+            'cfips': self.cfips[rows],
+            'state': self.state[rows],
+            'county': self.county[rows],
+            'score': scores[rows],
+        })
+        for i, metric in enumerate(self.metrics):
+            result[metric] = self.percentiles[rows, i]
+        return result
@@ -0,0 +1,184 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+_MISSING = object()
+
+
+def dataset_version(paths):
+    """
+    Short hash identifying the current data files.
+
+    Uses each file's path, size and modification time, which is enough to
+    notice a rebuilt store or a replaced GeoJSON without reading the files.
+    Missing paths are skipped.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+def _cache_key(name, args):
+    return hashlib.sha1(json.dumps([name, args], default=str, sort_keys=True).encode()).hexdigest()
+
+
+class SharedCache:
+    """
+    Callback output cache stored in a local SQLite file.
+
+    Every gunicorn worker opens the same file, so a figure computed by one
+    worker is served by the others and survives restarts. Entries are keyed
+    on the callback name, its inputs and the dataset version, so workers on
+    different versions (e.g. while an ingest rolls out) keep their entries
+    side by side. Entries of a version nobody reads any more are not deleted
+    up front: they age out like any other entry. Entries older than `ttl`
+    seconds are treated as misses and the least recently used ones are
+    evicted once the total stored size exceeds `max_bytes`.
+
+    With `path=None` the cache is disabled and `cached` callbacks always run.
+    """
+
+    def __init__(self, path=None, version='', ttl=None, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # optional hook called as on_lookup('shared', hit) for callback metrics
+        self.on_lookup = None
+        self._local = threading.local()
+        self.version = version
+        if self.enabled:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._connection() as conn:
+                columns = {row[1]: row[5] for row in conn.execute("PRAGMA table_info(entries)")}
+                if columns and not columns.get('version'):
+                    # caches written before the version was part of the key
+                    conn.execute("DROP TABLE entries")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    "key TEXT, version TEXT, value BLOB, size INTEGER, created REAL, accessed REAL, "
+                    "PRIMARY KEY (key, version))"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    @classmethod
+    def from_env(cls, version):
+        """Build the cache from SMB_SHARED_CACHE, SMB_SHARED_CACHE_TTL and SMB_SHARED_CACHE_MB."""
+        ttl = os.environ.get("SMB_SHARED_CACHE_TTL")
+        return cls(
+            path=os.environ.get("SMB_SHARED_CACHE") or None,
+            version=version,
+            ttl=float(ttl) if ttl else None,
+            max_bytes=int(float(os.environ.get("SMB_SHARED_CACHE_MB", 256)) * 1024 * 1024),
+        )
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def _connection(self):
+        # one connection per thread and per process (workers may fork after import)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def set_version(self, version):
+        """Read and write entries of another dataset version; other versions' entries are left to eviction."""
+        self.version = version
+
+    def get(self, key):
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, created FROM entries WHERE key = ? AND version = ?", (key, self.version)
+        ).fetchone()
+        now = time.time()
+        hit = row is not None and (self.ttl is None or now - row[1] <= self.ttl)
+        if self.on_lookup is not None:
+            self.on_lookup('shared', hit)
+        if not hit:
+            self.misses += 1
+            return _MISSING
+        conn.execute("UPDATE entries SET accessed = ? WHERE key = ? AND version = ?", (now, key, self.version))
+        self.hits += 1
+        return pickle.loads(zlib.decompress(row[0]))
+
+    def set(self, key, value, version=None):
+        # store plotly figures as plain dicts: unpickling a Figure re-runs its validation
+        if hasattr(value, 'to_plotly_json'):
+            value = value.to_plotly_json()
+        blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, version, value, size, created, accessed) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, self.version if version is None else version, blob, len(blob), now, now),
+        )
+        self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        if self.ttl is not None:
+            conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl,))
+        # drop least recently used entries until we are back under the bound
+        excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        freed = 0
+        stale = []
+        for key, version, size in conn.execute("SELECT key, version, size FROM entries ORDER BY accessed"):
+            stale.append((key, version))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ? AND version = ?", stale)
+
+    def lookup(self, name, args):
+        """Output stored by `cached(name)` for `args`, or None on a miss or when disabled."""
+        if not self.enabled:
+            return None
+        value = self.get(_cache_key(name, list(args)))
+        return None if value is _MISSING else value
+
+    def cached(self, name):
+        """Decorator caching a callback's output on its name, inputs and the dataset version."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args):
+                if not self.enabled:
+                    return func(*args)
+                key = _cache_key(name, args)
+                # a value computed while the dataset is swapped stays tagged with the old version
+                version = self.version
+                value = self.get(key)
+                if value is _MISSING:
+                    value = func(*args)
+                    self.set(key, value, version)
+                return value
+            return wrapper
+        return decorator
+
+    def stats(self):
+        stats = {'enabled': self.enabled, 'version': self.version, 'hits': self.hits, 'misses': self.misses}
+        if self.enabled:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            stats.update(entries=entries, bytes=size, max_bytes=self.max_bytes)
+        return stats
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+
+def _as_list(value):
+    if value is None or value == [] or value == "":
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+class CountySnapshot:
+    """
+    Latest row per county, built once at load time.
+
+    Rows are sorted by state and county so every state occupies one
+    contiguous block. Selections are resolved through precomputed position
+    lookups instead of boolean masks over the full monthly panel, so the
+    cost of `select` does not grow with the number of months.
+    """
+
+    def __init__(self, enriched_df, date_col='first_day_of_month'):
+        self.date_col = date_col
+        latest = enriched_df.sort_values(date_col).groupby('cfips').last().reset_index()
+        latest['cfips_fixed'] = latest['cfips'].astype(str).str.zfill(5)
+        latest = latest.sort_values(['state', 'county'], kind='stable').reset_index(drop=True)
+
+        self.frame = latest
+        self._state_rows = {
+            state: slice(rows[0], rows[-1] + 1)
+            for state, rows in latest.groupby('state', sort=False, observed=True).indices.items()
+        }
+        self._state_county_rows = latest.groupby(['state', 'county'], sort=False, observed=True).indices
+        self._county_rows = latest.groupby('county', sort=False, observed=True).indices
+
+    def updated(self, new_rows):
+        """
+        Snapshot with `new_rows` folded in.
+
+        Only the current latest rows and the new ones are regrouped, so the
+        cost does not depend on how many months are already loaded.
+        """
+        return CountySnapshot(pd.concat([self.frame, new_rows], ignore_index=True), self.date_col)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def select(self, state=None, county=None):
+        """Return the snapshot rows for the given state(s) and/or county name(s)."""
+        states = _as_list(state)
+        counties = _as_list(county)
+
+        if not states and not counties:
+            return self.frame
+
+        if states and not counties:
+            if len(states) == 1:
+                return self.frame.iloc[self._state_rows.get(states[0], slice(0, 0))]
+            rows = [np.arange(len(self.frame))[self._state_rows[s]] for s in states if s in self._state_rows]
+        elif states:
+            rows = [self._state_county_rows[(s, c)] for s in states for c in counties
+                    if (s, c) in self._state_county_rows]
+        else:
+            rows = [self._county_rows[c] for c in counties if c in self._county_rows]
+
+        if not rows:
+            return self.frame.iloc[0:0]
+        return self.frame.iloc[np.concatenate(rows)]
+
+    def county_lookup(self):
+        """
+        State -> county cfips and cfips -> (state, county) mappings, as plain JSON.
+
+        Shipped once to the browser so the county dropdown and map clicks
+        are resolved clientside. Counties are listed alphabetically per state.
+        """
+        cfips = self.frame['cfips_fixed'].tolist()
+        states = self.frame['state'].astype(str).tolist()
+        counties = self.frame['county'].astype(str).tolist()
+        by_state = {}
+        for fips, state in zip(cfips, states):
+            by_state.setdefault(state, []).append(fips)
+        return {
+            'states': by_state,
+            'counties': {fips: [state, county] for fips, state, county in zip(cfips, states, counties)},
+        }
+
+    def lookup_cfips(self, state, county):
+        """Resolve a (state, county name) pair to its cfips, or None if unknown."""
+        rows = self._state_county_rows.get((state, county))
+        if rows is None or len(rows) == 0:
+            return None
+        return self.frame['cfips'].iat[rows[0]]
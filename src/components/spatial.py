@@ -0,0 +1,119 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Great-circle distance in km from one point to arrays of points."""
+    lat, lng, lats, lngs = map(np.radians, (lat, lng, np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float)))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class CentroidIndex:
+    """
+    Grid index over county centroids for radius, nearest-neighbour and bounding-box queries.
+
+    Centroids are bucketed into `cell_deg` x `cell_deg` degree cells and
+    stored sorted by cell, so the cells of one grid row form a contiguous
+    id range found with two binary searches. A query only looks at the
+    points of the cells its area overlaps and computes haversine distances
+    for those, instead of for every county.
+    """
+
+    def __init__(self, cfips, lat, lng, cell_deg=1.0):
+        self.cell_deg = cell_deg
+        self._n_cols = int(np.ceil(360 / cell_deg))
+        cfips = np.asarray(cfips)
+        lat = np.asarray(lat, dtype=float)
+        lng = np.asarray(lng, dtype=float)
+        known = ~np.isnan(lat) & ~np.isnan(lng)
+
+        cells = self._cell(lat[known], lng[known])
+        order = np.argsort(cells, kind='stable')
+        self._cells = cells[order]
+        self.cfips = cfips[known][order]
+        self.lat = lat[known][order]
+        self.lng = lng[known][order]
+        self._pos = {fips: pos for pos, fips in enumerate(self.cfips.tolist())}
+
+    @classmethod
+    def from_snapshot(cls, snapshot, cell_deg=1.0):
+        frame = snapshot.frame
+        return cls(frame['cfips'].to_numpy(), frame['centroid_lat'], frame['centroid_lng'], cell_deg)
+
+    def __len__(self):
+        return len(self.cfips)
+
+    def _row_col(self, lat, lng):
+        row = np.floor((np.clip(lat, -90, 90) + 90) / self.cell_deg).astype(int)
+        col = np.floor((np.clip(lng, -180, 180 - 1e-9) + 180) / self.cell_deg).astype(int)
+        return row, col
+
+    def _cell(self, lat, lng):
+        row, col = self._row_col(lat, lng)
+        return row * self._n_cols + col
+
+    def _candidates(self, lat_min, lat_max, lng_min, lng_max):
+        """Positions of the points in every cell overlapping the box."""
+        row_min, col_min = self._row_col(lat_min, lng_min)
+        row_max, col_max = self._row_col(lat_max, lng_max)
+        rows = np.arange(row_min, row_max + 1) * self._n_cols
+        starts = np.searchsorted(self._cells, rows + col_min, side='left')
+        ends = np.searchsorted(self._cells, rows + col_max, side='right')
+        lengths = ends - starts
+        if not lengths.sum():
+            return np.array([], dtype=int)
+        # positions start..end-1 of every row range, without a Python loop
+        offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        return np.arange(lengths.sum()) + offsets
+
+    def _result(self, positions, distances):
+        order = np.argsort(distances, kind='stable')
+        return self.cfips[positions[order]], distances[order]
+
+    def location(self, cfips):
+        """(lat, lng) of a county's centroid, or None if it is not indexed."""
+        pos = self._pos.get(int(cfips))
+        return None if pos is None else (self.lat[pos], self.lng[pos])
+
+    def within_point(self, lat, lng, radius_km):
+        """Counties whose centroid lies within `radius_km` of a point, nearest first, as (cfips, distances_km) arrays."""
+        dlat = radius_km / KM_PER_DEGREE
+        # degrees of longitude shrink towards the poles; widen the box by the box's worst latitude
+        max_lat = min(abs(lat) + dlat, 89.9)
+        dlng = min(radius_km / (KM_PER_DEGREE * np.cos(np.radians(max_lat))), 180)
+        positions = self._candidates(lat - dlat, lat + dlat, max(lng - dlng, -180), min(lng + dlng, 180))
+        distances = haversine_km(lat, lng, self.lat[positions], self.lng[positions])
+        keep = distances <= radius_km
+        return self._result(positions[keep], distances[keep])
+
+    def within(self, cfips, radius_km):
+        """Counties within `radius_km` of a county (the county itself excluded)."""
+        location = self.location(cfips)
+        if location is None:
+            return self._result(np.array([], dtype=int), np.array([]))
+        found, distances = self.within_point(*location, radius_km)
+        other = found != cfips
+        return found[other], distances[other]
+
+    def nearest(self, cfips, k=5):
+        """The `k` counties nearest to a county (itself excluded), nearest first."""
+        location = self.location(cfips)
+        if location is None or k <= 0:
+            return self._result(np.array([], dtype=int), np.array([]))
+        # grow the radius until it holds k neighbours; everything nearer is then inside it
+        radius = self.cell_deg * KM_PER_DEGREE
+        while True:
+            found, distances = self.within(cfips, radius)
+            if len(found) >= k or radius > np.pi * EARTH_RADIUS_KM:
+                return found[:k], distances[:k]
+            radius *= 2
+
+    def in_bbox(self, lat_min, lat_max, lng_min, lng_max):
+        """cfips of the counties whose centroid lies inside a lat/lng box (e.g. a map selection)."""
+        positions = self._candidates(lat_min, lat_max, lng_min, lng_max)
+        lat, lng = self.lat[positions], self.lng[positions]
+        inside = (lat >= lat_min) & (lat <= lat_max) & (lng >= lng_min) & (lng <= lng_max)
+        return self.cfips[positions[inside]]
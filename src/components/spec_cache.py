@@ -0,0 +1,122 @@
+import functools
+import threading
+from collections import OrderedDict
+
+
+def _freeze(value):
+    # dropdowns can send lists once multi-select is on; lists are not hashable
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def cache_key(chart, args):
+    """Key under which `cached(chart)` stores the result for `args`."""
+    return (chart,) + tuple(_freeze(arg) for arg in args)
+
+
+class SpecCache:
+    """
+    Bounded LRU cache of serialized Vega-Lite specs.
+
+    Chart callbacks only depend on a handful of dropdown values, so the spec
+    for a given (chart, state, county, ...) key is built once with Altair and
+    then served from here. The least recently used entry is evicted once
+    `maxsize` entries are held.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # optional hook called as on_lookup('spec', hit) for callback metrics
+        self.on_lookup = None
+        # bumped by clear(); specs built before a clear are not stored
+        self._generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Cached value for `key` without building it (counted as a hit or miss)."""
+        with self._lock:
+            hit = key in self._entries
+            if hit:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                value = self._entries[key]
+            else:
+                self.misses += 1
+        if self.on_lookup is not None:
+            self.on_lookup('spec', hit)
+        return value if hit else default
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            hit = key in self._entries
+            if hit:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                spec = self._entries[key]
+            else:
+                self.misses += 1
+            generation = self._generation
+        if self.on_lookup is not None:
+            self.on_lookup('spec', hit)
+        if hit:
+            return spec
+
+        spec = build()
+
+        with self._lock:
+            if generation != self._generation:
+                return spec
+            self._entries[key] = spec
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return spec
+
+    def cached(self, chart):
+        """Decorator caching a chart callback on its positional arguments."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args):
+                return self.get_or_build(cache_key(chart, args), lambda: func(*args))
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self.hits = 0
+            self.misses = 0
+
+
+def warm_up(builders, states):
+    """
+    Pre-render the national view and every state view of each chart builder.
+
+    `builders` maps each cached chart callback to its inputs after the state
+    and county, as a page load sends them. Callbacks are called as
+    builder(state, None, *inputs), so the warmed entries are the ones the
+    callbacks look up.
+    """
+    for build, inputs in builders.items():
+        build(None, None, *inputs)
+        for state in states:
+            build(state, None, *inputs)
@@ -0,0 +1,185 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+
+def grouped_weighted_quantile(values, weights, groups, n_groups, q=0.5):
+    """
+    Weighted quantile `q` of `values` within each group, as an array of length `n_groups`.
+
+    `groups` holds the group code (0 .. n_groups - 1) of every value. Entries
+    with a missing value or a missing / non-positive weight are ignored. The
+    quantile is the first value, in sorted order, at which the cumulative
+    weight reaches `q` of the group's total; groups without weight are NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    groups = np.asarray(groups)
+    keep = ~np.isnan(values) & ~np.isnan(weights) & (weights > 0)
+    values, weights, groups = values[keep], weights[keep], groups[keep]
+    result = np.full(n_groups, np.nan)
+    if len(values) == 0:
+        return result
+
+    # sort by group, then value: every group becomes one block of ascending values
+    order = np.lexsort((values, groups))
+    values, weights, groups = values[order], weights[order], groups[order]
+    cumulative = np.cumsum(weights)
+
+    ends = np.cumsum(np.bincount(groups, minlength=n_groups))
+    starts = ends - np.bincount(groups, minlength=n_groups)
+    padded = np.concatenate([[0.0], cumulative])
+    totals = padded[ends] - padded[starts]
+    pos = np.searchsorted(cumulative, padded[starts] + q * totals, side='left')
+
+    present = totals > 0
+    pos = np.clip(pos, starts, np.maximum(ends - 1, starts))
+    result[present] = values[pos[present]]
+    return result
+
+
+def weighted_quantile(values, weights, q=0.5):
+    """Weighted quantile `q` of `values` (NaN when nothing has weight)."""
+    values = np.asarray(values, dtype=float)
+    return grouped_weighted_quantile(values, weights, np.zeros(len(values), dtype=int), 1, q)[0]
+
+
+def grouped_weighted_mean(values, weights, groups, n_groups):
+    """Weighted mean of `values` within each group; entries without value or weight are ignored."""
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    groups = np.asarray(groups)
+    keep = ~np.isnan(values) & ~np.isnan(weights)
+    sums = np.bincount(groups[keep], weights=values[keep] * weights[keep], minlength=n_groups)
+    totals = np.bincount(groups[keep], weights=weights[keep], minlength=n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(totals > 0, sums / totals, np.nan)
+
+
+def weighted_mean(values, weights):
+    """Weighted mean of `values` (NaN when nothing has weight)."""
+    values = np.asarray(values, dtype=float)
+    return grouped_weighted_mean(values, weights, np.zeros(len(values), dtype=int), 1)[0]
+
+
+class CountyStats:
+    """
+    Population-weighted statistics over the latest row of every county.
+
+    Each county is weighted by its adult population, implied by the density
+    (microbusinesses per 100 adults). Metric columns are held as float arrays
+    in the snapshot's county order, so a statistic for the nation, a state or
+    any set of counties is one pass of array operations over at most a few
+    thousand values. Per-state summaries are computed for every state at once
+    with grouped operations and kept in `state_summaries`.
+    """
+
+    def __init__(self, snapshot, census_year='2021'):
+        frame = snapshot.frame
+        self.income_col = f"median_hh_inc_{census_year}"
+        self.cfips = frame['cfips'].to_numpy()
+        self.state = frame['state'].astype(str).to_numpy()
+        self.county = frame['county'].astype(str).to_numpy()
+        self.state_codes, self.states = pd.factorize(self.state)
+        self._frame = frame
+        self._columns = {}
+
+        self.population = self._population()
+        self.state_summaries = self._summaries(np.arange(len(self.states)))
+
+    def updated(self, snapshot, new_rows):
+        """
+        Stats over `snapshot`: this one's snapshot with `new_rows` of known counties folded in.
+
+        The county order and state codes stay as they are, the population is
+        one pass over the counties and only the summaries of the states with
+        new rows are recomputed.
+        """
+        stats = copy.copy(self)
+        stats._frame = snapshot.frame
+        stats._columns = {}
+        stats.population = stats._population()
+        touched = np.flatnonzero(np.isin(self.states, new_rows['state'].astype(str).unique()))
+        stats.state_summaries = self.state_summaries.copy()
+        stats.state_summaries.iloc[touched] = stats._summaries(touched).to_numpy()
+        return stats
+
+    def _population(self):
+        active = self.values('active')
+        density = self.values('microbusiness_density')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            population = active / density * 100
+        # counties without microbusinesses carry no population information
+        return np.where(np.isfinite(population), population, np.nan)
+
+    def _summaries(self, states):
+        """Summary rows of the states at positions `states` (ascending) of `self.states`."""
+        rows = np.flatnonzero(np.isin(self.state_codes, states))
+        groups = np.searchsorted(states, self.state_codes[rows])
+        n_states = len(states)
+        population = self.population[rows]
+        return pd.DataFrame({
+            'total_microbusinesses': np.bincount(groups, weights=np.nan_to_num(self.values('active')[rows]),
+                                                 minlength=n_states),
+            'adult_population': np.bincount(groups, weights=np.nan_to_num(population), minlength=n_states),
+            'microbusiness_density': grouped_weighted_mean(
+                self.values('microbusiness_density')[rows], population, groups, n_states),
+            'median_income': grouped_weighted_quantile(
+                self.values(self.income_col)[rows], population, groups, n_states, 0.5),
+        }, index=pd.Index(self.states[states], name='state'))
+
+    def values(self, metric):
+        """Column `metric` as a float array in county order."""
+        column = self._columns.get(metric)
+        if column is None:
+            column = self._columns[metric] = self._frame[metric].to_numpy(dtype=float)
+        return column
+
+    def rows_for(self, state=None, county=None, cfips=None):
+        """Positions of the counties in a state, a county of a state, a list of cfips, or everything."""
+        if cfips is not None:
+            return np.flatnonzero(np.isin(self.cfips, cfips))
+        if state and county:
+            return np.flatnonzero((self.state == state) & (self.county == county))
+        if state:
+            return np.flatnonzero(self.state == state)
+        return np.arange(len(self.cfips))
+
+    def weighted_mean(self, metric, rows=None):
+        rows = self.rows_for() if rows is None else rows
+        return weighted_mean(self.values(metric)[rows], self.population[rows])
+
+    def weighted_quantile(self, metric, q, rows=None):
+        rows = self.rows_for() if rows is None else rows
+        return weighted_quantile(self.values(metric)[rows], self.population[rows], q)
+
+    def weighted_median(self, metric, rows=None):
+        return self.weighted_quantile(metric, 0.5, rows)
+
+    def by_state(self, metric, q=None):
+        """Population-weighted mean (or quantile `q`) of `metric` for every state."""
+        n_states = len(self.states)
+        if q is None:
+            result = grouped_weighted_mean(self.values(metric), self.population, self.state_codes, n_states)
+        else:
+            result = grouped_weighted_quantile(self.values(metric), self.population, self.state_codes, n_states, q)
+        return pd.Series(result, index=pd.Index(self.states, name='state'), name=metric)
+
+    def summary(self, state=None, county=None, cfips=None):
+        """
+        Figures of the metrics panel for the nation, a state, a county or a set of counties.
+
+        Total microbusinesses and adult population are sums over the latest
+        month of each county, the density is the population-weighted mean and
+        the income the population-weighted median.
+        """
+        if cfips is None and state and not county and state in self.state_summaries.index:
+            return self.state_summaries.loc[state].to_dict()
+        rows = self.rows_for(state, county, cfips)
+        return {
+            'total_microbusinesses': np.nansum(self.values('active')[rows]),
+            'adult_population': np.nansum(self.population[rows]),
+            'microbusiness_density': self.weighted_mean('microbusiness_density', rows),
+            'median_income': self.weighted_median(self.income_col, rows),
+        }
@@ -0,0 +1,134 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Default locations, relative to the repository root (where the app is started).
+# SMB_DATA_STORE / SMB_COUNTIES_GEOJSON point the app at other data (e.g. benchmarks).
+PANEL_PATH = "data/raw/train.csv"
+CENSUS_PATH = "data/raw/census_starter.csv"
+COUNTIES_GEOJSON_PATH = os.environ.get("SMB_COUNTIES_GEOJSON", "data/raw/geojson-counties-fips.json")
+STORE_PATH = os.environ.get("SMB_DATA_STORE", "data/processed/smb_enriched.arrow")
+LEGACY_CSV_PATH = "data/processed/smb_enriched.csv"
+
+CATEGORICAL_COLUMNS = ['state', 'county']
+DATE_COLUMN = 'first_day_of_month'
+# columns of the monthly panel that are dropped from the store (derivable from cfips + date)
+DROPPED_COLUMNS = ['row_id']
+
+
+def _ring_centroid(ring):
+    """Area-weighted centroid of a closed ring of (lng, lat) pairs, with its signed area."""
+    coords = np.asarray(ring, dtype=float)[:, :2]
+    x, y = coords[:, 0], coords[:, 1]
+    x_next, y_next = np.roll(x, -1), np.roll(y, -1)
+    cross = x * y_next - x_next * y
+    area = cross.sum() / 2
+    if area == 0:
+        return x.mean(), y.mean(), 0.0
+    return ((x + x_next) * cross).sum() / (6 * area), ((y + y_next) * cross).sum() / (6 * area), area
+
+
+def county_centroids(counties_geojson):
+    """
+    Centroid of every county polygon in the GeoJSON, keyed on integer cfips.
+
+    MultiPolygons are combined by weighting each outer ring with its area.
+    """
+    rows = []
+    for feature in counties_geojson['features']:
+        geometry = feature['geometry']
+        polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+        parts = [_ring_centroid(polygon[0]) for polygon in polygons]
+        weights = np.array([abs(area) for _, _, area in parts])
+        if weights.sum() == 0:
+            weights = np.ones(len(parts))
+        rows.append({
+            'cfips': int(feature['id']),
+            'centroid_lng': np.average([lng for lng, _, _ in parts], weights=weights),
+            'centroid_lat': np.average([lat for _, lat, _ in parts], weights=weights),
+        })
+    return pd.DataFrame(rows)
+
+
+def apply_schema(enriched_df):
+    """
+    Cast the enriched frame to the compact store schema.
+
+    state/county become categoricals, cfips an int32 and every other numeric
+    column float32 (`active` stays int32 when it has no missing values).
+    `cfips_fixed` is rebuilt from cfips rather than stored as text.
+    """
+    df = enriched_df.drop(columns=[c for c in DROPPED_COLUMNS + ['cfips_fixed'] if c in enriched_df.columns])
+    df['cfips'] = df['cfips'].astype('int32')
+    df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN])
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = df[column].astype('category')
+    for column in df.select_dtypes(include=[np.number]).columns:
+        if column == 'cfips':
+            continue
+        if column == 'active' and not df[column].isna().any():
+            df[column] = df[column].astype('int32')
+        else:
+            df[column] = df[column].astype('float32')
+    return df
+
+
+def add_fixed_cfips(df):
+    """Zero-padded 5 character FIPS code used as the GeoJSON feature id."""
+    df['cfips_fixed'] = df['cfips'].astype(str).str.zfill(5)
+    return df
+
+
+def build_enriched(panel_path=PANEL_PATH, census_path=CENSUS_PATH, counties_geojson_path=COUNTIES_GEOJSON_PATH):
+    """Join the monthly microbusiness panel with census metrics and county centroids."""
+    panel = pd.read_csv(panel_path)
+    census = pd.read_csv(census_path)
+    with open(counties_geojson_path) as f:
+        centroids = county_centroids(json.load(f))
+
+    enriched = panel.merge(census, on='cfips', how='left').merge(centroids, on='cfips', how='left')
+    return apply_schema(enriched)
+
+
+def write_store(df, path=STORE_PATH):
+    """
+    Write the frame as an uncompressed Arrow IPC file.
+
+    Compression is left off on purpose: it lets `load_store` map the file
+    straight into memory instead of decoding it into fresh buffers. The file
+    is written next to `path` and renamed over it, so running workers that
+    still map the previous store keep reading a complete file.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    df = df.drop(columns=['cfips_fixed'], errors='ignore')
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+
+def load_store(path=STORE_PATH):
+    """Memory-map the Arrow store and return it as a DataFrame."""
+    import pyarrow as pa
+
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    # split_blocks keeps each numeric column as its own block so they can stay backed by the map
+    df = table.to_pandas(split_blocks=True)
+    return add_fixed_cfips(df)
+
+
+def load_enriched(store_path=STORE_PATH, csv_path=LEGACY_CSV_PATH):
+    """
+    Load the enriched dataset, preferring the Arrow store.
+
+    Falls back to the legacy `smb_enriched.csv` so checkouts that have not
+    run `python src/ingest.py` yet keep working.
+    """
+    if os.path.exists(store_path):
+        return load_store(store_path)
+    return add_fixed_cfips(apply_schema(pd.read_csv(csv_path)))
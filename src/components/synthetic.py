@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from .store import apply_schema, add_fixed_cfips
+
+# size of the real panel the scale factors multiply
+BASE_COUNTIES = 3142
+BASE_MONTHS = 39
+N_STATES = 51
+LAST_MONTH = '2022-10-01'
+CENSUS_YEARS = range(2017, 2022)
+
+
+def generate_enriched(geo_scale=1.0, month_scale=1.0, seed=0):
+    """
+    Synthetic frame with the `smb_enriched` schema.
+
+    `geo_scale` multiplies the number of counties (~3,100) and `month_scale`
+    the number of months (~40, ending at October 2022). Values follow rough
+    real-world ranges so filters, percentiles and charts behave as they do on
+    the real data. The result is already cast with `store.apply_schema`.
+    """
+    rng = np.random.default_rng(seed)
+    n_counties = int(round(BASE_COUNTIES * geo_scale))
+    n_months = max(1, int(round(BASE_MONTHS * month_scale)))
+
+    state_idx = np.sort(rng.integers(0, N_STATES, n_counties))
+    county_no = np.zeros(n_counties, dtype=int)
+    for state in range(N_STATES):
+        members = state_idx == state
+        county_no[members] = np.arange(1, members.sum() + 1)
+    # FIPS codes are 2 digit state + 3 digit county; wrap into extra "states" past 999 counties
+    state_code = state_idx + 1 + 100 * (county_no // 1000)
+    county_code = county_no % 1000
+    cfips = state_code * 1000 + county_code
+
+    counties = pd.DataFrame({
+        'cfips': cfips,
+        'state': [f"State {code:02d}" for code in state_idx + 1],
+        'county': [f"County {no:03d}" for no in county_no],
+        'centroid_lat': rng.uniform(25, 49, n_counties),
+        'centroid_lng': rng.uniform(-124, -67, n_counties),
+    })
+    for year in CENSUS_YEARS:
+        drift = 1 + 0.02 * (year - CENSUS_YEARS[0])
+        counties[f"pct_bb_{year}"] = np.clip(rng.normal(75, 8, n_counties) * drift, 0, 100)
+        counties[f"pct_college_{year}"] = np.clip(rng.normal(22, 9, n_counties), 0, 100)
+        counties[f"pct_foreign_born_{year}"] = np.clip(rng.gamma(2, 2.5, n_counties), 0, 100)
+        counties[f"pct_it_workers_{year}"] = np.clip(rng.gamma(2, 0.6, n_counties), 0, 100)
+        counties[f"median_hh_inc_{year}"] = np.round(rng.lognormal(10.9, 0.25, n_counties) * drift)
+
+    months = pd.date_range(end=LAST_MONTH, periods=n_months, freq='MS')
+    adults = rng.lognormal(9.5, 1.2, n_counties)
+    base_active = adults * rng.uniform(0.01, 0.08, n_counties)
+    trend = rng.normal(0.003, 0.004, n_counties)
+    steps = np.arange(n_months)
+    noise = rng.normal(0, 0.01, (n_counties, n_months))
+    active = np.maximum(np.round(base_active[:, None] * (1 + trend[:, None] * steps + noise)), 1)
+
+    panel = pd.DataFrame({
+        'cfips': np.repeat(cfips, n_months),
+        'first_day_of_month': np.tile(months, n_counties),
+        'active': active.ravel(),
+        'microbusiness_density': (active / adults[:, None] * 100).ravel(),
+    })
+    enriched = panel.merge(counties, on='cfips', how='left')
+    return add_fixed_cfips(apply_schema(enriched))
+
+
+def generate_counties_geojson(enriched_df, n_vertices=64):
+    """
+    Circular county polygons around each synthetic centroid.
+
+    `n_vertices` controls the payload per feature; real county outlines
+    average a few dozen to a few hundred vertices.
+    """
+    counties = enriched_df.drop_duplicates('cfips')
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    ring = np.stack([np.cos(angles), np.sin(angles)], axis=1) * 0.15
+    features = []
+    for fips, lat, lng in zip(counties['cfips_fixed'], counties['centroid_lat'], counties['centroid_lng']):
+        coords = np.round(ring + [lng, lat], 5).tolist()
+        coords.append(coords[0])
+        features.append({'type': 'Feature', 'id': fips, 'properties': {},
+                         'geometry': {'type': 'Polygon', 'coordinates': [coords]}})
+    return {'type': 'FeatureCollection', 'features': features}
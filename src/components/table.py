@@ -0,0 +1,337 @@
+import copy
+import math
+
+import numpy as np
+import pandas as pd
+
+TABLE_COLUMNS = [
+    'state', 'county', 'cfips_fixed', 'first_day_of_month', 'microbusiness_density', 'active',
+    'median_hh_inc_2021', 'pct_college_2021', 'pct_bb_2021',
+]
+
+# DataTable filter syntax operators, longest spellings first so 'ge' is not read as 'gt'
+FILTER_OPERATORS = [
+    ['ge ', '>='], ['le ', '<='], ['lt ', '<'], ['gt ', '>'], ['ne ', '!='], ['eq ', '='],
+    ['contains '], ['datestartswith '],
+]
+
+
+def split_filter_part(filter_part):
+    """
+    Parse one `{column} op value` clause of a DataTable filter query.
+
+    Returns (column, operator, value), or (None, None, None) when the clause
+    is not understood. Same grammar as the Dash DataTable backend examples.
+    """
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                v0 = value_part[0] if value_part else ''
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    value = value_part[1: -1].replace('\\' + v0, v0)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                # word operators need spaces after them in the filter string,
+                # but we don't want these later
+                return name, operator_type[0].strip(), value
+
+    return None, None, None
+
+
+def _sort_key(values, categories=None):
+    """
+    Numeric array ordering like `values`, with missing values as NaN (sorted last).
+
+    Other values are ranked among the sorted `categories`, by default their
+    own distinct values. Returns the key and the categories (None if numeric).
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float), None
+    if categories is None:
+        codes, categories = pd.factorize(values, sort=True)
+        return np.where(codes < 0, np.nan, codes).astype(float), np.asarray(categories, dtype=object)
+    present = values.notna().to_numpy()
+    key = np.full(len(values), np.nan)
+    key[present] = np.searchsorted(categories, values.to_numpy()[present])
+    return key, categories
+
+
+def _table_frame(enriched_df, columns):
+    """The table columns of `enriched_df` as shown: ISO dates, plain strings and float64."""
+    frame = enriched_df[columns].copy()
+    frame['first_day_of_month'] = pd.to_datetime(frame['first_day_of_month']).dt.strftime('%Y-%m-%d')
+    frame['state'] = frame['state'].astype(str)
+    frame['county'] = frame['county'].astype(str)
+    # float32 store columns would round-trip as 3.7300000190734863 in the JSON records
+    for column in frame.select_dtypes(include='floating').columns:
+        frame[column] = frame[column].astype(float)
+    return frame
+
+
+def _merge_order(order, key, positions):
+    """
+    `order` (positions sorted by `key`, equal keys by position) with `positions` merged in.
+
+    `key` holds the sort key of every position, old and new; the result is
+    what a stable argsort of `key` over both would give.
+    """
+    positions = positions[np.lexsort((positions, key[positions]))]
+    sorted_keys, new_keys = key[order], key[positions]
+    at = np.searchsorted(sorted_keys, new_keys, side='left')
+    ties = at < np.searchsorted(sorted_keys, new_keys, side='right')
+    if ties.any():
+        # within a run of equal keys the order is by position: search (run, position) pairs
+        same = (sorted_keys[1:] == sorted_keys[:-1]) | (np.isnan(sorted_keys[1:]) & np.isnan(sorted_keys[:-1]))
+        run = np.concatenate([[0], np.cumsum(~same)])
+        pairs = run * len(key) + order
+        at[ties] = np.searchsorted(pairs, run[at[ties]] * len(key) + positions[ties])
+    return np.insert(order, at, positions)
+
+
+class TableBackend:
+    """
+    Server-side paging, sorting and filtering for the "Filtered Data" table.
+
+    The monthly rows are sorted by state, county and month once, so each
+    state and county is a contiguous block. For every column the row order
+    within each state block (and over the whole table) is precomputed, which
+    makes a single-column sort of a state or of the whole panel a slice of
+    that order: the cost of a page does not depend on how many rows match.
+    Filters and multi-column sorts run as one vectorized pass over the
+    selected block.
+    """
+
+    def __init__(self, enriched_df, columns=TABLE_COLUMNS):
+        columns = [c for c in columns if c in enriched_df.columns]
+        frame = _table_frame(enriched_df, columns)
+        frame = frame.sort_values(['state', 'county', 'first_day_of_month'], kind='stable').reset_index(drop=True)
+
+        self.frame = frame
+        self.columns = columns
+        self._blocks = {None: slice(0, len(frame))}
+        for key, rows in frame.groupby('state', sort=False).indices.items():
+            self._blocks[(key,)] = slice(rows[0], rows[-1] + 1)
+        for key, rows in frame.groupby(['state', 'county'], sort=False).indices.items():
+            self._blocks[key] = slice(rows[0], rows[-1] + 1)
+
+        # state code per row; lexsorting on it keeps each state's rows in its own slice
+        state_codes = pd.factorize(frame['state'], sort=True)[0]
+        self._keys = {}
+        self._categories = {}
+        self._valid_prefix = {}
+        self._global_order = {}
+        self._state_order = {}
+        for column in columns:
+            key, self._categories[column] = _sort_key(frame[column])
+            self._keys[column] = key
+            self._valid_prefix[column] = np.concatenate([[0], np.cumsum(~np.isnan(key))])
+            self._global_order[column] = np.argsort(key, kind='stable')
+            self._state_order[column] = np.lexsort((key, state_codes))
+
+    def updated(self, new_rows):
+        """
+        Table with `new_rows` (enriched rows, e.g. from `read_new_months`) added.
+
+        Rows of counties already in the table are merged into the sorted
+        frame, the blocks and every column's orders, so only the new rows are
+        formatted and sorted and the rest is a linear pass over arrays. Rows
+        of a new county need a new block, and the table is rebuilt. Either
+        way the result equals a TableBackend built over all rows.
+        """
+        new = _table_frame(new_rows, self.columns)
+        if new.empty:
+            return self
+        county_blocks = sorted((key for key in self._blocks if key is not None and len(key) == 2),
+                               key=lambda key: self._blocks[key].start)
+        block_index = {key: i for i, key in enumerate(county_blocks)}
+        new_blocks = [block_index.get(key, -1) for key in zip(new['state'], new['county'])]
+        if min(new_blocks) < 0:
+            return TableBackend(pd.concat([self.frame, new], ignore_index=True), self.columns)
+
+        # sort keys over both, ranking strings among the old and new distinct values
+        old_keys, new_keys, categories = {}, {}, {}
+        for column in self.columns:
+            known = self._categories[column]
+            if known is None:
+                old_keys[column] = self._keys[column]
+                new_keys[column] = new[column].to_numpy(dtype=float)
+                categories[column] = None
+                continue
+            merged = np.union1d(known, pd.unique(new[column].dropna()).astype(object))
+            remap = np.searchsorted(merged, known).astype(float)
+            old_key = self._keys[column]
+            old_keys[column] = np.where(np.isnan(old_key), np.nan, remap[np.nan_to_num(old_key).astype(int)])
+            new_keys[column], categories[column] = _sort_key(new[column], merged)
+
+        # the new rows go after the rows of their county block with the same or an earlier month
+        n_old, n_new = len(self.frame), len(new)
+        block_starts = np.array([self._blocks[key].start for key in county_blocks])
+        block_sizes = np.array([self._blocks[key].stop for key in county_blocks]) - block_starts
+        n_months = len(categories['first_day_of_month']) + 1
+        old_month = np.nan_to_num(old_keys['first_day_of_month'], nan=n_months - 1).astype(np.int64)
+        new_month = np.nan_to_num(new_keys['first_day_of_month'], nan=n_months - 1).astype(np.int64)
+        new_blocks = np.array(new_blocks)
+        sort = np.lexsort((new_month, new_blocks))
+        new, new_blocks = new.iloc[sort], new_blocks[sort]
+        new_keys = {column: key[sort] for column, key in new_keys.items()}
+        old_composite = np.repeat(np.arange(len(county_blocks)), block_sizes) * n_months + old_month
+        at = np.searchsorted(old_composite, new_blocks * n_months + new_month[sort], side='right')
+        new_pos = at + np.arange(n_new)
+        old_pos = np.arange(n_old) + np.searchsorted(at, np.arange(n_old), side='right')
+
+        source = np.empty(n_old + n_new, dtype=np.int64)
+        source[old_pos] = np.arange(n_old)
+        source[new_pos] = n_old + np.arange(n_new)
+        table = copy.copy(self)
+        table.frame = pd.concat([self.frame, new], ignore_index=True).iloc[source].reset_index(drop=True)
+
+        # a block grows by the new rows of the blocks starting inside it
+        added_at = np.sort(block_starts[new_blocks])
+        starts = np.array([block.start for block in self._blocks.values()])
+        stops = np.array([block.stop for block in self._blocks.values()])
+        starts += np.searchsorted(added_at, starts)
+        stops += np.searchsorted(added_at, stops)
+        table._blocks = {key: slice(start, stop)
+                         for key, start, stop in zip(self._blocks, starts.tolist(), stops.tolist())}
+
+        state_blocks = sorted((key for key in self._blocks if key is not None and len(key) == 1),
+                              key=lambda key: self._blocks[key].start)
+        new_states = new['state'].to_numpy()
+        added_by_state = [new_pos[new_states == state] for (state,) in state_blocks]
+        table._keys, table._categories = {}, categories
+        table._valid_prefix, table._global_order, table._state_order = {}, {}, {}
+        for column in self.columns:
+            key = np.empty(n_old + n_new)
+            key[old_pos] = old_keys[column]
+            key[new_pos] = new_keys[column]
+            table._keys[column] = key
+            table._valid_prefix[column] = np.concatenate([[0], np.cumsum(~np.isnan(key))])
+            table._global_order[column] = _merge_order(old_pos[self._global_order[column]], key, new_pos)
+            segments = []
+            for state, added in zip(state_blocks, added_by_state):
+                segment = old_pos[self._state_order[column][self._blocks[state]]]
+                segments.append(_merge_order(segment, key, added) if len(added) else segment)
+            table._state_order[column] = np.concatenate(segments)
+        return table
+
+    def _block(self, state, county):
+        if state and county:
+            return self._blocks.get((state, county), slice(0, 0))
+        if state:
+            return self._blocks.get((state,), slice(0, 0))
+        if county:
+            # county name without a state: may span several blocks
+            return np.flatnonzero(self.frame['county'].to_numpy() == county)
+        return self._blocks[None]
+
+    def _filter_mask(self, rows, filter_query):
+        mask = np.ones(len(rows), dtype=bool)
+        for part in filter_query.split(' && ') if filter_query else []:
+            column, operator, value = split_filter_part(part)
+            if column not in self.frame.columns:
+                continue
+            values = self.frame[column].to_numpy()[rows]
+            if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+                if pd.api.types.is_numeric_dtype(self.frame[column]):
+                    try:
+                        value = float(value)
+                    except (TypeError, ValueError):
+                        mask &= False
+                        continue
+                else:
+                    value = str(value)
+                with np.errstate(invalid='ignore'):
+                    result = {
+                        'eq': lambda: values == value, 'ne': lambda: values != value,
+                        'lt': lambda: values < value, 'le': lambda: values <= value,
+                        'gt': lambda: values > value, 'ge': lambda: values >= value,
+                    }[operator]()
+                mask &= np.asarray(result, dtype=bool)
+            elif operator == 'contains':
+                mask &= pd.Series(values).astype(str).str.contains(str(value), case=False, regex=False).to_numpy()
+            elif operator == 'datestartswith':
+                mask &= pd.Series(values).astype(str).str.startswith(str(value)).to_numpy()
+        return mask
+
+    def rows(self, state=None, county=None, filter_query='', start=None, end=None):
+        """
+        Positions in `frame` of the rows matching the table's selection, in table order.
+
+        `start` / `end` bound `first_day_of_month` (inclusive, 'YYYY-MM-DD').
+        """
+        block = self._block(state, county)
+        rows = np.arange(block.start, block.stop) if isinstance(block, slice) else block
+        if filter_query:
+            rows = rows[self._filter_mask(rows, filter_query)]
+        if start or end:
+            months = self.frame['first_day_of_month'].to_numpy()[rows]
+            keep = np.ones(len(rows), dtype=bool)
+            if start:
+                keep &= months >= start
+            if end:
+                keep &= months <= end
+            rows = rows[keep]
+        return rows
+
+    def _fast_sorted_page(self, block, column, ascending, start, stop):
+        """Page of a single-column sort over a whole state (or the whole table) without re-sorting."""
+        order = self._global_order[column] if block == self._blocks[None] else self._state_order[column]
+        positions = np.arange(start, min(stop, block.stop - block.start))
+        if not ascending:
+            # descending: valid values reversed, missing values stay last
+            n_valid = self._valid_prefix[column][block.stop] - self._valid_prefix[column][block.start]
+            positions = np.where(positions < n_valid, n_valid - 1 - positions, positions)
+        return order[block.start + positions]
+
+    def page(self, state=None, county=None, page_current=0, page_size=15, sort_by=None, filter_query=''):
+        """
+        Rows of one table page as records, with the page count and number of matching rows.
+        """
+        page_size = max(int(page_size or 15), 1)
+        block = self._block(state, county)
+        sort_by = [s for s in (sort_by or []) if s.get('column_id') in self._keys]
+
+        if isinstance(block, slice):
+            n_rows = block.stop - block.start
+        else:
+            n_rows = len(block)
+
+        if not filter_query and len(sort_by) <= 1:
+            total = n_rows
+            page_current = min(max(int(page_current or 0), 0), max(math.ceil(total / page_size) - 1, 0))
+            start, stop = page_current * page_size, (page_current + 1) * page_size
+            is_state_block = isinstance(block, slice) and (state and not county or block == self._blocks[None])
+            if not sort_by:
+                rows = (np.arange(block.start + start, min(block.start + stop, block.stop))
+                        if isinstance(block, slice) else block[start:stop])
+            elif is_state_block:
+                rows = self._fast_sorted_page(block, sort_by[0]['column_id'], sort_by[0]['direction'] == 'asc', start, stop)
+            else:
+                rows = self._sorted(np.arange(block.start, block.stop) if isinstance(block, slice) else block, sort_by)[start:stop]
+        else:
+            rows = np.arange(block.start, block.stop) if isinstance(block, slice) else block
+            rows = rows[self._filter_mask(rows, filter_query)]
+            total = len(rows)
+            page_current = min(max(int(page_current or 0), 0), max(math.ceil(total / page_size) - 1, 0))
+            if sort_by:
+                rows = self._sorted(rows, sort_by)
+            rows = rows[page_current * page_size: (page_current + 1) * page_size]
+
+        records = self.frame.iloc[rows].round(2).to_dict('records')
+        return records, max(math.ceil(total / page_size), 1), total
+
+    def _sorted(self, rows, sort_by):
+        # np.lexsort sorts by the last key first; negate keys for descending (NaN stays last)
+        keys = []
+        for spec in reversed(sort_by):
+            key = self._keys[spec['column_id']][rows]
+            keys.append(key if spec['direction'] == 'asc' else -key)
+        return rows[np.lexsort(keys)]
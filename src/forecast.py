@@ -0,0 +1,58 @@
+"""
+Forecast microbusiness density for the Kaggle test months and score the forecasts.
+
+Fits every model (or the ones given with --model) on the county x month
+panel of the data store, for all counties at once, and reports the fit time
+and the SMAPE against the revealed test months. The submission of the best
+scoring model is written in the `sample_submission.csv` format.
+
+Run from the repository root:
+
+    python src/forecast.py
+    python src/forecast.py --model exp_smoothing --output submission.csv
+"""
+import argparse
+import time
+
+try:
+    from components.store import STORE_PATH, load_store
+    from components.panel import CountyPanel
+    from components.forecast import FORECAST_MODELS, TEST_PATH, REVEALED_TEST_PATH, submission, score
+except ModuleNotFoundError:
+    from src.components.store import STORE_PATH, load_store
+    from src.components.panel import CountyPanel
+    from src.components.forecast import FORECAST_MODELS, TEST_PATH, REVEALED_TEST_PATH, submission, score
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--store', default=STORE_PATH)
+    parser.add_argument('--test', default=TEST_PATH, help='county-months to forecast (test.csv)')
+    parser.add_argument('--revealed', default=REVEALED_TEST_PATH, help='actuals to score against')
+    parser.add_argument('--model', action='append', choices=sorted(FORECAST_MODELS),
+                        help='model to fit (repeatable, default all)')
+    parser.add_argument('--output', default='submission.csv', help='submission file of the best model')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    panel = CountyPanel(load_store(args.store))
+    print(f"Panel: {len(panel.index):,} counties x {len(panel.months)} months "
+          f"({time.perf_counter() - start:.2f}s to load)")
+
+    best = None
+    for model in args.model or list(FORECAST_MODELS):
+        start = time.perf_counter()
+        result = submission(panel, model, args.test)
+        seconds = time.perf_counter() - start
+        smape = score(result, args.revealed)
+        print(f"{model:<16}{seconds * 1000:>8.0f} ms   SMAPE {smape:.4f}")
+        if best is None or smape < best[0]:
+            best = (smape, model, result)
+
+    smape, model, result = best
+    result.to_csv(args.output, index=False)
+    print(f"Wrote {len(result):,} rows from {model} to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
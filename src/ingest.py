@@ -0,0 +1,154 @@
+"""
+Build the columnar data store used by the dashboard.
+
+Joins the monthly microbusiness panel with the census metrics and county
+centroids, writes `data/processed/smb_enriched.arrow`, then reports how long a
+fresh process takes to load it and how much resident memory that costs, both
+for the store on its own and for a full app worker (what each gunicorn worker
+pays at boot).
+
+Run from the repository root:
+
+    python src/ingest.py
+
+New months (e.g. `revealed_test.csv`) can be folded into an existing store
+without rebuilding it; county-months already in the store are skipped:
+
+    python src/ingest.py --append data/raw/revealed_test.csv
+
+With --bundle, the startup bundle read by workers started with
+SMB_STARTUP_BUNDLE is rebuilt from the new store as well:
+
+    python src/ingest.py --bundle data/processed/startup_bundle.pkl
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+try:
+    from components.store import (
+        PANEL_PATH, CENSUS_PATH, COUNTIES_GEOJSON_PATH, STORE_PATH,
+        build_enriched, write_store, load_store
+    )
+    from components.live_data import read_new_months, append_rows
+    from components.bundle import BUNDLE_PATH, StartupArtifacts
+except ModuleNotFoundError:
+    from src.components.store import (
+        PANEL_PATH, CENSUS_PATH, COUNTIES_GEOJSON_PATH, STORE_PATH,
+        build_enriched, write_store, load_store
+    )
+    from src.components.live_data import read_new_months, append_rows
+    from src.components.bundle import BUNDLE_PATH, StartupArtifacts
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Each probe runs in a fresh interpreter so nothing is already imported or cached.
+# ru_maxrss is in kilobytes on Linux.
+STORE_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+from components.store import load_store
+df = load_store(sys.argv[1])
+print(json.dumps({"seconds": time.perf_counter() - start, "rows": len(df),
+                  "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+WORKER_PROBE = """
+import json, resource, time
+start = time.perf_counter()
+import app
+print(json.dumps({"seconds": time.perf_counter() - start,
+                  "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def run_probe(code, *args):
+    env = dict(os.environ, PYTHONPATH=SRC_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    result = subprocess.run([sys.executable, '-c', code, *args], capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# where the inputs that are not shipped with the repository come from
+DATA_SOURCES = {
+    'panel': "train.csv of the GoDaddy Microbusiness Density Forecasting competition: "
+             "https://www.kaggle.com/competitions/godaddy-microbusiness-density-forecasting/data",
+    'counties_geojson': "https://raw.githubusercontent.com/plotly/datasets/master/geojson-counties-fips.json",
+}
+
+
+def missing_inputs(args):
+    """Lines describing each input file of the build that does not exist, with where to get it."""
+    lines = []
+    for name in ('panel', 'census', 'counties_geojson'):
+        path = getattr(args, name)
+        if not os.path.exists(path):
+            source = DATA_SOURCES.get(name)
+            lines.append(f"  {path} not found" + (f"; download {source}" if source else ""))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--panel', default=PANEL_PATH, help='monthly microbusiness panel (train.csv)')
+    parser.add_argument('--census', default=CENSUS_PATH)
+    parser.add_argument('--counties-geojson', default=COUNTIES_GEOJSON_PATH)
+    parser.add_argument('--output', default=STORE_PATH)
+    parser.add_argument('--append', action='append', metavar='CSV',
+                        help='append the new months of a monthly file to the existing store (repeatable)')
+    parser.add_argument('--bundle', nargs='?', const=BUNDLE_PATH, metavar='PATH',
+                        help=f'also write the startup bundle (default {BUNDLE_PATH})')
+    parser.add_argument('--skip-report', action='store_true', help='do not measure cold start / memory')
+    args = parser.parse_args()
+    if args.bundle and os.path.abspath(args.output) != os.path.abspath(STORE_PATH):
+        parser.error('--bundle is built from the store the app loads; use it with the default --output')
+
+    if args.append and not os.path.exists(args.output):
+        parser.exit(1, f"error: no store at {args.output} to append to; build it first with `python src/ingest.py`\n")
+    missing = [] if args.append else missing_inputs(args)
+    if missing:
+        parser.exit(1, "error: cannot build the store, input files are missing:\n" + "\n".join(missing)
+                    + "\nPlace them there or point --panel / --counties-geojson at them.\n")
+
+    start = time.perf_counter()
+    if args.append:
+        df = load_store(args.output)
+        for path in args.append:
+            new_rows = read_new_months(path, df)
+            print(f"{path}: {len(new_rows):,} new rows")
+            df = append_rows(df, new_rows)
+    else:
+        df = build_enriched(args.panel, args.census, args.counties_geojson)
+    write_store(df, args.output)
+    print(f"Wrote {len(df):,} rows x {len(df.columns)} columns to {args.output} "
+          f"({os.path.getsize(args.output) / 1e6:.1f} MB) in {time.perf_counter() - start:.2f}s")
+    print(f"In-memory size: {df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+
+    if args.bundle:
+        start = time.perf_counter()
+        # same forecast model as the app, or the bundle is rebuilt at the first worker boot
+        StartupArtifacts.build(forecast_model=os.environ.get('SMB_FORECAST_MODEL', 'last_value')).save(args.bundle)
+        print(f"Wrote startup bundle {args.bundle} ({os.path.getsize(args.bundle) / 1e6:.1f} MB) "
+              f"in {time.perf_counter() - start:.2f}s")
+
+    if args.skip_report:
+        return
+
+    store = run_probe(STORE_PROBE, os.path.abspath(args.output))
+    worker = run_probe(WORKER_PROBE)
+    if 'error' in store:
+        print(f"Store cold start: failed ({store['error']})")
+    else:
+        print(f"Store cold start: {store['seconds']:.2f}s, peak RSS {store['max_rss_mb']:.0f} MB")
+    if 'error' in worker:
+        print(f"App worker start: failed ({worker['error']})")
+    else:
+        print(f"App worker start: {worker['seconds']:.2f}s, peak RSS {worker['max_rss_mb']:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
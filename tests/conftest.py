@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# the app imports its components as `components.*`, with src/ on the path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from components.synthetic import generate_enriched  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def enriched():
+    """Small synthetic `smb_enriched` frame: ~150 counties x 39 months, a few without income data."""
+    df = generate_enriched(geo_scale=0.05, seed=1)
+    df.loc[df['cfips'].isin(df['cfips'].unique()[::20]), 'median_hh_inc_2021'] = float('nan')
+    return df
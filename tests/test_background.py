@@ -0,0 +1,192 @@
+import os
+import subprocess
+import sys
+import time
+
+import flask
+import pytest
+from dash import set_props
+
+from components import background
+from components.background import (
+    CANCELLED, QUEUED, RUNNING, JobStore, PoolCallbackManager, job_key, report_progress,
+)
+from components.instrumentation import CallbackMetrics
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_attach_dedups_identical_requests(store):
+    first, submit_first = store.attach("job")
+    second, submit_second = store.attach("job")
+    assert submit_first and not submit_second
+    assert first != second and job_key(first) == job_key(second) == "job"
+    assert store.waiters("job") == 2
+
+
+def test_detach_cancels_only_once_no_waiter_is_left(store):
+    first, _ = store.attach("job")
+    second, _ = store.attach("job")
+    store.detach(first)
+    assert store.status("job") == QUEUED
+    # detaching the same request again must not count as another request leaving
+    store.detach(first)
+    assert store.status("job") == QUEUED
+    store.detach(second)
+    assert store.status("job") == CANCELLED
+
+
+def test_cancelled_job_is_submitted_again(store):
+    waiter, _ = store.attach("job")
+    store.detach(waiter)
+    _, submit = store.attach("job")
+    assert submit
+    assert store.status("job") == QUEUED and store.waiters("job") == 1
+
+
+def test_running_job_stops_at_next_progress_report_once_cancelled(store):
+    from components.background import _current_job
+    waiter, _ = store.attach("job")
+    assert store.start("job")
+    token = _current_job.set((store, "job"))
+    try:
+        report_progress(10)
+        assert store.progress("job") == [10]
+        store.detach(waiter)
+        with pytest.raises(Exception, match="job"):
+            report_progress(20)
+    finally:
+        _current_job.reset(token)
+
+
+def test_job_of_a_dead_process_is_not_shared(store):
+    store.attach("job")
+    store._connection().execute("UPDATE jobs SET owner = ? WHERE key = 'job'", (dead_pid(),))
+    _, submit = store.attach("job")
+    assert submit
+
+
+def test_finished_job_is_shared_until_result_ttl(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), result_ttl=60)
+    store.attach("job")
+    store.start("job")
+    store.finish("job", {"value": 1})
+    _, submit = store.attach("job")
+    assert not submit and store.result("job") == {"value": 1}
+
+    store.result_ttl = -1
+    _, submit = store.attach("job")
+    assert submit and store.result("job") is None
+
+
+def test_set_props_reach_every_waiter(store):
+    first, _ = store.attach("job")
+    second, _ = store.attach("job")
+    store.set_props("job", "status", {"children": "loading"})
+    store.set_props("job", "status", {"color": "red"})
+    assert store.updated_props(first) == {"status": {"children": "loading", "color": "red"}}
+    assert store.updated_props(first) == {}
+
+    store.set_props("job", "other", {"value": 2})
+    # the second request still gets everything, in order
+    assert store.updated_props(second) == {"status": {"children": "loading", "color": "red"}, "other": {"value": 2}}
+    assert store.updated_props(first) == {"other": {"value": 2}}
+
+    # a request joining later gets the updates made before it joined
+    third, _ = store.attach("job")
+    assert store.updated_props(third) == {"status": {"children": "loading", "color": "red"}, "other": {"value": 2}}
+
+
+def test_stats_are_returned_once(store):
+    store.attach("job")
+    store.start("job")
+    store.finish("job", 1, stats=("callback", "record"))
+    assert store.pop_stats("job") == ("callback", "record")
+    assert store.pop_stats("job") is None
+
+
+def gated_callback(gate, value):
+    # runs in a pool process; waits for the test to open the gate
+    set_props("status", {"children": "started"})
+    deadline = time.time() + 10
+    while not os.path.exists(gate) and time.time() < deadline:
+        report_progress(50)
+        time.sleep(0.01)
+    return value * 2
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = PoolCallbackManager(str(tmp_path / "jobs.db"), processes=1)
+    manager.register("gated", gated_callback, None)
+    manager.metrics = CallbackMetrics()
+    yield manager
+    manager.reset_pool()
+
+
+def poll(manager, key, job):
+    # what Dash does for every poll of a background callback
+    with flask.Flask(__name__).test_request_context():
+        result = manager.get_result(key, job)
+        props = manager.get_updated_props(key)
+    return result, props
+
+
+def test_manager_shares_a_job_and_sends_set_props_to_every_request(manager, tmp_path):
+    gate = str(tmp_path / "gate")
+    first = manager.call_job_fn("key", "gated", [gate, 21], {})
+    second = manager.call_job_fn("key", "gated", [gate, 21], {})
+    assert first != second
+    wait_for(lambda: manager.store.status("key") == RUNNING)
+    assert manager.job_running(first) and manager.job_running(second)
+
+    wait_for(lambda: manager.store.updated_props(first))
+    open(gate, "w").close()
+    wait_for(lambda: manager.result_ready("key"))
+
+    result, props = poll(manager, "key", second)
+    assert result == 42
+    assert props == {"status": {"children": "started"}}
+    assert manager.store.waiters("key") == 1
+    assert 'smb_callback_compute_seconds_count{callback="gated_callback"} 1' in manager.metrics.render()
+
+
+def test_manager_cancels_a_job_when_its_only_request_leaves(manager, tmp_path):
+    gate = str(tmp_path / "gate")
+    job = manager.call_job_fn("key", "gated", [gate, 1], {})
+    wait_for(lambda: manager.store.status("key") == RUNNING)
+    manager.terminate_job(job)
+    assert manager.store.status("key") == CANCELLED
+    # the job stops at its next report_progress and stores no result
+    wait_for(lambda: not manager.store.running("key"))
+    assert manager.store.status("key") == CANCELLED
+    result, _ = poll(manager, "key", job)
+    assert result is manager.UNDEFINED
+
+
+def test_from_env_does_not_start_the_pool_on_another_dash_version(monkeypatch, tmp_path):
+    monkeypatch.setenv("SMB_BACKGROUND_JOBS", str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(background, "SUPPORTED_DASH", "0.0.")
+    try:
+        import diskcache  # noqa: F401
+    except ImportError:
+        with pytest.raises(RuntimeError, match="SMB_BACKGROUND_JOBS needs Dash 0.0.x"):
+            PoolCallbackManager.from_env()
+    else:
+        assert not isinstance(PoolCallbackManager.from_env(), PoolCallbackManager)
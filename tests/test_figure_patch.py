@@ -0,0 +1,70 @@
+import copy
+
+import numpy as np
+import pytest
+
+from components.figure_patch import figure_patch
+
+
+@pytest.fixture
+def figure():
+    return {
+        'data': [{
+            'type': 'choroplethmap',
+            'locations': ['01001', '01003'],
+            'z': np.array([1.5, np.nan]),
+            'geojson': {'type': 'FeatureCollection', 'features': [{'id': '01001', 'geometry': [[0, 1], [1, 1]]}]},
+            'hovertemplate': '%{z}',
+        }],
+        'layout': {
+            'template': {'layout': {'font': {'family': 'Arial'}}},
+            'map': {'style': 'carto-positron', 'center': {'lat': 37, 'lon': -95}, 'zoom': 3},
+            'coloraxis': {'colorbar': {'title': {'text': 'density'}}},
+        },
+    }
+
+
+def assignments(patch):
+    return {tuple(op['location']): op['params']['value'] for op in patch.to_plotly_json()['operations']}
+
+
+def test_identical_figures_patch_nothing(figure):
+    assert assignments(figure_patch(figure, copy.deepcopy(figure))) == {}
+
+
+def test_new_colour_values_patch_only_z(figure):
+    new = copy.deepcopy(figure)
+    new['data'][0]['z'] = np.array([2.5, np.nan])
+    patched = assignments(figure_patch(figure, new))
+    assert list(patched) == [('data', 0, 'z')]
+    np.testing.assert_array_equal(patched[('data', 0, 'z')], [2.5, np.nan])
+
+
+def test_layout_is_patched_one_level_deep(figure):
+    new = copy.deepcopy(figure)
+    new['layout']['map']['center'] = {'lat': 40, 'lon': -100}
+    new['layout']['coloraxis']['colorbar']['title']['text'] = 'active'
+    assert assignments(figure_patch(figure, new)) == {
+        ('layout', 'map', 'center'): {'lat': 40, 'lon': -100},
+        ('layout', 'coloraxis', 'colorbar'): {'title': {'text': 'active'}},
+    }
+
+
+def test_added_keys_are_assigned(figure):
+    new = copy.deepcopy(figure)
+    new['data'][0]['customdata'] = ['a', 'b']
+    assert assignments(figure_patch(figure, new)) == {('data', 0, 'customdata'): ['a', 'b']}
+
+
+@pytest.mark.parametrize('change', ['trace added', 'trace type', 'trace key removed', 'layout key removed'])
+def test_structural_changes_need_the_whole_figure(figure, change):
+    new = copy.deepcopy(figure)
+    if change == 'trace added':
+        new['data'].append({'type': 'scattermap'})
+    elif change == 'trace type':
+        new['data'][0]['type'] = 'scattermap'
+    elif change == 'trace key removed':
+        del new['data'][0]['hovertemplate']
+    else:
+        del new['layout']['coloraxis']
+    assert figure_patch(figure, new) is None
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from components.forecast import score, smape
+
+
+def test_smape_of_a_perfect_forecast_is_zero():
+    assert smape([1.0, 2.5, 0.0], [1.0, 2.5, 0.0]) == 0.0
+
+
+def test_smape_counts_both_zero_as_no_error():
+    # |50 - 100| / 75 = 66.67% for the first month, 0 for the second
+    assert smape([100.0, 0.0], [50.0, 0.0]) == pytest.approx(100 / 3)
+
+
+def test_smape_is_symmetric_and_bounded():
+    assert smape([3.0], [1.0]) == smape([1.0], [3.0]) == pytest.approx(100.0)
+    assert smape([0.0], [4.0]) == pytest.approx(200.0)
+
+
+def test_score_matches_revealed_rows_only(tmp_path):
+    revealed = tmp_path / "revealed_test.csv"
+    pd.DataFrame({
+        'row_id': ['1001_2022-11-01', '1003_2022-11-01'],
+        'cfips': [1001, 1003],
+        'microbusiness_density': [2.0, 4.0],
+    }).to_csv(revealed, index=False)
+    submission = pd.DataFrame({
+        'row_id': ['1001_2022-11-01', '1003_2022-11-01', '1005_2022-11-01'],
+        'microbusiness_density': [2.0, 2.0, np.nan],
+    })
+    # 0% and |2 - 4| / 3 = 66.67%; the unrevealed row is left out
+    assert score(submission, str(revealed)) == pytest.approx(100 / 3)
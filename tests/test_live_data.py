@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from components.live_data import Dataset, LiveDataset, read_new_months
+from components.scoring import SCORE_METRICS
+
+from test_table import assert_same_backend
+
+
+def assert_same_dataset(updated, fresh):
+    pd.testing.assert_frame_equal(updated.snapshot.frame, fresh.snapshot.frame)
+    assert updated.county_lookup == fresh.county_lookup
+    assert updated.unique_states == fresh.unique_states
+    pd.testing.assert_frame_equal(updated.stats.state_summaries, fresh.stats.state_summaries)
+    np.testing.assert_array_equal(updated.stats.population, fresh.stats.population)
+    np.testing.assert_array_equal(updated.panel.index, fresh.panel.index)
+    assert updated.panel.months.equals(fresh.panel.months)
+    for metric, values in fresh.panel.values.items():
+        np.testing.assert_array_equal(updated.panel.values[metric], values)
+    pd.testing.assert_frame_equal(updated.ranker.table.sort_index(), fresh.ranker.table.sort_index())
+    weights = dict.fromkeys(SCORE_METRICS, 1.0)
+    np.testing.assert_array_equal(updated.scorer.scores(weights), fresh.scorer.scores(weights))
+    pd.testing.assert_frame_equal(updated.forecast.frame(), fresh.forecast.frame())
+    assert_same_backend(updated.table_backend, fresh.table_backend)
+
+
+def split(enriched, new):
+    return enriched[~new].reset_index(drop=True), enriched[new].reset_index(drop=True)
+
+
+def test_with_rows_of_a_new_month_equals_a_rebuild(enriched):
+    months = enriched['first_day_of_month']
+    base, new_rows = split(enriched, (months == months.max()) & ~enriched['state'].isin(['State 04']))
+    dataset = Dataset(base)
+    updated = dataset.with_rows(new_rows, source='next.csv')
+    assert updated.sources == ('next.csv',) and len(updated.df) == len(enriched)
+    assert_same_dataset(updated, Dataset(updated.df))
+    # the previous version is left as it was
+    assert len(dataset.df) == len(base) and len(dataset.table_backend.frame) == len(base)
+
+
+def test_with_rows_of_a_new_county_equals_a_rebuild(enriched):
+    base, new_rows = split(enriched, enriched['cfips'] == enriched['cfips'].iloc[-1])
+    updated = Dataset(base).with_rows(new_rows)
+    assert new_rows['cfips'].iloc[0] in updated.ranker.table.index
+    assert_same_dataset(updated, Dataset(updated.df))
+
+
+def test_read_new_months_skips_loaded_rows(enriched, tmp_path):
+    months = enriched['first_day_of_month']
+    base, _ = split(enriched, months == months.max())
+    path = tmp_path / "month.csv"
+    columns = ['cfips', 'county', 'state', 'first_day_of_month', 'microbusiness_density', 'active']
+    enriched[months >= months.unique()[-2]][columns].to_csv(path, index=False)
+    new_rows = read_new_months(str(path), base)
+    assert len(new_rows) == base['cfips'].nunique()
+    assert (new_rows['first_day_of_month'] == months.max()).all()
+    assert list(new_rows.columns) == list(base.columns)
+    assert read_new_months(str(path), enriched).empty
+
+
+def test_ingest_swaps_in_the_new_version(enriched, tmp_path):
+    months = enriched['first_day_of_month']
+    base, new_rows = split(enriched, months == months.max())
+    path = tmp_path / "month.csv"
+    new_rows[['cfips', 'county', 'state', 'first_day_of_month', 'microbusiness_density', 'active']].to_csv(
+        path, index=False)
+    swapped = []
+    live = LiveDataset(Dataset(base), on_swap=swapped.append)
+    first = live.current
+    assert live.ingest(str(path)) == len(new_rows)
+    assert live.current is not first and swapped == [live.current]
+    assert live.current.panel.months.max() == months.max()
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from components.panel import CountyPanel
+from components.ranking import PercentileRanker, percentile_of
+
+
+def baseline_percentile(values, value):
+    # the card computation the ranker replaced: rank one county among the non-missing values
+    ranked = np.sort(values[~np.isnan(values)])
+    return round(np.searchsorted(ranked, value, side="right") / len(ranked) * 100, 2)
+
+
+def baseline_growth(df):
+    # mean October-over-October % change of `active` over the last three years, per county
+    october = df[df["first_day_of_month"].dt.month == 10].assign(year=lambda f: f["first_day_of_month"].dt.year)
+    active = october.pivot(index="cfips", columns="year", values="active")
+    changes = [(active[year] - active[year - 1]) / active[year - 1] * 100 for year in (2020, 2021, 2022)]
+    return pd.concat(changes, axis=1).mean(axis=1)
+
+
+def test_percentile_of_matches_the_baseline():
+    values = np.array([3.0, np.nan, 1.0, 2.0, 2.0, 5.0])
+    expected = [np.nan if np.isnan(v) else baseline_percentile(values, v) for v in values]
+    np.testing.assert_array_equal(percentile_of(values), expected)
+
+
+def test_percentile_of_without_values():
+    assert np.isnan(percentile_of([np.nan, np.nan])).all()
+
+
+@pytest.fixture(scope='module')
+def ranker(enriched):
+    return PercentileRanker(enriched, CountyPanel(enriched))
+
+
+@pytest.mark.parametrize('index, column', [('sellability', 'median_hh_inc_2021'), ('hireability', 'pct_college_2021')])
+def test_census_indices_match_the_baseline(enriched, ranker, index, column):
+    latest = enriched[enriched["first_day_of_month"] == enriched["first_day_of_month"].max()]
+    values = latest[column].to_numpy(dtype=float)
+    for cfips, value in zip(latest["cfips"], values):
+        expected = np.nan if np.isnan(value) else baseline_percentile(values, value)
+        np.testing.assert_equal(ranker.lookup(cfips)[index], expected)
+
+
+def test_growth_matches_the_baseline(enriched, ranker):
+    growth = baseline_growth(enriched)
+    values = growth.to_numpy()
+    for cfips, value in growth.items():
+        assert ranker.lookup(cfips)['growth'] == baseline_percentile(values, value)
+
+
+def test_add_months_equals_a_fresh_ranking(enriched):
+    last = enriched["first_day_of_month"] == enriched["first_day_of_month"].max()
+    base = enriched[~last].reset_index(drop=True)
+    ranker = PercentileRanker(base, CountyPanel(base))
+    updated = ranker.copy(ranker.panel.copy())
+    updated.add_months(enriched[last])
+    fresh = PercentileRanker(enriched, CountyPanel(enriched))
+    pd.testing.assert_frame_equal(updated.table.sort_index(), fresh.table.sort_index())
+    # the copy leaves the original ranking alone
+    pd.testing.assert_frame_equal(ranker.table, PercentileRanker(base, CountyPanel(base)).table)
+
+
+def test_lookup_of_an_unknown_county(ranker):
+    assert ranker.lookup(99999) is None
+    assert ranker.lookup_many([99999]).isna().all(axis=None)
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import types
+
+import pytest
+
+from components import shared_cache
+from components.shared_cache import SharedCache, _cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # the cache reads time.time() for its timestamps; step it by hand so LRU order is exact
+    now = [1000.0]
+    monkeypatch.setattr(shared_cache, 'time', types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def payload():
+    # random bytes do not compress, so every entry costs a little over 1 kB
+    return os.urandom(1000)
+
+
+def test_disabled_cache_always_runs_the_callback():
+    cache = SharedCache(None)
+    calls = []
+    cached = cache.cached('chart')(lambda state: calls.append(state) or state)
+    assert cached('Ohio') == cached('Ohio') == 'Ohio'
+    assert calls == ['Ohio', 'Ohio'] and cache.lookup('chart', ['Ohio']) is None
+
+
+def test_cached_callback_runs_once(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.db"), version='v1')
+    calls = []
+    cached = cache.cached('chart')(lambda state: calls.append(state) or {'state': state})
+    assert cached('Ohio') == cached('Ohio') == {'state': 'Ohio'}
+    assert calls == ['Ohio'] and (cache.hits, cache.misses) == (1, 1)
+    assert cache.lookup('chart', ['Ohio']) == {'state': 'Ohio'}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = SharedCache(str(tmp_path / "cache.db"), version='v1', max_bytes=3500)
+    for key in ('a', 'b', 'c'):
+        cache.set(key, payload())
+        clock[0] += 1
+    # reading `a` makes `b` the least recently used entry
+    cache.get('a')
+    clock[0] += 1
+    cache.set('d', payload())
+    assert cache.get('b') is shared_cache._MISSING
+    assert all(cache.get(key) is not shared_cache._MISSING for key in ('a', 'c', 'd'))
+    assert cache.stats()['bytes'] <= 3500
+
+
+def test_expired_entries_are_misses(tmp_path, clock):
+    cache = SharedCache(str(tmp_path / "cache.db"), version='v1', ttl=60)
+    cache.set('a', 1)
+    clock[0] += 61
+    assert cache.get('a') is shared_cache._MISSING
+
+
+def test_workers_on_different_versions_keep_their_entries(tmp_path):
+    path = str(tmp_path / "cache.db")
+    old = SharedCache(path, version='v1')
+    old.set(_cache_key('chart', ['Ohio']), 'old')
+    # a worker booting on new data during an ingest rollout
+    new = SharedCache(path, version='v2')
+    new.set(_cache_key('chart', ['Ohio']), 'new')
+    assert old.lookup('chart', ['Ohio']) == 'old'
+    assert new.lookup('chart', ['Ohio']) == 'new'
+    old.set_version('v2')
+    assert old.lookup('chart', ['Ohio']) == 'new' and old.stats()['entries'] == 2
+
+
+def test_entries_of_an_unused_version_are_evicted_first(tmp_path, clock):
+    cache = SharedCache(str(tmp_path / "cache.db"), version='v1', max_bytes=3500)
+    cache.set('a', payload())
+    clock[0] += 1
+    cache.set_version('v2')
+    for key in ('a', 'b', 'c'):
+        clock[0] += 1
+        cache.set(key, payload())
+    cache.set_version('v1')
+    assert cache.get('a') is shared_cache._MISSING
+    assert cache.stats()['entries'] == 3
+
+
+def test_cache_written_before_versioned_keys_is_reset(tmp_path):
+    path = str(tmp_path / "cache.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, version TEXT, value BLOB, size INTEGER, "
+                 "created REAL, accessed REAL)")
+    conn.execute("INSERT INTO entries VALUES ('a', 'v1', x'00', 1, 0, 0)")
+    conn.commit()
+    conn.close()
+    cache = SharedCache(path, version='v1')
+    assert cache.stats()['entries'] == 0
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+
+
+def test_value_computed_during_a_swap_keeps_the_old_version(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.db"), version='v1')
+
+    def slow(state):
+        # the dataset is swapped while the callback runs
+        cache.set_version('v2')
+        return state
+
+    assert cache.cached('chart')(slow)('Ohio') == 'Ohio'
+    assert cache.lookup('chart', ['Ohio']) is None
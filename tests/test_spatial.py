@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from components.spatial import CentroidIndex, haversine_km
+
+
+@pytest.fixture(scope='module')
+def points():
+    rng = np.random.default_rng(7)
+    n = 500
+    cfips = np.arange(1000, 1000 + n)
+    lat = rng.uniform(25, 49, n)
+    lng = rng.uniform(-124, -67, n)
+    lat[10] = np.nan  # a county without a centroid is not indexed
+    return cfips, lat, lng
+
+
+@pytest.fixture(scope='module')
+def index(points):
+    return CentroidIndex(*points, cell_deg=1.0)
+
+
+def distances_from(points, cfips):
+    codes, lat, lng = points
+    pos = np.flatnonzero(codes == cfips)[0]
+    distances = haversine_km(lat[pos], lng[pos], lat, lng)
+    known = ~np.isnan(distances) & (codes != cfips)
+    return codes[known], distances[known]
+
+
+def test_haversine_of_one_degree_of_latitude():
+    assert haversine_km(0, 0, [1.0], [0.0])[0] == pytest.approx(111.19, abs=0.01)
+
+
+@pytest.mark.parametrize('radius', [50, 300, 1500])
+def test_within_matches_brute_force(points, index, radius):
+    codes, distances = distances_from(points, 1100)
+    inside = distances <= radius
+    expected = codes[inside][np.argsort(distances[inside], kind='stable')]
+    found, found_distances = index.within(1100, radius)
+    np.testing.assert_array_equal(found, expected)
+    assert np.all(np.diff(found_distances) >= 0) and 1100 not in found
+
+
+@pytest.mark.parametrize('k', [1, 5, 40])
+def test_nearest_matches_brute_force(points, index, k):
+    codes, distances = distances_from(points, 1200)
+    order = np.argsort(distances, kind='stable')[:k]
+    found, found_distances = index.nearest(1200, k)
+    np.testing.assert_array_equal(found, codes[order])
+    np.testing.assert_allclose(found_distances, distances[order])
+
+
+def test_in_bbox_matches_a_mask(points, index):
+    codes, lat, lng = points
+    inside = (lat >= 30) & (lat <= 40.5) & (lng >= -100) & (lng <= -80.25)
+    assert sorted(index.in_bbox(30, 40.5, -100, -80.25)) == sorted(codes[inside])
+
+
+def test_unknown_or_unlocated_counties(index):
+    assert index.location(1010) is None and len(index) == 499
+    for cfips in (1010, 99999):
+        assert len(index.within(cfips, 500)[0]) == 0
+        assert len(index.nearest(cfips, 3)[0]) == 0
+    assert len(index.nearest(1100, 0)[0]) == 0
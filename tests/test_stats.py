@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from components.snapshot import CountySnapshot
+from components.stats import (
+    CountyStats, grouped_weighted_mean, grouped_weighted_quantile, weighted_mean, weighted_quantile,
+)
+
+
+def brute_force_quantile(values, weights, q):
+    # first value, in sorted order, at which the cumulative weight reaches q of the total
+    keep = ~np.isnan(values) & ~np.isnan(weights) & (weights > 0)
+    values, weights = values[keep], weights[keep]
+    if not len(values):
+        return np.nan
+    order = np.argsort(values, kind='stable')
+    cumulative = np.cumsum(weights[order])
+    return values[order][np.argmax(cumulative >= q * cumulative[-1])]
+
+
+@pytest.fixture
+def sample():
+    rng = np.random.default_rng(3)
+    values = rng.normal(50, 10, 200)
+    weights = rng.uniform(0, 5, 200)
+    values[::17] = np.nan
+    weights[::13] = np.nan
+    weights[::11] = 0
+    return values, weights
+
+
+def test_weighted_mean_ignores_missing_entries(sample):
+    values, weights = sample
+    keep = ~np.isnan(values) & ~np.isnan(weights)
+    assert weighted_mean(values, weights) == pytest.approx(np.average(values[keep], weights=weights[keep]))
+
+
+@pytest.mark.parametrize('q', [0.0, 0.1, 0.5, 0.9, 1.0])
+def test_weighted_quantile_matches_brute_force(sample, q):
+    values, weights = sample
+    assert weighted_quantile(values, weights, q) == brute_force_quantile(values, weights, q)
+
+
+def test_equal_weights_give_the_lower_median():
+    assert weighted_quantile([4.0, 1.0, 3.0, 2.0], [1, 1, 1, 1]) == 2.0
+    assert weighted_quantile([1.0, 2.0, 3.0], [1, 1, 10]) == 3.0
+
+
+def test_nothing_weighted_is_nan():
+    assert np.isnan(weighted_mean([1.0, 2.0], [np.nan, np.nan]))
+    assert np.isnan(weighted_quantile([1.0, 2.0], [0.0, 0.0]))
+    assert np.isnan(weighted_quantile([], []))
+
+
+def test_grouped_statistics_match_each_group(sample):
+    values, weights = sample
+    groups = np.arange(len(values)) % 4
+    # group 4 has no entries and comes out NaN
+    means = grouped_weighted_mean(values, weights, groups, 5)
+    medians = grouped_weighted_quantile(values, weights, groups, 5, 0.5)
+    for group in range(4):
+        rows = groups == group
+        assert means[group] == pytest.approx(weighted_mean(values[rows], weights[rows]))
+        assert medians[group] == weighted_quantile(values[rows], weights[rows], 0.5)
+    assert np.isnan(means[4]) and np.isnan(medians[4])
+
+
+@pytest.fixture(scope='module')
+def stats(enriched):
+    return CountyStats(CountySnapshot(enriched))
+
+
+def test_state_summaries_match_the_summary_of_each_state(stats):
+    for state in stats.states[:5]:
+        rows = stats.rows_for(state)
+        summary = stats.state_summaries.loc[state]
+        assert summary['total_microbusinesses'] == pytest.approx(np.nansum(stats.values('active')[rows]))
+        assert summary['microbusiness_density'] == pytest.approx(stats.weighted_mean('microbusiness_density', rows))
+        np.testing.assert_equal(summary['median_income'], stats.weighted_median(stats.income_col, rows))
+
+
+def test_population_is_implied_by_the_density(stats):
+    expected = stats.values('active') / stats.values('microbusiness_density') * 100
+    np.testing.assert_allclose(stats.population, expected)
+
+
+def test_updated_equals_fresh_stats(enriched):
+    last = enriched['first_day_of_month'] == enriched['first_day_of_month'].max()
+    # only some states get a new month
+    new_rows = enriched[last & enriched['state'].isin(['State 02', 'State 07'])]
+    base = enriched[~enriched.index.isin(new_rows.index)]
+    snapshot = CountySnapshot(base)
+    updated = CountyStats(snapshot).updated(snapshot.updated(new_rows), new_rows)
+    fresh = CountyStats(CountySnapshot(enriched))
+    pd.testing.assert_frame_equal(updated.state_summaries, fresh.state_summaries)
+    np.testing.assert_array_equal(updated.population, fresh.population)
+    assert updated.summary('State 02', 'County 001') == fresh.summary('State 02', 'County 001')
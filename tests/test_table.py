@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from components.live_data import append_rows
+from components.table import TableBackend, split_filter_part
+
+
+@pytest.fixture(scope='module')
+def backend(enriched):
+    return TableBackend(enriched)
+
+
+def reference(backend, state=None, query=None, sort=None):
+    """Rows of the table frame a page should show, selected and sorted with plain pandas."""
+    frame = backend.frame
+    if state:
+        frame = frame[frame['state'] == state]
+    if query is not None:
+        frame = frame[query(frame)]
+    if sort:
+        column, direction = sort
+        frame = frame.sort_values(column, ascending=direction == 'asc', kind='stable', na_position='last')
+    return frame.index.to_numpy()
+
+
+def page_rows(backend, records):
+    keys = backend.frame.set_index(['cfips_fixed', 'first_day_of_month']).index
+    return keys.get_indexer([(r['cfips_fixed'], r['first_day_of_month']) for r in records])
+
+
+@pytest.mark.parametrize('part, expected', [
+    ('{active} ge 10', ('active', 'ge', 10.0)),
+    ('{active} > 10', ('active', 'gt', 10.0)),
+    ('{microbusiness_density} le 2.5', ('microbusiness_density', 'le', 2.5)),
+    ('{state} eq "State 01"', ('state', 'eq', 'State 01')),
+    ('{county} contains County 00', ('county', 'contains', 'County 00')),
+    ('{county} contains `O\\`Brien`', ('county', 'contains', 'O`Brien')),
+    ('{first_day_of_month} datestartswith 2022-10', ('first_day_of_month', 'datestartswith', '2022-10')),
+    ('active', (None, None, None)),
+])
+def test_split_filter_part(part, expected):
+    assert split_filter_part(part) == expected
+
+
+def test_frame_is_sorted_into_contiguous_blocks(backend):
+    frame = backend.frame
+    assert frame.equals(frame.sort_values(['state', 'county', 'first_day_of_month'], kind='stable'))
+    state = frame['state'].iloc[0]
+    block = backend._blocks[(state,)]
+    assert (frame['state'].iloc[block] == state).all()
+    assert (frame['state'] == state).sum() == block.stop - block.start
+
+
+@pytest.mark.parametrize('state', [None, 'State 03'])
+@pytest.mark.parametrize('column', ['active', 'median_hh_inc_2021', 'county', 'first_day_of_month'])
+@pytest.mark.parametrize('direction', ['asc', 'desc'])
+def test_single_column_sort_matches_pandas(backend, state, column, direction):
+    # whole table and state pages come from the precomputed orders
+    sort_by = [{'column_id': column, 'direction': direction}]
+    expected = reference(backend, state, sort=(column, direction))
+    values = backend.frame[column].to_numpy()
+    for page in range(3):
+        records, _, total = backend.page(state, page_current=page, page_size=25, sort_by=sort_by)
+        rows, wanted = page_rows(backend, records), expected[page * 25:(page + 1) * 25]
+        assert total == len(expected)
+        if direction == 'asc':
+            np.testing.assert_array_equal(rows, wanted)
+        else:
+            # equal values may come in either order when descending
+            pd.testing.assert_series_equal(pd.Series(values[rows]), pd.Series(values[wanted]))
+
+
+def test_filter_and_sort_matches_pandas(backend):
+    query = '{active} gt 100 && {county} contains "00" && {first_day_of_month} datestartswith 2021-'
+    records, page_count, total = backend.page(
+        'State 05', page_size=10, filter_query=query,
+        sort_by=[{'column_id': 'microbusiness_density', 'direction': 'desc'}],
+    )
+    expected = reference(
+        backend, 'State 05',
+        query=lambda f: (f['active'] > 100) & f['county'].str.contains('00')
+        & f['first_day_of_month'].str.startswith('2021-'),
+        sort=('microbusiness_density', 'desc'),
+    )
+    assert total == len(expected) and page_count == max(-(-total // 10), 1)
+    np.testing.assert_array_equal(page_rows(backend, records), expected[:10])
+
+
+def test_numeric_filter_with_text_value_matches_nothing(backend):
+    assert backend.rows(filter_query='{active} gt many').size == 0
+
+
+def test_rows_bounds_months(backend):
+    rows = backend.rows('State 03', start='2021-01-01', end='2021-12-01')
+    months = backend.frame['first_day_of_month'].to_numpy()[rows]
+    assert len(rows) and months.min() == '2021-01-01' and months.max() == '2021-12-01'
+
+
+def assert_same_backend(updated, fresh):
+    pd.testing.assert_frame_equal(updated.frame, fresh.frame)
+    assert updated._blocks == fresh._blocks
+    for column in fresh.columns:
+        np.testing.assert_array_equal(updated._keys[column], fresh._keys[column])
+        np.testing.assert_array_equal(updated._valid_prefix[column], fresh._valid_prefix[column])
+        np.testing.assert_array_equal(updated._global_order[column], fresh._global_order[column])
+        np.testing.assert_array_equal(updated._state_order[column], fresh._state_order[column])
+
+
+@pytest.mark.parametrize('split', ['latest month', 'earlier months', 'new county'])
+def test_updated_equals_a_fresh_build(enriched, split):
+    months = enriched['first_day_of_month']
+    if split == 'latest month':
+        new = months == months.max()
+    elif split == 'earlier months':
+        new = months.isin(months.unique()[[3, 10]]) & (enriched['cfips'] % 3 == 0)
+    else:
+        new = enriched['cfips'] == enriched['cfips'].iloc[-1]
+    base, new_rows = enriched[~new].reset_index(drop=True), enriched[new].reset_index(drop=True)
+    updated = TableBackend(base).updated(new_rows)
+    assert_same_backend(updated, TableBackend(append_rows(base, new_rows)))